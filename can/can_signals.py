@@ -0,0 +1,288 @@
+"""
+CAN Signal Decoding
+
+Decodes CAN payloads into physical signal values using a DBC-like signal map:
+- Loading definitions from a DBC file (BO_/SG_ lines, GenMsgCycleTime) or JSON
+- Per-ID extractors precompiled into shift/mask tables (one pass per frame)
+- Vectorized decoding of payload batches with NumPy
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_SIGNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ev_charger.dbc")
+
+_MESSAGE_RE = re.compile(r"^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)")
+_SIGNAL_RE = re.compile(
+    r"^SG_\s+(\w+)\s*:\s*(\d+)\|(\d+)@([01])([+-])\s*"
+    r"\(([-+0-9.eE]+),([-+0-9.eE]+)\)\s*"
+    r"\[([-+0-9.eE]+)\|([-+0-9.eE]+)\]\s*\"([^\"]*)\""
+)
+_CYCLE_TIME_RE = re.compile(r'^BA_\s+"GenMsgCycleTime"\s+BO_\s+(\d+)\s+(\d+)\s*;')
+
+
+class Signal:
+    """Definition of a single signal inside a CAN message"""
+    
+    def __init__(self, name: str, start_bit: int, length: int,
+                 little_endian: bool = True, signed: bool = False,
+                 scale: float = 1.0, offset: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 unit: str = ""):
+        """
+        Initialize signal
+        
+        Args:
+            name: Signal name (e.g. current, voltage)
+            start_bit: DBC start bit (LSB for Intel, MSB for Motorola byte order)
+            length: Length in bits
+            little_endian: True for Intel (@1), False for Motorola (@0) byte order
+            signed: Two's complement raw value
+            scale: Physical = raw * scale + offset
+            offset: Physical = raw * scale + offset
+            minimum: Minimum physical value (None = unknown)
+            maximum: Maximum physical value (None = unknown)
+            unit: Physical unit
+        """
+        self.name = name
+        self.start_bit = start_bit
+        self.length = length
+        self.little_endian = little_endian
+        self.signed = signed
+        self.scale = scale
+        self.offset = offset
+        self.minimum = minimum
+        self.maximum = maximum
+        self.unit = unit
+    
+    @property
+    def shift(self) -> int:
+        """Position of the signal's LSB in the 64-bit payload integer"""
+        if self.little_endian:
+            return self.start_bit
+        # Motorola: start bit is the MSB; payload integer is read big-endian
+        msb = (7 - self.start_bit // 8) * 8 + self.start_bit % 8
+        return msb - self.length + 1
+    
+    @property
+    def end_byte(self) -> int:
+        """Number of payload bytes needed to decode this signal"""
+        if self.little_endian:
+            return (self.start_bit + self.length - 1) // 8 + 1
+        return 8 - self.shift // 8
+    
+    def __repr__(self):
+        return f"Signal({self.name}, {self.start_bit}|{self.length}@{'1' if self.little_endian else '0'}{'-' if self.signed else '+'})"
+
+
+class MessageDecoder:
+    """Precompiled extractor for all signals of one CAN ID"""
+    
+    def __init__(self, can_id: int, name: str, signals: List[Signal], cycle_time: Optional[float] = None):
+        """
+        Initialize message decoder
+        
+        Args:
+            can_id: CAN ID
+            name: Message name
+            signals: Signals carried by the message
+            cycle_time: Send period in seconds (None = event-driven)
+        """
+        self.can_id = can_id
+        self.name = name
+        self.signals = signals
+        self.cycle_time = cycle_time
+        self.names: Tuple[str, ...] = tuple(s.name for s in signals)
+        
+        # Flat tables: (little_endian, shift, mask, sign_bit, scale, offset, end_byte)
+        self.table = tuple(
+            (s.little_endian, s.shift, (1 << s.length) - 1,
+             (1 << (s.length - 1)) if s.signed else 0,
+             s.scale, s.offset, s.end_byte)
+            for s in signals
+        )
+        self.needs_le = any(s.little_endian for s in signals)
+        self.needs_be = any(not s.little_endian for s in signals)
+    
+    def decode(self, data: bytes) -> List[Optional[float]]:
+        """
+        Decode all signals of a frame in one pass
+        
+        Args:
+            data: Payload bytes
+        
+        Returns:
+            Physical values in signal order (None for signals beyond the DLC)
+        """
+        padded = bytes(data[:8]).ljust(8, b"\0")
+        raw_le = int.from_bytes(padded, "little") if self.needs_le else 0
+        raw_be = int.from_bytes(padded, "big") if self.needs_be else 0
+        dlc = len(data)
+        
+        values = []
+        for little_endian, shift, mask, sign_bit, scale, offset, end_byte in self.table:
+            if end_byte > dlc:
+                values.append(None)
+                continue
+            raw = ((raw_le if little_endian else raw_be) >> shift) & mask
+            if raw & sign_bit:
+                raw -= sign_bit << 1
+            values.append(raw * scale + offset)
+        return values
+    
+    def decode_batch(self, payloads: np.ndarray, dlcs: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decode many frames of this ID at once
+        
+        Args:
+            payloads: uint8 array of shape (n, 8)
+            dlcs: Payload lengths (None = all 8)
+        
+        Returns:
+            float64 array of shape (n, signals), NaN where a signal is beyond the DLC
+        """
+        payloads = np.ascontiguousarray(payloads, dtype=np.uint8).reshape(-1, 8)
+        raw_le = payloads.view("<u8").ravel() if self.needs_le else None
+        raw_be = payloads.view(">u8").ravel().astype(np.uint64) if self.needs_be else None
+        
+        out = np.empty((len(payloads), len(self.table)), dtype=np.float64)
+        for column, (little_endian, shift, mask, sign_bit, scale, offset, end_byte) in enumerate(self.table):
+            raw = ((raw_le if little_endian else raw_be) >> np.uint64(shift)) & np.uint64(mask)
+            raw = raw.astype(np.int64)
+            if sign_bit:
+                raw = np.where(raw & sign_bit, raw - (sign_bit << 1), raw)
+            out[:, column] = raw * scale + offset
+            if dlcs is not None:
+                out[np.asarray(dlcs) < end_byte, column] = np.nan
+        return out
+
+
+class SignalDecoder:
+    """Decodes CAN frames into named physical values"""
+    
+    def __init__(self, messages: Optional[List[MessageDecoder]] = None):
+        """
+        Initialize signal decoder
+        
+        Args:
+            messages: Message decoders (see load/from_dbc/from_json)
+        """
+        self.messages: Dict[int, MessageDecoder] = {m.can_id: m for m in (messages or [])}
+    
+    @classmethod
+    def load(cls, path: str = DEFAULT_SIGNAL_FILE) -> "SignalDecoder":
+        """Load a signal map from a .dbc or .json file"""
+        with open(path, "r") as f:
+            text = f.read()
+        if path.endswith(".json"):
+            return cls.from_json(json.loads(text))
+        return cls.from_dbc(text)
+    
+    @classmethod
+    def from_dbc(cls, text: str) -> "SignalDecoder":
+        """
+        Build decoder from DBC text (BO_, SG_ and GenMsgCycleTime BA_ lines,
+        other sections are ignored)
+        
+        Args:
+            text: DBC file content
+        """
+        messages = []
+        cycle_times: Dict[int, float] = {}
+        current = None
+        for line in text.splitlines():
+            line = line.strip()
+            match = _CYCLE_TIME_RE.match(line)
+            if match:
+                if int(match.group(2)) > 0:
+                    cycle_times[int(match.group(1)) & 0x1FFFFFFF] = int(match.group(2)) / 1000.0
+                continue
+            match = _MESSAGE_RE.match(line)
+            if match:
+                can_id = int(match.group(1)) & 0x1FFFFFFF  # strip DBC extended flag
+                current = (can_id, match.group(2), [])
+                messages.append(current)
+                continue
+            match = _SIGNAL_RE.match(line)
+            if match and current is not None:
+                name, start, length, order, sign, scale, offset, minimum, maximum, unit = match.groups()
+                minimum, maximum = float(minimum), float(maximum)
+                has_range = not (minimum == 0 and maximum == 0)
+                current[2].append(Signal(
+                    name, int(start), int(length),
+                    little_endian=(order == "1"), signed=(sign == "-"),
+                    scale=float(scale), offset=float(offset),
+                    minimum=minimum if has_range else None,
+                    maximum=maximum if has_range else None,
+                    unit=unit,
+                ))
+        return cls([MessageDecoder(can_id, name, signals, cycle_times.get(can_id))
+                    for can_id, name, signals in messages])
+    
+    @classmethod
+    def from_json(cls, definition: Dict) -> "SignalDecoder":
+        """
+        Build decoder from a JSON definition
+        
+        Args:
+            definition: {"messages": [{"id": "0x400", "name": ..., "cycle_time_ms": 200, "signals": [{...}]}]}
+        """
+        messages = []
+        for message in definition.get("messages", []):
+            can_id = message["id"]
+            if isinstance(can_id, str):
+                can_id = int(can_id, 0)
+            signals = [
+                Signal(
+                    s["name"], s["start_bit"], s["length"],
+                    little_endian=s.get("byte_order", "little_endian") == "little_endian",
+                    signed=s.get("signed", False),
+                    scale=s.get("scale", 1.0), offset=s.get("offset", 0.0),
+                    minimum=s.get("min"), maximum=s.get("max"),
+                    unit=s.get("unit", ""),
+                )
+                for s in message.get("signals", [])
+            ]
+            cycle_time = message.get("cycle_time_ms")
+            messages.append(MessageDecoder(can_id, message.get("name", f"0x{can_id:03X}"), signals,
+                                           cycle_time / 1000.0 if cycle_time else None))
+        return cls(messages)
+    
+    def cycle_times(self) -> Dict[int, float]:
+        """Send period in seconds of every periodic message (event-driven IDs are left out)"""
+        return {can_id: m.cycle_time for can_id, m in self.messages.items() if m.cycle_time}
+    
+    def get(self, can_id: int) -> Optional[MessageDecoder]:
+        """Get the decoder for a CAN ID (None if the ID carries no known signals)"""
+        return self.messages.get(can_id)
+    
+    def decode(self, can_id: int, data: bytes) -> Dict[str, float]:
+        """
+        Decode a frame into a {signal: value} dict
+        
+        Args:
+            can_id: CAN ID
+            data: Payload bytes
+        
+        Returns:
+            Decoded signals (empty if the ID is unknown)
+        """
+        message = self.messages.get(can_id)
+        if message is None:
+            return {}
+        return {name: value for name, value in zip(message.names, message.decode(data)) if value is not None}
+
+
+if __name__ == "__main__":
+    decoder = SignalDecoder.load()
+    print("Loaded signal map:")
+    for can_id, message in sorted(decoder.messages.items()):
+        print(f"  0x{can_id:03X} {message.name}: {', '.join(message.names)}")
+    
+    print("\nDecoding 0x400 [04 FF 00 E6]:")
+    print(f"  {decoder.decode(0x400, bytes([0x04, 0xFF, 0x00, 0xE6]))}")
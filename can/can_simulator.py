@@ -11,6 +11,9 @@ import threading
 from typing import Dict, List
 from datetime import datetime
 from can.can_utils import CANInterface
+from common.log import get_logger
+
+logger = get_logger("can.simulator")
 
 
 class CANTrafficSimulator:
@@ -33,17 +36,17 @@ class CANTrafficSimulator:
             0x100: (10, lambda: [0x01, random.randint(0, 100), 0x00, 0x00]),  # Battery status
             0x200: (1, lambda: [0x02, 0x00, 0x00, 0x00]),                      # Charge control
             0x300: (1, lambda: [0x03, random.randint(20, 80), 0x00, 0x00]),   # Temperature
-            0x400: (5, lambda: [0x04, random.randint(0, 255), random.randint(0, 255), 0x00]),  # Voltage/Current
+            0x400: (5, lambda: [0x04, random.randint(0, 80), 0x00, random.randint(220, 240)]),  # Voltage/Current (see ev_charger.dbc)
         }
     
     def start(self):
         """Start generating traffic"""
         if not self.can_if.connect():
-            print("[SIMULATOR ERROR] Failed to connect to CAN bus")
+            logger.error("[SIMULATOR ERROR] Failed to connect to CAN bus")
             return False
         
         self.running = True
-        print(f"[SIMULATOR] Starting CAN traffic simulation on {self.interface}")
+        logger.info("[SIMULATOR] Starting CAN traffic simulation on %s", self.interface)
         
         # Start a thread for each traffic pattern
         for can_id, (rate, data_gen) in self.traffic_patterns.items():
@@ -54,13 +57,13 @@ class CANTrafficSimulator:
             )
             thread.start()
             self.threads.append(thread)
-            print(f"[SIMULATOR] Started traffic for CAN ID 0x{can_id:03X} at {rate} Hz")
+            logger.info("[SIMULATOR] Started traffic for CAN ID 0x%03X at %s Hz", can_id, rate)
         
         return True
     
     def stop(self):
         """Stop generating traffic"""
-        print("[SIMULATOR] Stopping traffic simulation...")
+        logger.info("[SIMULATOR] Stopping traffic simulation...")
         self.running = False
         
         # Wait for threads to finish
@@ -68,7 +71,7 @@ class CANTrafficSimulator:
             thread.join(timeout=2.0)
         
         self.can_if.disconnect()
-        print("[SIMULATOR] Traffic simulation stopped")
+        logger.info("[SIMULATOR] Traffic simulation stopped")
     
     def _generate_traffic(self, can_id: int, rate: float, data_generator):
         """
@@ -106,7 +109,7 @@ class CANTrafficSimulator:
             )
             thread.start()
             self.threads.append(thread)
-            print(f"[SIMULATOR] Added traffic for CAN ID 0x{can_id:03X} at {rate} Hz")
+            logger.info("[SIMULATOR] Added traffic for CAN ID 0x%03X at %s Hz", can_id, rate)
 
 
 def generate_normal_traffic(duration: float = 60.0, interface: str = 'vcan0'):
@@ -120,11 +123,11 @@ def generate_normal_traffic(duration: float = 60.0, interface: str = 'vcan0'):
     simulator = CANTrafficSimulator(interface)
     
     if simulator.start():
-        print(f"[SIMULATOR] Generating normal traffic for {duration} seconds...")
+        logger.info("[SIMULATOR] Generating normal traffic for %s seconds...", duration)
         try:
             time.sleep(duration)
         except KeyboardInterrupt:
-            print("\n[SIMULATOR] Interrupted by user")
+            logger.info("[SIMULATOR] Interrupted by user")
         finally:
             simulator.stop()
 
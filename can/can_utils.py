@@ -8,11 +8,20 @@ This module provides utilities for CAN bus communication including:
 """
 
 import can
+import logging
+import os
 import time
 import sys
 from typing import Optional, List, Callable
 from datetime import datetime
 
+# Appended, not inserted: "import can" above must keep resolving to python-can
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.log import get_logger
+
+logger = get_logger("can")
+
 
 class CANInterface:
     """Manages CAN bus interface operations"""
@@ -38,18 +47,18 @@ class CANInterface:
         """
         try:
             self.bus = can.interface.Bus(self.interface, bustype=self.bustype)
-            print(f"[CAN] Connected to {self.interface}")
+            logger.info("[CAN] Connected to %s", self.interface)
             return True
         except OSError as e:
-            print(f"[CAN ERROR] Failed to connect to {self.interface}: {e}")
-            print(f"[CAN ERROR] Make sure vcan0 is set up: sudo modprobe vcan && sudo ip link add dev vcan0 type vcan && sudo ip link set up vcan0")
+            logger.error("[CAN ERROR] Failed to connect to %s: %s", self.interface, e)
+            logger.error("[CAN ERROR] Make sure vcan0 is set up: sudo modprobe vcan && sudo ip link add dev vcan0 type vcan && sudo ip link set up vcan0")
             return False
     
     def disconnect(self):
         """Disconnect from CAN bus"""
         if self.bus:
             self.bus.shutdown()
-            print(f"[CAN] Disconnected from {self.interface}")
+            logger.info("[CAN] Disconnected from %s", self.interface)
     
     def send_message(self, arbitration_id: int, data: List[int], 
                     extended: bool = False, log: bool = True) -> bool:
@@ -66,17 +75,17 @@ class CANInterface:
             True if message sent successfully, False otherwise
         """
         if not self.bus:
-            print("[CAN ERROR] Not connected to bus")
+            logger.error("[CAN ERROR] Not connected to bus")
             return False
         
         # Validate data
         if len(data) > 8:
-            print(f"[CAN ERROR] Data length {len(data)} exceeds maximum of 8 bytes")
+            logger.error("[CAN ERROR] Data length %d exceeds maximum of 8 bytes", len(data))
             return False
         
         for byte in data:
             if not 0 <= byte <= 255:
-                print(f"[CAN ERROR] Invalid byte value: {byte}")
+                logger.error("[CAN ERROR] Invalid byte value: %s", byte)
                 return False
         
         try:
@@ -87,14 +96,13 @@ class CANInterface:
             )
             self.bus.send(msg)
             
-            if log:
-                timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-                data_str = ' '.join([f'{b:02X}' for b in data])
-                print(f"[CAN TX] [{timestamp}] ID: 0x{arbitration_id:03X} Data: [{data_str}]")
+            # Nothing is formatted when the "can" logger is below INFO (or quiet)
+            if log and logger.isEnabledFor(logging.INFO):
+                logger.info("[CAN TX] ID: 0x%03X Data: [%s]", arbitration_id, ' '.join([f'{b:02X}' for b in data]))
             
             return True
         except Exception as e:
-            print(f"[CAN ERROR] Failed to send message: {e}")
+            logger.error("[CAN ERROR] Failed to send message: %s", e)
             return False
     
     def receive_message(self, timeout: float = 1.0) -> Optional[can.Message]:
@@ -108,14 +116,14 @@ class CANInterface:
             CAN message if received, None otherwise
         """
         if not self.bus:
-            print("[CAN ERROR] Not connected to bus")
+            logger.error("[CAN ERROR] Not connected to bus")
             return None
         
         try:
             msg = self.bus.recv(timeout=timeout)
             return msg
         except Exception as e:
-            print(f"[CAN ERROR] Failed to receive message: {e}")
+            logger.error("[CAN ERROR] Failed to receive message: %s", e)
             return None
     
     def listen(self, callback: Callable[[can.Message], None], 
@@ -129,10 +137,10 @@ class CANInterface:
             filter_id: Only process messages with this ID (None = all)
         """
         if not self.bus:
-            print("[CAN ERROR] Not connected to bus")
+            logger.error("[CAN ERROR] Not connected to bus")
             return
         
-        print(f"[CAN] Listening on {self.interface}...")
+        logger.info("[CAN] Listening on %s...", self.interface)
         start_time = time.time()
         
         try:
@@ -149,7 +157,7 @@ class CANInterface:
                     break
                     
         except KeyboardInterrupt:
-            print("\n[CAN] Listening stopped by user")
+            logger.info("[CAN] Listening stopped by user")
 
 
 class CANMessageLogger:
@@ -181,10 +189,10 @@ class CANMessageLogger:
             with open(self.log_file, 'a') as f:
                 f.write(log_line)
         except Exception as e:
-            print(f"[LOG ERROR] Failed to write to {self.log_file}: {e}")
+            logger.error("[LOG ERROR] Failed to write to %s: %s", self.log_file, e)
         
-        # Print to console
-        print(log_line.strip())
+        # Console copy goes through the non-blocking log queue
+        logger.info("%s | ID: 0x%03X | DLC: %d | Data: [%s]", direction, msg.arbitration_id, msg.dlc, data_str)
 
 
 def send_can_message(arbitration_id: int, data: List[int], 
@@ -0,0 +1 @@
+"""Shared Infrastructure for the CAN, OCPP and IDS Components"""
@@ -0,0 +1,206 @@
+"""
+Shared Logging
+
+One non-blocking logging layer for the CAN, OCPP and IDS components:
+- Component loggers ("can", "ocpp.server", "ocpp.client", "ids.alerts", ...)
+  under one "evcs" root, each with its own level
+- Callers only put records on a bounded queue; a listener thread formats
+  and writes them, so a slow terminal or journald pipe never stalls the
+  detection or server loops (a full queue drops records and counts them)
+- Messages use %-style arguments and are formatted on the listener thread;
+  suppressed levels (and quiet mode) cost one level check, no formatting
+
+Defaults come from the environment:
+    EVCS_LOG_LEVEL=INFO                      level of every component
+    EVCS_LOG_LEVELS=can=WARNING,ocpp=DEBUG   per-component levels
+    EVCS_LOG_QUIET=1                         errors only
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Dict, Optional, TextIO, Union
+
+
+ROOT = "evcs"
+# Components whose messages carry their own timestamp (alert lines)
+PLAIN_COMPONENTS = ("ids.alerts",)
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_DroppingQueueHandler"] = None
+_settings: Dict = {}  # arguments of the last configure() call, for set_quiet(False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener"""
+    
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, on the caller's thread
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Formatter(logging.Formatter):
+    """`HH:MM:SS.mmm message`, or the bare message for PLAIN_COMPONENTS"""
+    
+    def __init__(self):
+        super().__init__("%(asctime)s.%(msecs)03d %(message)s", "%H:%M:%S")
+        self._plain = tuple(f"{ROOT}.{component}" for component in PLAIN_COMPONENTS)
+    
+    def format(self, record: logging.LogRecord) -> str:
+        if record.name.startswith(self._plain):
+            return record.getMessage()
+        return super().format(record)
+
+
+def _level(value: Union[str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(value.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {value}")
+    return level
+
+
+def _env_levels() -> Dict[str, str]:
+    levels = {}
+    for item in os.environ.get("EVCS_LOG_LEVELS", "").split(","):
+        if "=" in item:
+            component, level = item.split("=", 1)
+            levels[component.strip()] = level
+    return levels
+
+
+def configure(level: Union[str, int, None] = None, levels: Optional[Dict[str, Union[str, int]]] = None,
+              quiet: Optional[bool] = None, stream: Optional[TextIO] = None, queue_size: int = 10000):
+    """
+    Set up (or reconfigure) the shared logging layer
+    
+    Args:
+        level: Level of every component (default: EVCS_LOG_LEVEL or INFO)
+        levels: Per-component levels, e.g. {"can": "WARNING", "ocpp.server": "DEBUG"}
+        quiet: Errors only, whatever the other levels say (default: EVCS_LOG_QUIET)
+        stream: Output stream (default: stdout)
+        queue_size: Records buffered for the listener before new ones are dropped
+    """
+    global _listener, _handler, _settings
+    _settings = {"level": level, "levels": levels, "stream": stream, "queue_size": queue_size}
+    if level is None:
+        level = os.environ.get("EVCS_LOG_LEVEL", "INFO")
+    if quiet is None:
+        quiet = os.environ.get("EVCS_LOG_QUIET", "") not in ("", "0")
+    levels = {**_env_levels(), **(levels or {})}
+    
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        root = logging.getLogger(ROOT)
+        root.propagate = False
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        
+        log_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(_Formatter())
+        _handler = _DroppingQueueHandler(log_queue)
+        root.addHandler(_handler)
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        
+        for name, logger in logging.Logger.manager.loggerDict.items():
+            if name.startswith(ROOT + ".") and isinstance(logger, logging.Logger):
+                logger.setLevel(logging.NOTSET)  # drop levels of an earlier configure()
+        root.setLevel(logging.ERROR if quiet else _level(level))
+        for component, component_level in levels.items():
+            logging.getLogger(f"{ROOT}.{component}").setLevel(
+                max(logging.ERROR, _level(component_level)) if quiet else _level(component_level))
+
+
+def set_level(component: str, level: Union[str, int]):
+    """
+    Change one component's level at runtime
+    
+    Args:
+        component: Component name ("can", "ocpp.server", ...; "" = all)
+        level: New level ("DEBUG", "INFO", "WARNING", "ERROR")
+    """
+    logging.getLogger(f"{ROOT}.{component}" if component else ROOT).setLevel(_level(level))
+
+
+def set_quiet(quiet: bool = True):
+    """Errors only for every component (False restores the levels of the last configure())"""
+    if quiet:
+        logging.getLogger(ROOT).setLevel(logging.ERROR)
+        for name, logger in logging.Logger.manager.loggerDict.items():
+            if name.startswith(ROOT + ".") and isinstance(logger, logging.Logger) and logger.level:
+                logger.setLevel(max(logger.level, logging.ERROR))
+    else:
+        configure(**_settings, quiet=False)
+
+
+def get_logger(component: str) -> logging.Logger:
+    """
+    Logger of a component (sets up the layer on first use)
+    
+    Args:
+        component: Component name, e.g. "can" or "ocpp.server"
+    """
+    if _handler is None:
+        configure()
+    return logging.getLogger(f"{ROOT}.{component}")
+
+
+def dropped() -> int:
+    """Records dropped because the listener fell behind"""
+    return _handler.dropped if _handler is not None else 0
+
+
+def shutdown():
+    """Write queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown)
+
+
+if __name__ == "__main__":
+    import time
+    
+    configure(levels={"can": "WARNING"})
+    can_log = get_logger("can")
+    server_log = get_logger("ocpp.server")
+    
+    server_log.info("[OCPP] BootNotification accepted - Firmware: %s", "v1.6-release")
+    start = time.perf_counter()
+    for i in range(100000):
+        can_log.info("[CAN TX] ID: 0x%03X Data: [%s]", 0x100, "01 02")  # suppressed: level check only
+    suppressed = time.perf_counter() - start
+    print(f"Suppressed call: {suppressed / 100000 * 1e6:.2f} us")
+    
+    configure(stream=open(os.devnull, "w"))
+    start = time.perf_counter()
+    for i in range(10000):
+        server_log.info("[OCPP] MeterValues - Connector: %d, Values: %s", 1, "230.0 V")
+    print(f"Enabled call (queued): {(time.perf_counter() - start) / 10000 * 1e6:.2f} us, dropped {dropped()}")
+    shutdown()
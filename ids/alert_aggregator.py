@@ -0,0 +1,224 @@
+"""
+Alert Aggregation
+
+Sits between the detectors and AlertLogger so an attack cannot turn into
+an alert (and safe-mode) storm:
+- Repeated alerts with the same key (type, CAN ID, charge point,
+  connector) inside a window collapse into one group: the first alert
+  passes through, the rest are counted and reported once as a summary
+  with count, first-seen and last-seen times
+- Per-type rate limits cap how many new groups a type may open per
+  second (e.g. spoofed CAN ID floods that produce a new key per frame)
+"""
+
+import heapq
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+_CAN_ID_RE = re.compile(r"\b(?:CAN ID|CAN|ID)[ _]0x([0-9A-Fa-f]+)")
+_LEVEL_RANK = {"INFO": 0, "WARNING": 1, "CRITICAL": 2}
+# Marks the per-type group of rate-limited alerts, so it never shares the
+# key of a real alert without CAN ID, charge point or connector
+_RATE_LIMITED = "__rate_limited__"
+
+Key = Tuple[str, Optional[object], Optional[str], Optional[int]]  # CAN ID or _RATE_LIMITED
+
+
+class AlertGroup:
+    """Alerts collapsed under one key during one window"""
+    
+    __slots__ = ("key", "level", "first_seen", "last_seen", "count", "last_message", "announced")
+    
+    def __init__(self, key: Key, level, timestamp: float, message: str, announced: bool = True):
+        self.key = key
+        self.level = level
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.count = 1
+        self.last_message = message
+        self.announced = announced  # False: opened by an alert the type's rate limit dropped
+
+
+class AlertAggregator:
+    """Windowed deduplication and per-type rate limiting of alerts"""
+    
+    def __init__(self, window_seconds: float = 5.0, windows: Optional[Dict[str, float]] = None,
+                 rate_limits: Optional[Dict[str, float]] = None, default_rate: Optional[float] = None):
+        """
+        Initialize aggregator
+        
+        Args:
+            window_seconds: Aggregation window for types without their own
+            windows: Per anomaly type windows {"Frequency Spike": 10.0}
+            rate_limits: New alert groups per second allowed per anomaly type
+            default_rate: Rate limit for types without their own (None = unlimited)
+        """
+        self.window_seconds = window_seconds
+        self.windows = windows or {}
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        
+        self.groups: Dict[Key, AlertGroup] = {}
+        self._expiry: List[Tuple[float, int, Key]] = []  # heap of (expires at, sequence, key)
+        self._sequence = 0
+        self._buckets: Dict[str, List[float]] = {}  # type: [tokens, last refill]
+        self._lock = threading.Lock()
+        
+        self.passed = 0
+        self.aggregated = 0
+        self.rate_limited = 0
+    
+    def _key(self, message: str, anomaly_type: str, can_id: Optional[int], charge_point_id: Optional[str],
+             connector_id: Optional[int]) -> Key:
+        if can_id is None and charge_point_id is None:
+            match = _CAN_ID_RE.search(message)
+            if match:
+                can_id = int(match.group(1), 16)
+        return anomaly_type, can_id, charge_point_id, connector_id
+    
+    def _take_token(self, anomaly_type: str, now: float) -> bool:
+        """Token bucket per type (burst = one second of the rate, at least 1)"""
+        rate = self.rate_limits.get(anomaly_type, self.default_rate)
+        if rate is None:
+            return True
+        burst = max(1.0, rate)
+        bucket = self._buckets.get(anomaly_type)
+        if bucket is None:
+            bucket = self._buckets[anomaly_type] = [burst, now]
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return True
+        return False
+    
+    def _open(self, key: Key, group: AlertGroup):
+        self.groups[key] = group
+        self._sequence += 1
+        window = self.windows.get(key[0], self.window_seconds)
+        heapq.heappush(self._expiry, (group.first_seen + window, self._sequence, key))
+    
+    def submit(self, message: str, anomaly_type: str, level, timestamp: Optional[float] = None,
+               can_id: Optional[int] = None, charge_point_id: Optional[str] = None,
+               connector_id: Optional[int] = None) -> bool:
+        """
+        Decide whether an alert is new or a repeat
+        
+        Args:
+            message: Alert message
+            anomaly_type: Type of anomaly
+            level: AlertLevel of the alert
+            timestamp: Alert time (default: now)
+            can_id: CAN ID (parsed from the message if None)
+            charge_point_id: Charge point
+            connector_id: Connector
+        
+        Returns:
+            True if the alert should be logged (and acted on) now,
+            False if it was folded into an open group
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        key = self._key(message, anomaly_type, can_id, charge_point_id, connector_id)
+        
+        with self._lock:
+            group = self.groups.get(key)
+            if group is None and not self._take_token(anomaly_type, timestamp):
+                # Over the type's rate: count under one per-type group instead of one per key
+                key = (anomaly_type, _RATE_LIMITED, None, None)
+                group = self.groups.get(key)
+                self.rate_limited += 1
+                if group is None:
+                    self._open(key, AlertGroup(key, level, timestamp, message, announced=False))
+                    return False
+            elif group is None:
+                self._open(key, AlertGroup(key, level, timestamp, message))
+                self.passed += 1
+                return True
+            else:
+                self.aggregated += 1
+            
+            group.count += 1
+            group.last_seen = timestamp
+            group.last_message = message
+            if _LEVEL_RANK.get(level.value, 0) > _LEVEL_RANK.get(group.level.value, 0):
+                group.level = level
+            return False
+    
+    def expire(self, now: Optional[float] = None) -> List[Dict]:
+        """
+        Close groups whose window has passed
+        
+        Args:
+            now: Current time (default: now)
+        
+        Returns:
+            Summary alerts (AlertLogger entries) for groups that absorbed repeats
+        """
+        if now is None:
+            now = time.time()
+        # Summaries are stamped with the time they are written, so the alert
+        # stream stays in time order (first_seen/last_seen are in details)
+        written = now if now != float("inf") else time.time()
+        summaries = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, _, key = heapq.heappop(self._expiry)
+                group = self.groups.pop(key, None)
+                if group is not None:
+                    summary = self._summary(group, written)
+                    if summary is not None:
+                        summaries.append(summary)
+        return summaries
+    
+    def flush(self) -> List[Dict]:
+        """Close every open group (shutdown)"""
+        return self.expire(float("inf"))
+    
+    def _summary(self, group: AlertGroup, written: float) -> Optional[Dict]:
+        """Summary alert of a closed group (None if nothing was suppressed)"""
+        anomaly_type, can_id, charge_point_id, connector_id = group.key
+        if not group.announced:
+            can_id = None
+        suppressed = group.count - 1 if group.announced else group.count
+        if suppressed == 0:
+            return None
+        what = "repeated" if group.announced else "rate-limited"
+        message = (f"{suppressed} {what} {anomaly_type} alerts aggregated in "
+                   f"{group.last_seen - group.first_seen:.1f}s - last: {group.last_message}")
+        return {
+            "ts": max(written, group.last_seen),
+            "level": group.level,
+            "type": anomaly_type,
+            "message": message,
+            "details": {"count": suppressed, "first_seen": round(group.first_seen, 6),
+                        "last_seen": round(group.last_seen, 6), "rate_limited": not group.announced},
+            "can_id": can_id,
+            "charge_point": charge_point_id,
+            "connector": connector_id,
+        }
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Alerts passed, folded into groups, and dropped by rate limits"""
+        return {"passed": self.passed, "aggregated": self.aggregated,
+                "rate_limited": self.rate_limited, "open_groups": len(self.groups)}
+
+
+if __name__ == "__main__":
+    from enum import Enum
+    
+    class Level(Enum):
+        WARNING = "WARNING"
+    
+    aggregator = AlertAggregator(window_seconds=5.0, rate_limits={"Unknown CAN ID": 5.0})
+    now = time.time()
+    logged = sum(aggregator.submit("Frequency spike detected on CAN ID 0x9FF", "Frequency Spike",
+                                   Level.WARNING, now + i * 0.01) for i in range(300))
+    logged += sum(aggregator.submit(f"Unknown CAN ID 0x{0x600 + i:03X}", "Unknown CAN ID",
+                                    Level.WARNING, now + i * 0.001) for i in range(1000))
+    print(f"Logged {logged} of 1300 alerts: {aggregator.get_stats()}")
+    for summary in aggregator.flush():
+        print(summary["message"])
@@ -0,0 +1,305 @@
+"""
+Multi-Process Alert Statistics
+
+Alert counters that several IDS processes (sharded or multi-bus
+deployments, or an IDS next to a scenario run) can keep in one log
+directory without overwriting each other:
+- Inside a process every thread counts into its own dict, so counting
+  takes no lock; snapshots sum the per-thread dicts
+- Every process writes only its own shard file (ids_stats.d/<host>-<pid>-<start>.json,
+  replaced atomically), so writers never race
+- merge_stats() sums all shards on read; shards of processes that have
+  exited are folded into base.json at startup so the directory stays small
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks: shards of finished processes are kept, not folded
+    fcntl = None
+
+
+STATS_DIR = "ids_stats.d"
+BASE_FILE = "base.json"
+LEVELS = ("INFO", "WARNING", "CRITICAL")
+
+
+class ShardedCounters:
+    """Counters with one private dict per thread; increments take no lock"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[str, int]] = []
+        self._lock = threading.Lock()  # only taken when a thread counts for the first time
+    
+    def _shard(self) -> Dict[str, int]:
+        shard: Dict[str, int] = {}
+        with self._lock:
+            self._shards.append(shard)
+        self._local.counts = shard
+        return shard
+    
+    def add(self, key: str, count: int = 1):
+        """Add to a counter (only the calling thread writes its dict)"""
+        try:
+            shard = self._local.counts
+        except AttributeError:
+            shard = self._shard()
+        shard[key] = shard.get(key, 0) + count
+    
+    def snapshot(self) -> Dict[str, int]:
+        """Sum of all threads' counters"""
+        with self._lock:
+            shards = list(self._shards)
+        totals: Dict[str, int] = {}
+        for shard in shards:
+            for key, count in shard.copy().items():
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+
+def counts_to_stats(counts: Dict[str, int]) -> Dict:
+    """
+    Nested statistics (the ids_stats.json layout) from flat counters
+    
+    Keys are "total_alerts", "alerts_dropped", "alerts_aggregated",
+    "level:<LEVEL>" and "type:<anomaly type>".
+    """
+    stats = {
+        "total_alerts": counts.get("total_alerts", 0),
+        "alerts_by_level": {level: counts.get(f"level:{level}", 0) for level in LEVELS},
+        "alerts_by_type": {},
+        "alerts_dropped": counts.get("alerts_dropped", 0),
+        "alerts_aggregated": counts.get("alerts_aggregated", 0),
+    }
+    for key, count in sorted(counts.items(), key=lambda item: -item[1]):
+        if key.startswith("type:"):
+            stats["alerts_by_type"][key[5:]] = count
+    return stats
+
+
+def _add_counts(totals: Dict[str, int], counts: Dict[str, int]):
+    for key, count in counts.items():
+        totals[key] = totals.get(key, 0) + count
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, data: Dict):
+    """Write via a temp file and rename, so readers see the old or the new file"""
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+class StatsShard:
+    """This process's shard of the statistics in a log directory"""
+    
+    def __init__(self, log_dir: str = "logs"):
+        """
+        Args:
+            log_dir: Log directory shared by all IDS processes
+        """
+        self.directory = os.path.join(log_dir, STATS_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.counters = ShardedCounters()
+        self.session_start = datetime.now().isoformat()
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.path = os.path.join(self.directory, f"{self.host}-{self.pid}-{int(time.time() * 1000)}.json")
+        compact_stats(log_dir)
+    
+    def add(self, key: str, count: int = 1):
+        self.counters.add(key, count)
+    
+    def stats(self) -> Dict:
+        """This process's statistics"""
+        stats = counts_to_stats(self.counters.snapshot())
+        stats["session_start"] = self.session_start
+        return stats
+    
+    def save(self):
+        """Replace this process's shard file"""
+        _write_json(self.path, {"host": self.host, "pid": self.pid, "session_start": self.session_start,
+                                "updated": datetime.now().isoformat(), "counts": self.counters.snapshot()})
+
+
+def _shard_alive(name: str) -> bool:
+    """True unless the shard belongs to a process on this host that has exited"""
+    try:
+        host, pid, _ = name[:-len(".json")].rsplit("-", 2)
+        pid = int(pid)
+    except ValueError:
+        return True
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists, owned by another user
+    return True
+
+
+def _shard_names(directory: str) -> List[str]:
+    try:
+        return sorted(name for name in os.listdir(directory) if name.endswith(".json") and name != BASE_FILE)
+    except FileNotFoundError:
+        return []
+
+
+def merge_stats(log_dir: str = "logs", attempts: int = 3) -> Dict:
+    """
+    Statistics of all IDS processes that used a log directory
+    
+    Each shard file is replaced atomically, so every process contributes
+    a complete snapshot. A shard folded into base.json while reading is
+    detected and the merge is retried.
+    
+    Args:
+        log_dir: Log directory
+        attempts: Retries if a shard disappears mid-read
+    
+    Returns:
+        Merged statistics (ids_stats.json layout) plus "processes" (shards
+        merged), "running" (processes still alive) and "session_start"
+        (earliest shard)
+    """
+    directory = os.path.join(log_dir, STATS_DIR)
+    for _ in range(attempts):
+        names = _shard_names(directory)
+        base = _read_json(os.path.join(directory, BASE_FILE)) or {}
+        folded = set(base.get("folded", []))
+        totals = dict(base.get("counts", {}))
+        starts = [base["session_start"]] if base.get("session_start") else []
+        processes, running, complete = base.get("processes", 0), 0, True
+        for name in names:
+            if name in folded:
+                continue
+            try:
+                shard = _read_json(os.path.join(directory, name))
+            except ValueError:
+                shard = None  # being written on a filesystem without atomic rename
+            if shard is None:
+                complete = False
+                break
+            _add_counts(totals, shard.get("counts", {}))
+            starts.append(shard.get("session_start", ""))
+            processes += 1
+            running += _shard_alive(name)
+        if complete:
+            break
+    stats = counts_to_stats(totals)
+    stats["processes"] = processes
+    stats["running"] = running
+    stats["session_start"] = min((start for start in starts if start), default=None)
+    return stats
+
+
+def compact_stats(log_dir: str = "logs") -> int:
+    """
+    Fold shards of exited processes (on this host) into base.json
+    
+    base.json records which shards it contains before they are deleted,
+    so a crash in between never counts a shard twice. Needs advisory file
+    locks (fcntl); elsewhere shards are simply kept.
+    
+    Returns:
+        Number of folded shards
+    """
+    directory = os.path.join(log_dir, STATS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        _import_legacy(log_dir, directory)
+        return 0
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _import_legacy(log_dir, directory)
+        base_path = os.path.join(directory, BASE_FILE)
+        base = _read_json(base_path) or {"counts": {}, "folded": [], "processes": 0, "session_start": None}
+        names = _shard_names(directory)
+        # Shards already in the base but not yet deleted (previous compaction interrupted)
+        folded = [name for name in base.get("folded", []) if name in names]
+        new = []
+        for name in names:
+            if name in folded or _shard_alive(name):
+                continue
+            try:
+                shard = _read_json(os.path.join(directory, name))
+            except ValueError:
+                continue
+            if shard is None:
+                continue
+            _add_counts(base["counts"], shard.get("counts", {}))
+            base["processes"] = base.get("processes", 0) + 1
+            start = shard.get("session_start")
+            if start and (not base.get("session_start") or start < base["session_start"]):
+                base["session_start"] = start
+            new.append(name)
+        if new or len(folded) != len(base.get("folded", [])):
+            base["folded"] = folded + new
+            _write_json(base_path, base)
+        for name in folded + new:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        return len(new)
+
+
+def _import_legacy(log_dir: str, directory: str):
+    """Seed base.json with the per-type counts of a pre-shard ids_stats.json"""
+    legacy = os.path.join(log_dir, "ids_stats.json")
+    base_path = os.path.join(directory, BASE_FILE)
+    if os.path.exists(base_path) or not os.path.exists(legacy):
+        return
+    try:
+        saved = _read_json(legacy) or {}
+    except ValueError:
+        return
+    if "processes" in saved:
+        return  # already a merged view
+    counts = {f"type:{name}": count for name, count in saved.get("alerts_by_type", {}).items()}
+    _write_json(base_path, {"counts": counts, "folded": [], "processes": 0,
+                            "session_start": saved.get("session_start")})
+
+
+def _demo_worker(log_dir: str, worker_id: int):
+    shard = StatsShard(log_dir)
+    for i in range(10000):
+        shard.add("total_alerts")
+        shard.add("level:WARNING")
+        shard.add(f"type:Worker {worker_id}")
+        if i % 1000 == 0:
+            shard.save()
+    shard.save()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import sys
+    import tempfile
+    
+    log_dir = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp()
+    processes = [multiprocessing.Process(target=_demo_worker, args=(log_dir, n)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(f"Before compaction: {json.dumps(merge_stats(log_dir))}")
+    print(f"Folded {compact_stats(log_dir)} finished shards")
+    print(f"After compaction:  {json.dumps(merge_stats(log_dir))}")
@@ -0,0 +1,192 @@
+"""
+Indexed Alert Store
+
+SQLite (WAL mode) history of structured alerts for fast lookups:
+- Indexed by time, anomaly type, level, CAN ID and charge point
+- Batches from the AlertLogger writer thread are inserted in one transaction
+- Queries use their own connection, so they do not wait for writes
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    level TEXT NOT NULL,
+    type TEXT NOT NULL,
+    anomaly INTEGER,
+    can_id INTEGER,
+    charge_point TEXT,
+    connector INTEGER,
+    message TEXT NOT NULL,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_ts ON alerts (ts);
+CREATE INDEX IF NOT EXISTS alerts_type_ts ON alerts (type, ts);
+CREATE INDEX IF NOT EXISTS alerts_level_ts ON alerts (level, ts);
+CREATE INDEX IF NOT EXISTS alerts_can_id_ts ON alerts (can_id, ts);
+CREATE INDEX IF NOT EXISTS alerts_charge_point_ts ON alerts (charge_point, ts);
+"""
+
+COLUMNS = ["ts", "level", "type", "anomaly", "can_id", "charge_point", "connector", "message", "metrics"]
+
+
+class AlertStore:
+    """SQLite alert history with indexed time/type/level/CAN ID queries"""
+    
+    def __init__(self, path: str = "logs/ids_alerts.db", retention_days: Optional[float] = None):
+        """
+        Open (or create) the store
+        
+        Args:
+            path: Database file
+            retention_days: Delete alerts older than this when opening (None = keep all)
+        """
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        
+        if retention_days is not None:
+            self.prune(time.time() - retention_days * 86400.0)
+    
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        connection.row_factory = sqlite3.Row
+        return connection
+    
+    def add(self, records: Iterable[Dict]):
+        """
+        Insert structured alerts (see alerts.structure_alert) in one transaction
+        
+        Args:
+            records: Alert records
+        """
+        rows = [
+            (record["ts"], record["level"], record["type"], record.get("anomaly"), record.get("can_id"),
+             record.get("charge_point"), record.get("connector"), record["message"],
+             json.dumps(record["metrics"]) if record.get("metrics") else None)
+            for record in records
+        ]
+        if not rows:
+            return
+        with self._write_lock, self._writer:
+            self._writer.executemany(
+                f"INSERT INTO alerts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+    
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              types: Optional[Iterable[str]] = None, levels: Optional[Iterable[str]] = None,
+              can_id: Optional[int] = None, charge_point: Optional[str] = None,
+              limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        """
+        Find alerts
+        
+        Args:
+            since: Earliest ts (epoch seconds)
+            until: Latest ts
+            types: Anomaly types (e.g. ["Frequency Spike"])
+            levels: Alert levels (e.g. ["CRITICAL"])
+            can_id: CAN ID
+            charge_point: Charge point identity
+            limit: Most rows returned
+            newest_first: Order by descending time
+        
+        Returns:
+            Alert records, same fields as the JSON Lines stream
+        """
+        where, params = self._filters(since, until, types, levels, can_id, charge_point)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM alerts{where} ORDER BY ts {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._read_lock:
+            rows = self._reader.execute(sql, params).fetchall()
+        return [self._record(row) for row in rows]
+    
+    def count_by_type(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, int]:
+        """Number of alerts per anomaly type in a time range"""
+        where, params = self._filters(since, until)
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT type, COUNT(*) FROM alerts{where} GROUP BY type ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+    
+    def prune(self, before: float) -> int:
+        """
+        Delete alerts older than a timestamp
+        
+        Returns:
+            Number of deleted alerts
+        """
+        with self._write_lock, self._writer:
+            return self._writer.execute("DELETE FROM alerts WHERE ts < ?", (before,)).rowcount
+    
+    def __len__(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+    
+    def close(self):
+        """Close both connections"""
+        with self._write_lock:
+            self._writer.close()
+        with self._read_lock:
+            self._reader.close()
+    
+    @staticmethod
+    def _filters(since=None, until=None, types=None, levels=None, can_id=None, charge_point=None):
+        """WHERE clause and parameters; every condition is covered by an index"""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        for column, values in (("type", types), ("level", levels)):
+            if values is not None:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if can_id is not None:
+            clauses.append("can_id = ?")
+            params.append(can_id)
+        if charge_point is not None:
+            clauses.append("charge_point = ?")
+            params.append(charge_point)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = {column: row[column] for column in COLUMNS if row[column] is not None}
+        if "metrics" in record:
+            record["metrics"] = json.loads(record["metrics"])
+        return record
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    
+    store = AlertStore(os.path.join(tempfile.mkdtemp(), "ids_alerts.db"))
+    now = time.time()
+    store.add({"ts": now + i, "level": "WARNING", "type": "Frequency Spike" if i % 2 else "Replay Attack",
+               "message": f"alert {i}", "can_id": 0x9FF if i % 3 else 0x200} for i in range(10000))
+    
+    start = time.perf_counter()
+    found = store.query(since=now + 5000, until=now + 5100, types=["Frequency Spike"], can_id=0x9FF)
+    print(f"{len(store)} alerts stored, {len(found)} matched in {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(f"By type: {store.count_by_type()}")
+    store.close()
@@ -0,0 +1,326 @@
+"""
+Structured Alert Stream
+
+JSON Lines alert log for downstream tools (no regex parsing of text lines):
+- One compact JSON object per alert: ts, level, type, anomaly, message,
+  can_id, charge_point, connector, metrics
+- Segments rotate by size or age; rotated segments are gzip compressed
+  by a background thread
+- Retention by age and segment count
+- read_alerts() streams records across segments and skips segments
+  outside the requested time range without opening them
+"""
+
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.log import get_logger
+
+
+logger = get_logger("ids.alert_stream")
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 3600.0
+DEFAULT_RETENTION_DAYS = 30.0
+
+_SEGMENT_TIME = "%Y%m%dT%H%M%S"
+_SEGMENT_RE = re.compile(r"\.(\d{8}T\d{6})-(\d+)\.jsonl(\.gz)?$")
+
+
+def encode_record(record: Dict) -> str:
+    """One JSON line per alert (compact separators keep segments small)"""
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+class RotatingJSONLWriter:
+    """Size/time rotated JSON Lines file with background compression and retention
+    
+    The active segment is `path`; rotated segments are renamed to
+    `<name>.<start time>-<n>.jsonl` (start time = first record in the
+    segment) and compressed to `.jsonl.gz`. Only the thread that owns the
+    writer may call write(); compression runs on its own thread.
+    """
+    
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, max_age: float = DEFAULT_MAX_AGE,
+                 retention_days: Optional[float] = DEFAULT_RETENTION_DAYS,
+                 max_segments: Optional[int] = None, compress: bool = True):
+        """
+        Args:
+            path: Active segment (e.g. logs/ids_alerts.jsonl)
+            max_bytes: Rotate once the active segment reaches this size
+            max_age: Rotate once the active segment is this many seconds old
+            retention_days: Delete rotated segments older than this (None = keep)
+            max_segments: Keep at most this many rotated segments (None = no limit)
+            compress: gzip rotated segments
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retention_days = retention_days
+        self.max_segments = max_segments
+        self.compress = compress
+        
+        self._file = None
+        self._size = 0
+        self._started: Optional[float] = None  # timestamp of the first record in the active segment
+        self._compress_queue: "queue.Queue" = queue.Queue()
+        self._compressor: Optional[threading.Thread] = None
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._resume()
+    
+    def _resume(self):
+        """Pick up an active segment left by a previous run; queue leftovers for compression"""
+        if os.path.exists(self.path):
+            self._size = os.path.getsize(self.path)
+            self._started = _first_timestamp(self.path)
+        if self.compress:
+            for segment in self.segments():
+                if not segment.endswith(".gz") and segment != self.path:
+                    self._queue_compression(segment)
+        self._apply_retention()
+    
+    def write(self, records: Iterable[Dict]):
+        """Append records (one batch = one write call)"""
+        records = list(records)
+        if not records:
+            return
+        first_ts = records[0].get("ts", time.time())
+        if self._started is not None and (self._size >= self.max_bytes
+                                          or first_ts - self._started >= self.max_age):
+            self.rotate()
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+        if self._started is None:
+            self._started = first_ts
+        
+        text = "".join(encode_record(record) for record in records)
+        self._file.write(text)
+        self._file.flush()
+        self._size += len(text.encode("utf-8"))
+    
+    def rotate(self):
+        """Close the active segment and hand it to the compressor"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not os.path.exists(self.path) or self._size == 0:
+            return
+        
+        stem = self.path[:-len(".jsonl")] if self.path.endswith(".jsonl") else self.path
+        started = datetime.fromtimestamp(self._started or time.time()).strftime(_SEGMENT_TIME)
+        n = 0
+        while any(os.path.exists(f"{stem}.{started}-{n}.jsonl{suffix}") for suffix in ("", ".gz")):
+            n += 1
+        target = f"{stem}.{started}-{n}.jsonl"
+        os.replace(self.path, target)
+        self._size = 0
+        self._started = None
+        
+        if self.compress:
+            self._queue_compression(target)
+        else:
+            self._apply_retention()
+    
+    def _queue_compression(self, segment: str):
+        if self._compressor is None or not self._compressor.is_alive():
+            self._compressor = threading.Thread(target=self._run_compressor, name="alert-compressor", daemon=True)
+            self._compressor.start()
+        self._compress_queue.put(segment)
+    
+    def _run_compressor(self):
+        """Compressor thread: gzip rotated segments, then enforce retention"""
+        while True:
+            segment = self._compress_queue.get()
+            if segment is None:
+                self._compress_queue.task_done()
+                return
+            try:
+                _gzip_segment(segment)
+                self._apply_retention()
+            except OSError as e:
+                logger.warning("[ALERT STREAM] Could not compress %s: %s", segment, e)
+            finally:
+                self._compress_queue.task_done()
+    
+    def _apply_retention(self):
+        """Delete rotated segments past the age or count limit"""
+        rotated = [segment for segment in self.segments() if segment != self.path]
+        expired = []
+        if self.retention_days is not None:
+            cutoff = time.time() - self.retention_days * 86400.0
+            expired = [segment for segment in rotated if _mtime(segment) < cutoff]
+        if self.max_segments is not None:
+            kept = [segment for segment in rotated if segment not in expired]
+            expired += kept[:max(0, len(kept) - self.max_segments)]
+        for segment in expired:
+            try:
+                os.remove(segment)
+            except OSError:
+                pass
+    
+    def segments(self) -> List[str]:
+        """All segments, oldest first (the active segment last)"""
+        return list_segments(self.path)
+    
+    def close(self, timeout: float = 10.0):
+        """Close the active segment and wait for pending compressions"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._compressor is not None and self._compressor.is_alive():
+            self._compress_queue.put(None)
+            self._compressor.join(timeout)
+        self._compressor = None
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return float("inf")
+
+
+def _gzip_segment(segment: str):
+    """Compress a rotated segment in place (keeps its mtime for retention)"""
+    if not os.path.exists(segment):
+        return
+    stat = os.stat(segment)
+    with open(segment, "rb") as source, gzip.open(segment + ".gz.tmp", "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    os.utime(segment + ".gz.tmp", (stat.st_atime, stat.st_mtime))
+    os.replace(segment + ".gz.tmp", segment + ".gz")
+    os.remove(segment)
+
+
+def _first_timestamp(path: str) -> Optional[float]:
+    """ts of the first record of a segment (None if empty or unreadable)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            return float(json.loads(f.readline())["ts"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _segment_start(path: str) -> Optional[float]:
+    match = _SEGMENT_RE.search(path)
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1), _SEGMENT_TIME).timestamp()
+
+
+def list_segments(path: str) -> List[str]:
+    """
+    Segments of a stream, oldest first
+    
+    Args:
+        path: Active segment path (e.g. logs/ids_alerts.jsonl)
+    """
+    directory = os.path.dirname(path) or "."
+    stem = os.path.basename(path[:-len(".jsonl")] if path.endswith(".jsonl") else path)
+    rotated: List[Tuple[str, int, str]] = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if not name.startswith(stem + "."):
+                continue
+            match = _SEGMENT_RE.search(name)
+            if match and name[:match.start()] == stem:
+                rotated.append((match.group(1), int(match.group(2)), os.path.join(directory, name)))
+    segments = [segment for _, _, segment in sorted(rotated)]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def read_alerts(path: str, since: Optional[float] = None, until: Optional[float] = None,
+                types: Optional[Iterable[str]] = None, levels: Optional[Iterable[str]] = None,
+                can_id: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Stream alert records from all segments of a stream, oldest first
+    
+    A segment is only opened if its time span (its start until the next
+    segment's start) overlaps [since, until]. Type filters are checked on
+    the raw line before it is decoded.
+    
+    Args:
+        path: Active segment path
+        since: Earliest ts (epoch seconds)
+        until: Latest ts
+        types: Anomaly types to keep
+        levels: Alert levels to keep
+        can_id: CAN ID to keep
+    
+    Yields:
+        Alert records (dicts)
+    """
+    segments = list_segments(path)
+    starts = [_segment_start(segment) for segment in segments]
+    type_keys = None
+    if types is not None:
+        types = set(types)
+        type_keys = [f'"type":{json.dumps(t, ensure_ascii=False)}' for t in types]
+    levels = set(levels) if levels is not None else None
+    
+    for i, segment in enumerate(segments):
+        start = starts[i]
+        end = starts[i + 1] if i + 1 < len(starts) and starts[i + 1] is not None else None
+        # Segment names have whole-second resolution
+        if until is not None and start is not None and start > until:
+            break
+        if since is not None and end is not None and end + 1.0 < since:
+            continue
+        
+        opener = gzip.open if segment.endswith(".gz") else open
+        try:
+            with opener(segment, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if type_keys is not None and not any(key in line for key in type_keys):
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # partially written last line
+                    ts = record.get("ts", 0.0)
+                    if since is not None and ts < since:
+                        continue
+                    if until is not None and ts > until:
+                        continue  # writers may interleave slightly; the segment check above bounds the scan
+                    if levels is not None and record.get("level") not in levels:
+                        continue
+                    if can_id is not None and record.get("can_id") != can_id:
+                        continue
+                    yield record
+        except (OSError, EOFError) as e:
+            logger.warning("[ALERT STREAM] Could not read %s: %s", segment, e)
+
+
+if __name__ == "__main__":
+    import tempfile
+    
+    directory = tempfile.mkdtemp()
+    writer = RotatingJSONLWriter(os.path.join(directory, "ids_alerts.jsonl"), max_bytes=4096)
+    now = time.time()
+    for i in range(200):
+        writer.write([{"ts": now + i, "level": "WARNING", "type": "Frequency Spike",
+                       "message": f"spike {i}", "can_id": 0x9FF}])
+    writer.close()
+    
+    print(f"Segments in {directory}:")
+    for segment in writer.segments():
+        print(f"  {os.path.basename(segment)} ({os.path.getsize(segment)} bytes)")
+    selected = list(read_alerts(writer.path, since=now + 100, until=now + 109))
+    print(f"Records between +100 s and +109 s: {len(selected)}")
@@ -1,15 +1,38 @@
 """
 Alert and Logging System for IDS
 
-Handles alert generation, logging, and statistics tracking
+Handles alert generation, logging, and statistics tracking.
+Alerts are written by a background thread so detectors never wait on disk
+or on the console: as text lines (ids_alerts.log), as a structured,
+rotated JSON Lines stream (ids_alerts.jsonl, see alert_stream.py) and into
+an indexed SQLite store (ids_alerts.db, see alert_store.py), and published
+to live subscribers (see alert_bus.py).
 """
 
 import os
+import re
 import json
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from enum import Enum
 
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ids.alert_stream import RotatingJSONLWriter, DEFAULT_MAX_BYTES, DEFAULT_MAX_AGE, DEFAULT_RETENTION_DAYS
+from ids.alert_store import AlertStore
+from ids.alert_aggregator import AlertAggregator
+from ids.alert_bus import AlertBus
+from ids.alert_stats import StatsShard, merge_stats
+from ids.response import SecurityResponseHandler  # re-exported, lives in response.py
+from common.log import get_logger
+
 
 class AlertLevel(Enum):
     """Alert severity levels"""
@@ -18,58 +41,278 @@ class AlertLevel(Enum):
     CRITICAL = "CRITICAL"
 
 
+# Console output goes through the shared logging layer (see common/log.py)
+_console = get_logger("ids.alerts")
+_LOG_LEVELS = {AlertLevel.INFO: logging.INFO, AlertLevel.WARNING: logging.WARNING,
+               AlertLevel.CRITICAL: logging.CRITICAL}
+_COLORS = {
+    AlertLevel.INFO: "\033[94m",      # Blue
+    AlertLevel.WARNING: "\033[93m",   # Yellow
+    AlertLevel.CRITICAL: "\033[91m",  # Red
+}
+_RESET = "\033[0m"
+
+# Fields recovered from detector messages when the caller does not pass them
+_ANOMALY_RE = re.compile(r"ANOMALY (\d+):")
+_CAN_ID_RE = re.compile(r"\b(?:CAN ID|CAN|ID)[ _]0x([0-9A-Fa-f]+)")
+_CONNECTOR_RE = re.compile(r"connector (\d+)")
+_THRESHOLD_RE = re.compile(r"threshold: (-?\d+(?:\.\d+)?)")
+
+
+def structure_alert(record: Dict) -> Dict:
+    """
+    Build the JSON Lines record of an alert
+    
+    Explicit fields win; anomaly number, CAN ID, connector and detector
+    threshold are otherwise taken from the detector message.
+    
+    Args:
+        record: Alert as queued by AlertLogger.log_alert()
+    
+    Returns:
+        Record with ts, level, type, message and whichever of anomaly,
+        can_id, charge_point, connector, metrics are known
+    """
+    message = record["message"]
+    structured = {"ts": round(record["ts"], 6), "level": record["level"].value, "type": record["type"]}
+    
+    match = _ANOMALY_RE.search(message)
+    if match:
+        structured["anomaly"] = int(match.group(1))
+    structured["message"] = message
+    
+    can_id = record.get("can_id")
+    if can_id is None:
+        match = _CAN_ID_RE.search(message)
+        can_id = int(match.group(1), 16) if match else None
+    if can_id is not None:
+        structured["can_id"] = can_id
+    if record.get("charge_point") is not None:
+        structured["charge_point"] = record["charge_point"]
+    connector = record.get("connector")
+    if connector is None:
+        match = _CONNECTOR_RE.search(message)
+        connector = int(match.group(1)) if match else None
+    if connector is not None:
+        structured["connector"] = connector
+    
+    metrics = dict(record.get("details") or {})
+    match = _THRESHOLD_RE.search(message)
+    if match and "threshold" not in metrics:
+        metrics["threshold"] = float(match.group(1))
+    if metrics:
+        structured["metrics"] = metrics
+    return structured
+
+
 class AlertLogger:
-    """Manages alert logging and statistics"""
+    """Manages alert logging and statistics
     
-    def __init__(self, log_dir: str = "logs"):
+    log_alert() only formats the line, counts it and queues it. A writer
+    thread drains the queue in batches into a log file it keeps open,
+    prints them, and saves the statistics every stats_interval seconds and
+    on close(). If the queue is full the line is dropped (and counted)
+    rather than blocking the caller.
+    """
+    
+    def __init__(self, log_dir: str = "logs", queue_size: int = 10000,
+                 stats_interval: float = 1.0, batch_size: int = 512,
+                 structured: bool = True, rotate_bytes: int = DEFAULT_MAX_BYTES,
+                 rotate_seconds: float = DEFAULT_MAX_AGE,
+                 retention_days: Optional[float] = DEFAULT_RETENTION_DAYS,
+                 indexed: bool = True, tail_size: int = 1000,
+                 aggregator: Optional[AlertAggregator] = None, bus: Optional[AlertBus] = None):
         """
         Initialize alert logger
         
         Args:
             log_dir: Directory for log files
+            queue_size: Alerts buffered for the writer thread before new ones are dropped
+            stats_interval: Seconds between writes of the statistics file
+            batch_size: Most alerts written per file write
+            structured: Also write the JSON Lines stream (ids_alerts.jsonl)
+            rotate_bytes: Rotate the JSON Lines stream at this size
+            rotate_seconds: Rotate the JSON Lines stream at this age
+            retention_days: Delete compressed segments and stored alerts older than this (None = keep all)
+            indexed: Also insert alerts into the SQLite store (ids_alerts.db)
+            tail_size: Recent alerts kept in memory for get_recent_alerts()
+            aggregator: Collapses repeated alerts and applies per-type rate limits
+                (None = log every alert)
+            bus: Alert bus the writer thread publishes structured alerts to
         """
         self.log_dir = log_dir
         self.alert_log_file = os.path.join(log_dir, "ids_alerts.log")
+        self.alert_stream_file = os.path.join(log_dir, "ids_alerts.jsonl")
+        self.alert_db_file = os.path.join(log_dir, "ids_alerts.db")
         self.stats_file = os.path.join(log_dir, "ids_stats.json")
+        self.stats_interval = stats_interval
+        self.batch_size = batch_size
         
         # Ensure log directory exists
         os.makedirs(log_dir, exist_ok=True)
         
-        # Statistics
-        self.stats = {
-            "total_alerts": 0,
-            "alerts_by_level": {level.value: 0 for level in AlertLevel},
-            "alerts_by_type": {},
-            "session_start": datetime.now().isoformat()
-        }
+        self.stream: Optional[RotatingJSONLWriter] = None
+        if structured:
+            self.stream = RotatingJSONLWriter(self.alert_stream_file, rotate_bytes, rotate_seconds, retention_days)
+        self.store: Optional[AlertStore] = None
+        if indexed:
+            self.store = AlertStore(self.alert_db_file, retention_days)
+        self._tail: deque = deque(maxlen=tail_size)
+        self.aggregator = aggregator
+        self.bus = bus
+        
+        # Statistics: this process's shard (per-thread counters, own file under
+        # ids_stats.d/); ids_stats.json is the merged view of every process
+        self.stats_shard = StatsShard(log_dir)
+        self._stats_dirty = False
         
-        # Load existing stats if available
-        self._load_stats()
+        # Background writer
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run_writer, name="alert-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def _save_stats(self):
+        """Save this process's shard, then the merged view (each written to a temp file, then renamed)"""
+        self._stats_dirty = False
+        try:
+            self.stats_shard.save()
+            text = json.dumps(merge_stats(self.log_dir), indent=2)
+            with open(self.stats_file + ".tmp", 'w') as f:
+                f.write(text)
+            os.replace(self.stats_file + ".tmp", self.stats_file)
+        except Exception as e:
+            _console.warning("[ALERT LOGGER] Warning: Could not save stats: %s", e)
     
-    def _load_stats(self):
-        """Load statistics from file"""
-        if os.path.exists(self.stats_file):
+    def _run_writer(self):
+        """Writer thread: batch queued alerts to disk and console, save stats periodically"""
+        next_stats = time.monotonic() + self.stats_interval
+        running = True
+        while running:
             try:
-                with open(self.stats_file, 'r') as f:
-                    saved_stats = json.load(f)
-                    # Merge with current stats
-                    self.stats["alerts_by_type"] = saved_stats.get("alerts_by_type", {})
+                batch = [self._queue.get(timeout=max(0.0, next_stats - time.monotonic()))]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            entries, flushed = [], []
+            for item in batch:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    entries.append(item)
+            if self.aggregator is not None:
+                summaries = self.aggregator.flush() if not running else self.aggregator.expire()
+                self._tail.extend(summaries)
+                entries.extend(summaries)
+            if entries:
+                self._write_entries(entries)
+            
+            if not running or time.monotonic() >= next_stats:
+                if self._stats_dirty:
+                    self._save_stats()
+                next_stats = time.monotonic() + self.stats_interval
+            for event in flushed:
+                event.set()
+    
+    @staticmethod
+    def _format_line(entry: Dict) -> Tuple[str, str]:
+        """Text log line and timestamp of a queued alert"""
+        timestamp = datetime.fromtimestamp(entry["ts"]).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        
+        # Format alert
+        alert_line = f"[{timestamp}] [{entry['level'].value}] [{entry['type']}] {entry['message']}"
+        if entry.get("details"):
+            alert_line += f" | Details: {json.dumps(entry['details'])}"
+        return alert_line + "\n", timestamp
+    
+    def _write_entries(self, entries: List[Dict]):
+        """Publish alerts to the bus, append them to the text log, JSON Lines stream and store, and print them"""
+        lines, console = [], []
+        for entry in entries:
+            alert_line, timestamp = self._format_line(entry)
+            lines.append(alert_line)
+            console.append((entry["message"], entry["level"], timestamp))
+        records = [structure_alert(entry) for entry in entries] if self.stream or self.store or self.bus else []
+        if self.bus is not None:
+            self.bus.publish(records)
+        
+        with self._file_lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.alert_log_file, 'a', buffering=1 << 16)
+                self._file.write("".join(lines))
+                self._file.flush()
+            except Exception as e:
+                _console.error("[ALERT LOGGER ERROR] Failed to write to log: %s", e)
+            if self.stream is not None:
+                try:
+                    self.stream.write(records)
+                except Exception as e:
+                    _console.error("[ALERT LOGGER ERROR] Failed to write alert stream: %s", e)
+        if self.store is not None:
+            try:
+                self.store.add(records)
             except Exception as e:
-                print(f"[ALERT LOGGER] Warning: Could not load stats: {e}")
+                _console.error("[ALERT LOGGER ERROR] Failed to store alerts: %s", e)
+        for message, level, timestamp in console:
+            self._print_alert(message, level, timestamp)
     
-    def _save_stats(self):
-        """Save statistics to file"""
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until every alert queued so far is written
+        
+        Args:
+            timeout: Longest wait in seconds
+        
+        Returns:
+            True if the writer caught up in time
+        """
+        if not self._writer.is_alive():
+            return True
+        done = threading.Event()
         try:
-            with open(self.stats_file, 'w') as f:
-                json.dump(self.stats, f, indent=2)
-        except Exception as e:
-            print(f"[ALERT LOGGER] Warning: Could not save stats: {e}")
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+    
+    def close(self, timeout: float = 5.0):
+        """Write pending alerts and statistics, then stop the writer thread"""
+        if self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._writer.join(timeout)
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.stream is not None:
+                self.stream.close()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self._stats_dirty:
+            self._save_stats()
     
     def log_alert(self, 
                   message: str, 
                   level: AlertLevel = AlertLevel.WARNING,
                   anomaly_type: str = "Unknown",
-                  details: Optional[Dict] = None):
+                  details: Optional[Dict] = None,
+                  can_id: Optional[int] = None,
+                  charge_point_id: Optional[str] = None,
+                  connector_id: Optional[int] = None) -> bool:
         """
         Log an alert
         
@@ -77,171 +320,135 @@ class AlertLogger:
             message: Alert message
             level: Alert severity level
             anomaly_type: Type of anomaly detected
-            details: Additional details dict
+            details: Additional details dict (detector metrics in the JSON stream)
+            can_id: CAN ID the alert is about (parsed from the message if None)
+            charge_point_id: Charge point the alert is about
+            connector_id: Connector the alert is about (parsed from the message if None)
+        
+        Returns:
+            True if the alert was logged, False if the aggregator folded it into
+            an earlier alert (callers skip their response actions then)
         """
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        now = time.time()
         
-        # Format alert
-        alert_line = f"[{timestamp}] [{level.value}] [{anomaly_type}] {message}"
+        # Update statistics (per-thread counters, no lock)
+        stats = self.stats_shard
+        stats.add("total_alerts")
+        stats.add(f"level:{level.value}")
+        stats.add(f"type:{anomaly_type}")
+        self._stats_dirty = True
         
-        if details:
-            alert_line += f" | Details: {json.dumps(details)}"
+        if self.aggregator is not None and not self.aggregator.submit(
+                message, anomaly_type, level, now, can_id, charge_point_id, connector_id):
+            stats.add("alerts_aggregated")
+            return False
         
-        alert_line += "\n"
+        # Formatting happens on the writer thread
+        entry = {"ts": now, "level": level, "type": anomaly_type, "message": message,
+                 "details": details, "can_id": can_id, "charge_point": charge_point_id,
+                 "connector": connector_id}
+        self._tail.append(entry)
         
-        # Write to file
+        # Hand over to the writer thread (files + console); never block the detector
+        if not self._writer.is_alive():
+            self._write_entries([entry])
+            return True
         try:
-            with open(self.alert_log_file, 'a') as f:
-                f.write(alert_line)
-        except Exception as e:
-            print(f"[ALERT LOGGER ERROR] Failed to write to log: {e}")
-        
-        # Print to console
-        self._print_alert(message, level, timestamp)
-        
-        # Update statistics
-        self.stats["total_alerts"] += 1
-        self.stats["alerts_by_level"][level.value] += 1
-        
-        if anomaly_type not in self.stats["alerts_by_type"]:
-            self.stats["alerts_by_type"][anomaly_type] = 0
-        self.stats["alerts_by_type"][anomaly_type] += 1
-        
-        self._save_stats()
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            stats.add("alerts_dropped")
+        return True
     
     def _print_alert(self, message: str, level: AlertLevel, timestamp: str):
-        """Print formatted alert to console"""
-        # Color codes for different levels
-        colors = {
-            AlertLevel.INFO: "\033[94m",      # Blue
-            AlertLevel.WARNING: "\033[93m",   # Yellow
-            AlertLevel.CRITICAL: "\033[91m",  # Red
-        }
-        reset = "\033[0m"
-        
-        color = colors.get(level, "")
-        print(f"{color}[{timestamp}] {message}{reset}")
+        """Log a colored alert line to the console (skipped entirely below the component's level)"""
+        log_level = _LOG_LEVELS.get(level, logging.INFO)
+        if _console.isEnabledFor(log_level):
+            _console.log(log_level, "%s[%s] %s%s", _COLORS.get(level, ""), timestamp, message, _RESET)
     
-    def log_info(self, message: str, anomaly_type: str = "Info"):
-        """Log info level alert"""
-        self.log_alert(message, AlertLevel.INFO, anomaly_type)
+    def log_info(self, message: str, anomaly_type: str = "Info", **fields) -> bool:
+        """Log info level alert (fields: see log_alert)"""
+        return self.log_alert(message, AlertLevel.INFO, anomaly_type, **fields)
     
-    def log_warning(self, message: str, anomaly_type: str = "Warning"):
-        """Log warning level alert"""
-        self.log_alert(message, AlertLevel.WARNING, anomaly_type)
+    def log_warning(self, message: str, anomaly_type: str = "Warning", **fields) -> bool:
+        """Log warning level alert (fields: see log_alert)"""
+        return self.log_alert(message, AlertLevel.WARNING, anomaly_type, **fields)
     
-    def log_critical(self, message: str, anomaly_type: str = "Critical"):
-        """Log critical level alert"""
-        self.log_alert(message, AlertLevel.CRITICAL, anomaly_type)
+    def log_critical(self, message: str, anomaly_type: str = "Critical", **fields) -> bool:
+        """Log critical level alert (fields: see log_alert)"""
+        return self.log_alert(message, AlertLevel.CRITICAL, anomaly_type, **fields)
     
     def get_stats(self) -> Dict:
-        """Get current statistics"""
-        return self.stats.copy()
+        """Get current statistics of this process"""
+        return self.stats_shard.stats()
+    
+    def get_merged_stats(self) -> Dict:
+        """Get statistics of every IDS process that logged to log_dir (see alert_stats.merge_stats)"""
+        if self._stats_dirty:
+            self.stats_shard.save()
+        return merge_stats(self.log_dir)
     
     def print_stats(self):
         """Print statistics summary"""
+        stats = self.get_stats()
         print("\n" + "="*60)
         print("IDS STATISTICS SUMMARY")
         print("="*60)
-        print(f"Session Start: {self.stats['session_start']}")
-        print(f"Total Alerts: {self.stats['total_alerts']}")
+        print(f"Session Start: {stats['session_start']}")
+        print(f"Total Alerts: {stats['total_alerts']}")
+        if stats['alerts_dropped']:
+            print(f"Dropped (writer queue full): {stats['alerts_dropped']}")
+        if stats['alerts_aggregated']:
+            print(f"Aggregated into earlier alerts: {stats['alerts_aggregated']}")
         print("\nAlerts by Level:")
-        for level, count in self.stats['alerts_by_level'].items():
+        for level, count in stats['alerts_by_level'].items():
             print(f"  {level}: {count}")
         print("\nAlerts by Type:")
-        for anomaly_type, count in sorted(self.stats['alerts_by_type'].items(), key=lambda x: x[1], reverse=True):
+        for anomaly_type, count in stats['alerts_by_type'].items():
             print(f"  {anomaly_type}: {count}")
+        merged = self.get_merged_stats()
+        print(f"\nAll sessions in {self.log_dir}: {merged['total_alerts']} alerts "
+              f"from {merged['processes']} processes ({merged['running']} running)")
         print("="*60 + "\n")
     
     def clear_logs(self):
         """Clear log files"""
+        self.flush()
         try:
-            if os.path.exists(self.alert_log_file):
-                os.remove(self.alert_log_file)
-            print("[ALERT LOGGER] Alert log cleared")
+            with self._file_lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                if os.path.exists(self.alert_log_file):
+                    os.remove(self.alert_log_file)
+            self._tail.clear()
+            _console.info("[ALERT LOGGER] Alert log cleared")
         except Exception as e:
-            print(f"[ALERT LOGGER ERROR] Failed to clear logs: {e}")
+            _console.error("[ALERT LOGGER ERROR] Failed to clear logs: %s", e)
     
     def get_recent_alerts(self, count: int = 10) -> List[str]:
         """
-        Get recent alerts from log file
+        Get recent alerts from the in-memory tail (no file access)
         
         Args:
-            count: Number of recent alerts to retrieve
+            count: Number of recent alerts to retrieve (at most tail_size)
             
         Returns:
-            List of alert lines
-        """
-        if not os.path.exists(self.alert_log_file):
-            return []
-        
-        try:
-            with open(self.alert_log_file, 'r') as f:
-                lines = f.readlines()
-                return lines[-count:] if len(lines) > count else lines
-        except Exception as e:
-            print(f"[ALERT LOGGER ERROR] Failed to read alerts: {e}")
-            return []
-
-
-class SecurityResponseHandler:
-    """Handles security responses to detected anomalies"""
-    
-    def __init__(self, can_interface=None):
-        """
-        Initialize security response handler
-        
-        Args:
-            can_interface: CAN interface for sending safe mode commands
-        """
-        self.can_interface = can_interface
-        self.response_count = 0
-    
-    def trigger_safe_mode(self, anomaly_type: str, details: str = ""):
-        """
-        Trigger safe mode response
-        
-        Args:
-            anomaly_type: Type of anomaly that triggered response
-            details: Additional details
+            List of alert lines, as written to the log file
         """
-        self.response_count += 1
-        
-        print("\n" + "!"*60)
-        print(f"🚨 SECURITY RESPONSE TRIGGERED 🚨")
-        print(f"Anomaly Type: {anomaly_type}")
-        if details:
-            print(f"Details: {details}")
-        print(f"Response #{self.response_count}")
-        print("!"*60 + "\n")
-        
-        # Send safe mode command to CAN bus if available
-        if self.can_interface:
-            try:
-                # Send safe mode command (CAN ID 0x001)
-                self.can_interface.send_message(
-                    arbitration_id=0x001,
-                    data=[0xDE, 0xAD, 0x01],  # Safe mode command
-                    log=True
-                )
-                print("[SECURITY] Safe mode command sent to CAN bus (ID: 0x001)")
-            except Exception as e:
-                print(f"[SECURITY ERROR] Failed to send safe mode command: {e}")
-        else:
-            print("[SECURITY] Simulated: Safe mode command would be sent to CAN bus")
+        recent = list(self._tail)[-count:] if count > 0 else []
+        return [self._format_line(entry)[0] for entry in recent]
     
-    def block_connection(self, ip_address: str, reason: str = ""):
+    def query_alerts(self, **filters) -> List[Dict]:
         """
-        Block a connection (simulated)
+        Search the alert history (see AlertStore.query for filters)
         
-        Args:
-            ip_address: IP address to block
-            reason: Reason for blocking
+        Example:
+            logger.query_alerts(since=time.time() - 3600, types=["Replay Attack"], can_id=0x200)
         """
-        print(f"\n🚫 CONNECTION BLOCKED: {ip_address}")
-        if reason:
-            print(f"   Reason: {reason}")
-        print()
+        if self.store is None:
+            return []
+        self.flush()
+        return self.store.query(**filters)
 
 
 if __name__ == "__main__":
@@ -256,11 +463,6 @@ if __name__ == "__main__":
     logger.log_critical("Replay attack detected", "Replay Attack")
     logger.log_warning("Out-of-range current value: 255A", "Out-of-Range")
     
-    # Print statistics
+    # Write pending alerts, then print statistics
+    logger.close()
     logger.print_stats()
-    
-    # Test security response
-    print("\nTesting Security Response Handler\n")
-    handler = SecurityResponseHandler()
-    handler.trigger_safe_mode("Frequency Spike", "CAN ID 0x9FF at 100 msg/s")
-    handler.block_connection("192.168.1.100", "WebSocket flood detected")
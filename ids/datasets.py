@@ -0,0 +1,508 @@
+"""
+Training Dataset Loader
+
+Loads the CSV datasets used by `Machine Learning/Anomali_Detection.ipynb`
+without pandas:
+- CAN captures (Car-Hacking format): Timestamp, CAN_ID, DLC, Data0..Data7, Flag
+- EV charging sessions: any header CSV, e.g. chargingDuration, kWhDelivered
+
+Files are read in fixed-size byte blocks and tokenized with NumPy (no
+per-row Python). Hex fields are converted through a lookup table and rows
+that do not parse are dropped. The first load is cached next to the CSV
+as one .npy file per column, so later runs memory-map the cache instead
+of parsing the CSV again.
+
+Usage:
+    python ids/datasets.py can DoS_dataset.csv
+    python ids/datasets.py session SYNTHETIC_EV_DATA.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.log import get_logger
+
+
+logger = get_logger("ids.datasets")
+
+CACHE_VERSION = 1
+BLOCK_SIZE = 16 * 1024 * 1024
+
+CAN_COLUMNS = ["Timestamp", "CAN_ID", "DLC", "Data0", "Data1", "Data2", "Data3",
+               "Data4", "Data5", "Data6", "Data7", "Flag"]
+SESSION_COLUMNS = ["chargingDuration", "kWhDelivered"]
+FLAG_CODES = {"R": 0, "T": 1}  # R = normal frame, T = injected (attack) frame
+
+_COMMA, _NEWLINE = ord(","), ord("\n")
+_BLANK = -2
+
+# Character -> digit value; blanks (padding, space, tab, CR) are _BLANK, anything else -1
+_DIGITS = np.full(256, -1, dtype=np.int8)
+for _i, _c in enumerate("0123456789abcdef"):
+    _DIGITS[ord(_c)] = _i
+    _DIGITS[ord(_c.upper())] = _i
+for _c in "\0 \t\r":
+    _DIGITS[ord(_c)] = _BLANK
+
+_FLOAT_CHARS = np.zeros(256, dtype=bool)
+_FLOAT_CHARS[[ord(c) for c in "0123456789.+-eE \t\r\0"]] = True
+
+
+def parse_int(chars: np.ndarray, base: int = 16) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a matrix of ASCII characters to integers, one row per value
+    
+    Surrounding blanks are ignored; a row is valid only if it holds one
+    contiguous run of digits of the given base. Base 16 rows may start with
+    a 0x/0X prefix, as int(x, 16) accepts.
+    
+    Args:
+        chars: uint8 array of shape (n, width), NUL padded
+        base: 16 for hex fields, 10 for decimal fields
+    
+    Returns:
+        (values as int64, valid mask)
+    """
+    digits = _DIGITS[chars]
+    is_digit = (digits >= 0) & (digits < base)
+    is_blank = digits == _BLANK
+    
+    width = chars.shape[1]
+    if base == 16 and width > 1:
+        # Treat a leading 0x/0X like padding
+        rows = np.arange(len(chars))
+        start = np.argmax(~is_blank, axis=1)
+        second = np.minimum(start + 1, width - 1)
+        prefixed = rows[(start + 1 < width) & (chars[rows, start] == ord("0"))
+                        & ((chars[rows, second] | 0x20) == ord("x"))]
+        for column in (start[prefixed], start[prefixed] + 1):
+            is_digit[prefixed, column] = False
+            is_blank[prefixed, column] = True
+    n_digits = is_digit.sum(axis=1)
+    first = np.argmax(is_digit, axis=1)
+    last = width - 1 - np.argmax(is_digit[:, ::-1], axis=1)
+    valid = (is_digit | is_blank).all(axis=1) & (n_digits > 0) & (last - first + 1 == n_digits)
+    
+    values = np.zeros(len(chars), dtype=np.int64)
+    for column in range(width):
+        digit = is_digit[:, column]
+        values = np.where(digit, values * base + digits[:, column], values)
+    return values, valid
+
+
+def hex_to_int(values: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized int(x, 16) for a column of strings
+    
+    Accepts what int(x, 16) accepts for CAN fields: hex digits with an
+    optional 0x/0X prefix and surrounding blanks (no sign or underscores).
+    
+    Args:
+        values: Strings or bytes (e.g. ["0545", "0x1A", "fe", "R"])
+    
+    Returns:
+        (values as int64, valid mask); invalid entries are 0
+    """
+    text = np.asarray(values, dtype=bytes)
+    if text.itemsize == 0:
+        return np.zeros(len(text), dtype=np.int64), np.zeros(len(text), dtype=bool)
+    chars = text.view(np.uint8).reshape(len(text), text.itemsize)
+    parsed, valid = parse_int(chars, 16)
+    return np.where(valid, parsed, 0), valid
+
+
+def parse_float(chars: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a matrix of left-aligned, NUL padded ASCII characters to float64
+    
+    Rows with characters that cannot appear in a decimal number are rejected
+    up front; the rest are converted by NumPy in one call. Only if that call
+    fails (e.g. "1.2.3") are the candidates converted one by one.
+    
+    Returns:
+        (values, valid mask); invalid entries are NaN
+    """
+    candidates = _FLOAT_CHARS[chars].all(axis=1) & ((chars >= ord("0")) & (chars <= ord("9"))).any(axis=1)
+    values = np.full(len(chars), np.nan)
+    text = np.ascontiguousarray(chars).view(f"S{chars.shape[1]}").ravel()
+    try:
+        values[candidates] = text[candidates].astype(np.float64)
+    except ValueError:
+        for row in np.flatnonzero(candidates):
+            try:
+                values[row] = float(text[row])
+            except ValueError:
+                pass
+    return values, np.isfinite(values)
+
+
+def _iter_blocks(path: str, block_size: int, skip_lines: int = 0,
+                 max_rows: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Yield uint8 arrays of whole lines (each ending with a newline)"""
+    rows_left = max_rows
+    with open(path, "rb") as f:
+        for _ in range(skip_lines):
+            f.readline()
+        tail = b""
+        while rows_left is None or rows_left > 0:
+            chunk = f.read(block_size)
+            if not chunk:
+                if tail.strip():
+                    chunk, tail = tail + b"\n", b""
+                else:
+                    break
+            else:
+                chunk, tail = tail + chunk, b""
+                cut = chunk.rfind(b"\n") + 1
+                chunk, tail = chunk[:cut], chunk[cut:]
+                if not chunk:
+                    continue
+            
+            block = np.frombuffer(chunk, dtype=np.uint8)
+            if rows_left is not None:
+                newlines = np.flatnonzero(block == _NEWLINE)
+                if len(newlines) > rows_left:
+                    block = block[:newlines[rows_left - 1] + 1]
+                rows_left -= min(len(newlines), rows_left)
+            yield block
+
+
+class _Fields:
+    """Field boundaries of a block of CSV lines (no quoting)"""
+    
+    def __init__(self, block: np.ndarray):
+        self.block = block
+        newlines = np.flatnonzero(block == _NEWLINE)
+        self.separators = np.flatnonzero((block == _COMMA) | (block == _NEWLINE))
+        last = np.searchsorted(self.separators, newlines)
+        self.first = np.concatenate(([0], last[:-1] + 1))
+        self.count = last - self.first + 1  # fields per line
+        self.line_start = np.concatenate(([0], newlines[:-1] + 1))
+    
+    def select(self, rows: np.ndarray):
+        """Keep only the given lines"""
+        self.first = self.first[rows]
+        self.count = self.count[rows]
+        self.line_start = self.line_start[rows]
+    
+    def chars(self, index, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Characters of field `index` (scalar or per-line array) of every line
+        
+        Returns:
+            (uint8 array (lines, width) left-aligned and NUL padded, fits mask)
+        """
+        position = self.first + index
+        end = self.separators[position]
+        start = np.where(position > self.first,
+                         self.separators[np.maximum(position - 1, 0)] + 1, self.line_start)
+        offsets = start[:, np.newaxis] + np.arange(width)
+        inside = offsets < end[:, np.newaxis]
+        chars = np.where(inside, self.block[np.minimum(offsets, len(self.block) - 1)], 0)
+        return chars.astype(np.uint8), end - start <= width
+
+
+def _parse_can_block(block: np.ndarray, keep_short_frames: bool) -> Tuple[Dict[str, np.ndarray], int]:
+    """Parse one block of a CAN capture; returns (columns of valid rows, lines read)"""
+    fields = _Fields(block)
+    lines = len(fields.count)
+    fields.select(np.flatnonzero((fields.count >= 4) & (fields.count <= 12) if keep_short_frames
+                                 else fields.count == 12))
+    
+    chars, fits = fields.chars(0, 32)
+    timestamp, ok = parse_float(chars)
+    ok &= fits
+    chars, fits = fields.chars(1, 12)
+    can_id, valid = parse_int(chars, 16)
+    ok &= valid & fits & (can_id <= 0x1FFFFFFF)
+    chars, fits = fields.chars(2, 4)
+    dlc, valid = parse_int(chars, 10)
+    ok &= valid & fits & (dlc <= 8)
+    # A full row carries 8 data fields; a short one exactly DLC of them
+    ok &= (fields.count == 12) | (fields.count == 4 + dlc)
+    
+    columns = {"Timestamp": timestamp, "CAN_ID": can_id.astype(np.uint32), "DLC": dlc.astype(np.uint8)}
+    present_fields = fields.count - 4
+    for byte in range(8):
+        present = byte < present_fields
+        chars, fits = fields.chars(np.where(present, 3 + byte, 0), 4)
+        value, valid = parse_int(chars, 16)
+        ok &= ~present | (valid & fits & (value <= 0xFF))
+        columns[f"Data{byte}"] = np.where(present, value, 0).astype(np.uint8)
+    
+    chars, fits = fields.chars(fields.count - 1, 4)
+    flag = np.full(len(chars), -1, dtype=np.int8)
+    text = chars.view("S4").ravel()
+    for name, code in FLAG_CODES.items():
+        flag[np.char.strip(text) == name.encode()] = code
+    ok &= fits & (flag >= 0)
+    columns["Flag"] = flag
+    
+    return {name: column[ok] for name, column in columns.items()}, lines
+
+
+def _parse_float_block(block: np.ndarray, indices: List[int], n_fields: int,
+                       names: List[str]) -> Tuple[Dict[str, np.ndarray], int]:
+    """Parse the selected numeric columns of one block of a header CSV"""
+    fields = _Fields(block)
+    lines = len(fields.count)
+    fields.select(np.flatnonzero(fields.count == n_fields))
+    
+    columns, ok = {}, np.ones(len(fields.count), dtype=bool)
+    for name, index in zip(names, indices):
+        chars, fits = fields.chars(index, 32)
+        values, valid = parse_float(chars)
+        ok &= valid & fits
+        columns[name] = values
+    return {name: column[ok] for name, column in columns.items()}, lines
+
+
+class ColumnarDataset:
+    """Named NumPy columns of equal length (memory-mapped when loaded from cache)"""
+    
+    def __init__(self, columns: Dict[str, np.ndarray], dropped: int = 0, source: str = ""):
+        """
+        Args:
+            columns: Column name -> 1-D array
+            dropped: Malformed input rows that were skipped
+            source: CSV the columns were read from
+        """
+        self.columns = columns
+        self.dropped = dropped
+        self.source = source
+    
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+    
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+    
+    def features(self, names: Sequence[str], dtype=np.float64) -> np.ndarray:
+        """
+        Stack columns into a model input matrix
+        
+        Args:
+            names: Columns in model order (e.g. ml_detector.CAN_FEATURES)
+        
+        Returns:
+            Array of shape (rows, len(names))
+        """
+        matrix = np.empty((len(self), len(names)), dtype=dtype)
+        for i, name in enumerate(names):
+            matrix[:, i] = self.columns[name]
+        return matrix
+    
+    def take(self, rows: np.ndarray) -> "ColumnarDataset":
+        """Rows by index (copied out of the memory map)"""
+        return ColumnarDataset({name: column[rows] for name, column in self.columns.items()},
+                               source=self.source)
+    
+    def sample(self, n: int, seed: int = 42) -> "ColumnarDataset":
+        """Random rows without replacement, kept in file order (like df.sample for training)"""
+        if n >= len(self):
+            return self.take(np.arange(len(self)))
+        rng = np.random.default_rng(seed)
+        return self.take(np.sort(rng.choice(len(self), size=n, replace=False)))
+    
+    def to_dataframe(self):
+        """Convert to a pandas DataFrame (requires pandas)"""
+        import pandas as pd
+        return pd.DataFrame({name: np.asarray(column) for name, column in self.columns.items()})
+
+
+def _cache_dir(path: str) -> str:
+    return path + ".cache"
+
+
+def _source_signature(path: str) -> Dict[str, float]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _read_cache(cache_dir: str, signature: Dict, options: Dict) -> Optional[ColumnarDataset]:
+    """Memory-map a cache written for the same source file and options"""
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != CACHE_VERSION or meta.get("source") != signature \
+            or meta.get("options") != options:
+        return None
+    try:
+        columns = {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+                   for name in meta["columns"]}
+    except (OSError, ValueError):
+        return None
+    return ColumnarDataset(columns, meta.get("dropped", 0), meta.get("path", ""))
+
+
+def _write_cache(cache_dir: str, dataset: ColumnarDataset, signature: Dict, options: Dict):
+    """Write one .npy per column; meta.json goes last and marks the cache complete"""
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, column in dataset.columns.items():
+        target = os.path.join(cache_dir, f"{name}.npy")
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, column)
+        os.replace(target + ".tmp", target)
+    meta = {
+        "version": CACHE_VERSION,
+        "path": dataset.source,
+        "source": signature,
+        "options": options,
+        "columns": list(dataset.columns),
+        "rows": len(dataset),
+        "dropped": dataset.dropped,
+    }
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _load(path: str, options: Dict, parse: Callable[[], ColumnarDataset],
+          cache: bool, refresh: bool) -> ColumnarDataset:
+    """Return the cached columns of a CSV, parsing (and caching) it when needed"""
+    signature = _source_signature(path)
+    cache_dir = _cache_dir(path)
+    if cache and not refresh:
+        dataset = _read_cache(cache_dir, signature, options)
+        if dataset is not None:
+            return dataset
+    
+    dataset = parse()
+    if cache:
+        try:
+            _write_cache(cache_dir, dataset, signature, options)
+        except OSError as e:
+            logger.warning("[DATASETS] Cache not written (%s): %s", cache_dir, e)
+            return dataset
+        # Serve from the memory map so repeated loads behave the same
+        return _read_cache(cache_dir, signature, options) or dataset
+    return dataset
+
+
+def _concatenate(parts: List[Dict[str, np.ndarray]], names: List[str],
+                 dtypes: Dict[str, type]) -> Dict[str, np.ndarray]:
+    if not parts:
+        return {name: np.empty(0, dtype=dtypes.get(name, np.float64)) for name in names}
+    return {name: np.concatenate([part[name] for part in parts]) for name in names}
+
+
+def load_can_dataset(path: str, max_rows: Optional[int] = None, keep_short_frames: bool = False,
+                     cache: bool = True, refresh: bool = False,
+                     block_size: int = BLOCK_SIZE) -> ColumnarDataset:
+    """
+    Load a Car-Hacking style CAN capture
+    
+    Lines are "Timestamp,CAN_ID,DLC,Data0,...,Data7,Flag" with hex IDs and
+    bytes and Flag R (normal) / T (attack). Columns: Timestamp float64,
+    CAN_ID uint32, DLC uint8, Data0..Data7 uint8, Flag int8 (0 / 1).
+    
+    Args:
+        path: CSV file (no header)
+        max_rows: Read only the first N lines (like read_csv(nrows=N))
+        keep_short_frames: Keep frames with DLC < 8, which carry fewer data
+            fields (missing bytes become 0). The notebook drops them, so the
+            default reproduces its training set.
+        cache: Read/write the columnar cache next to the CSV
+        refresh: Ignore an existing cache and parse the CSV again
+        block_size: Bytes parsed per block
+    
+    Returns:
+        ColumnarDataset; malformed lines are counted in .dropped
+    """
+    def parse() -> ColumnarDataset:
+        parts, lines = [], 0
+        for block in _iter_blocks(path, block_size, max_rows=max_rows):
+            columns, block_lines = _parse_can_block(block, keep_short_frames)
+            parts.append(columns)
+            lines += block_lines
+        columns = _concatenate(parts, CAN_COLUMNS, {"CAN_ID": np.uint32, "DLC": np.uint8, "Flag": np.int8})
+        return ColumnarDataset(columns, lines - len(columns["Flag"]), os.path.abspath(path))
+    
+    options = {"kind": "can", "max_rows": max_rows, "keep_short_frames": keep_short_frames}
+    return _load(path, options, parse, cache, refresh)
+
+
+def load_session_dataset(path: str, columns: Sequence[str] = SESSION_COLUMNS,
+                         max_rows: Optional[int] = None, cache: bool = True,
+                         refresh: bool = False, block_size: int = BLOCK_SIZE) -> ColumnarDataset:
+    """
+    Load numeric columns of an EV charging session CSV
+    
+    Args:
+        path: CSV file with a header line (fields must not be quoted)
+        columns: Header names to load as float64
+        max_rows: Read only the first N data lines
+        cache: Read/write the columnar cache next to the CSV
+        refresh: Ignore an existing cache and parse the CSV again
+        block_size: Bytes parsed per block
+    
+    Returns:
+        ColumnarDataset; lines with missing or non-numeric values are dropped
+    """
+    columns = list(columns)
+    
+    def parse() -> ColumnarDataset:
+        with open(path, "rb") as f:
+            header = [name.strip().strip('"') for name in f.readline().decode("utf-8-sig").split(",")]
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f"{path}: columns {missing} not in header {header}")
+        indices = [header.index(name) for name in columns]
+        
+        parts, lines = [], 0
+        for block in _iter_blocks(path, block_size, skip_lines=1, max_rows=max_rows):
+            part, block_lines = _parse_float_block(block, indices, len(header), columns)
+            parts.append(part)
+            lines += block_lines
+        values = _concatenate(parts, columns, {})
+        return ColumnarDataset(values, lines - len(values[columns[0]]), os.path.abspath(path))
+    
+    options = {"kind": "session", "columns": columns, "max_rows": max_rows}
+    return _load(path, options, parse, cache, refresh)
+
+
+def main(argv: Optional[list] = None):
+    """Load a dataset (building its cache) and print a summary"""
+    parser = argparse.ArgumentParser(description="Load and cache IDS training datasets")
+    parser.add_argument("kind", choices=["can", "session"], help="Dataset format")
+    parser.add_argument("path", help="CSV file")
+    parser.add_argument("--rows", type=int, default=None, help="Read only the first N lines")
+    parser.add_argument("--keep-short-frames", action="store_true", help="Keep CAN frames with DLC < 8")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild the cache")
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    if args.kind == "can":
+        dataset = load_can_dataset(args.path, args.rows, args.keep_short_frames, refresh=args.refresh)
+    else:
+        dataset = load_session_dataset(args.path, max_rows=args.rows, refresh=args.refresh)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Loaded {len(dataset)} rows from {args.path} in {elapsed:.2f} s ({dataset.dropped} malformed rows dropped)")
+    if args.kind == "can" and len(dataset):
+        attacks = int(np.count_nonzero(dataset["Flag"]))
+        print(f"  {len(np.unique(dataset['CAN_ID']))} CAN IDs, {attacks} attack frames ({attacks / len(dataset):.1%})")
+    else:
+        for name, column in dataset.columns.items():
+            if len(column):
+                print(f"  {name}: min {column.min():.3f}, mean {column.mean():.3f}, max {column.max():.3f}")
+
+
+if __name__ == "__main__":
+    main()
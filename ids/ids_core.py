@@ -5,17 +5,21 @@ Unified Intrusion Detection System that monitors CAN and OCPP traffic
 """
 
 import asyncio
+import socket
 import threading
 import time
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
+import numpy as np
+
 # Import CAN utilities
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from can.can_utils import CANInterface
+from can.can_signals import SignalDecoder
 from ids.rules import (
     FrequencySpikeDetector,
     OCPPCANDelayDetector,
@@ -26,100 +30,188 @@ from ids.rules import (
     ConnectionFloodDetector,
     ValueDeltaDetector,
     FirmwareValidationDetector,
-    ReplayDetector
+    ReplayDetector,
+    PayloadStatisticsDetector,
+    TimingFingerprintDetector,
+    UnknownCANIDDetector,
+    SessionStateDetector
 )
-from ids.alerts import AlertLogger, AlertLevel, SecurityResponseHandler
+from ids.alerts import AlertLogger, AlertLevel
+from ids.response import SecurityResponseHandler
+from ids.alert_aggregator import AlertAggregator
+from ids.alert_bus import AlertBus, AlertSocketServer, DEFAULT_SOCKET_PATH
+from ids.sketches import AdaptiveThreshold
+from ids.ml_detector import MLAnomalyDetector, DEFAULT_MODEL_FILE, COMPILED_MODEL_FILE
+from common.log import get_logger
+
+
+logger = get_logger("ids.core")
+
+CAN_WHITELIST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "can_whitelist.json")
 
 
 class IDSCore:
     """Core IDS Engine - Monitors CAN and OCPP traffic for anomalies"""
     
-    def __init__(self, can_interface: str = 'vcan0'):
+    def __init__(self, can_interface: str = 'vcan0', adaptive_thresholds: bool = False,
+                 alert_socket: Optional[str] = DEFAULT_SOCKET_PATH):
         """
         Initialize IDS Core
         
         Args:
             can_interface: CAN interface to monitor
+            adaptive_thresholds: Learn rate, burst and delta thresholds from traffic
+                (the hand-set values are used until enough samples are seen)
+            alert_socket: Unix socket streaming live alerts as JSON Lines (None = off)
         """
         self.can_interface_name = can_interface
+        self.adaptive_thresholds = adaptive_thresholds
+        self.alert_socket = alert_socket
+        self.alert_socket_server: Optional[AlertSocketServer] = None
         self.can_if: Optional[CANInterface] = None
         self.running = False
         
-        # Initialize alert logger and security response
-        self.alert_logger = AlertLogger()
-        self.security_handler = SecurityResponseHandler()
+        # Initialize alert logger and security response; repeated alerts (and
+        # their safe-mode responses) are collapsed into one per 5 s window, and
+        # safe mode is held 30 s after the last trigger (lockdown after 10)
+        # Subscribers (dashboards, archivers) read alerts from the bus, not the log files
+        self.alert_bus = AlertBus()
+        self.alert_logger = AlertLogger(aggregator=AlertAggregator(window_seconds=5.0, default_rate=20.0),
+                                        bus=self.alert_bus)
+        self.security_handler = SecurityResponseHandler(hold_seconds=30.0, escalate_after=10,
+                                                        lockdown_types=["OCPP Bypass"])
         
         # Initialize all detectors
         self._init_detectors()
         
-        print("[IDS CORE] Intrusion Detection System initialized")
-        print(f"[IDS CORE] CAN Interface: {can_interface}")
-        print(f"[IDS CORE] Active Detectors: {len(self.detectors)}")
+        logger.info("[IDS CORE] Intrusion Detection System initialized")
+        logger.info("[IDS CORE] CAN Interface: %s", can_interface)
+        logger.info("[IDS CORE] Active Detectors: %d", len(self.detectors))
     
     def _init_detectors(self):
         """Initialize all anomaly detectors"""
+        signal_decoder = SignalDecoder.load()
+        # Rate change only watches periodic IDs (DBC cycle times); event-driven
+        # IDs such as 0x200/0x301 have no period to learn
+        cycle_times = signal_decoder.cycle_times()
+        self.periodic_can_ids = frozenset(cycle_times)
+        expected_rates = {f"CAN_0x{can_id:03X}": 1.0 / cycle for can_id, cycle in cycle_times.items()}
+        adaptive = AdaptiveThreshold if self.adaptive_thresholds else (lambda: None)
         self.detectors = {
-            "frequency_spike": FrequencySpikeDetector(threshold_hz=20.0),
+            "frequency_spike": FrequencySpikeDetector(threshold_hz=20.0, adaptive=adaptive()),
             "ocpp_can_delay": OCPPCANDelayDetector(max_delay_seconds=2.0),
-            "out_of_range": OutOfRangeDetector(),
-            "rate_change": RateChangeDetector(expected_rate_hz=1.0, tolerance=0.2),
+            "out_of_range": OutOfRangeDetector(signal_decoder=signal_decoder),
+            "rate_change": RateChangeDetector(tolerance=0.2, expected_rates={"MeterValues": 1.0, **expected_rates}),
             "bypass": BypassDetector(),
-            "burst": BurstDetector(max_messages=10, window_seconds=1.0),
-            "connection_flood": ConnectionFloodDetector(max_connections=10, window_seconds=5.0),
-            "value_delta": ValueDeltaDetector(),
+            "burst": BurstDetector(max_messages=10, window_seconds=1.0, adaptive=adaptive()),
+            "connection_flood": ConnectionFloodDetector(max_connections=500, window_seconds=5.0,
+                                                        max_per_source=10, max_per_charge_point=5),
+            "value_delta": ValueDeltaDetector(adaptive=adaptive()),
             "firmware": FirmwareValidationDetector(),
-            "replay": ReplayDetector(window_seconds=60.0, max_duplicates=3)
+            "replay": ReplayDetector(window_seconds=60.0, max_duplicates=3),
+            "payload_stats": PayloadStatisticsDetector(learning_frames=1000),
+            "timing_fingerprint": TimingFingerprintDetector(learning_samples=500, window_size=32, threshold=0.5),
+            "unknown_id": self._load_id_whitelist(signal_decoder),
+            "session_state": SessionStateDetector(),
+            "ml": self._load_ml_detector()
         }
     
+    def _load_ml_detector(self) -> MLAnomalyDetector:
+        """Load the models exported by the notebook (the scorer stays idle without them)
+        
+        The compiled .npz export is preferred: it needs neither pickle nor scikit-learn.
+        """
+        model_file = next((path for path in (COMPILED_MODEL_FILE, DEFAULT_MODEL_FILE) if os.path.exists(path)), None)
+        if model_file is None:
+            return MLAnomalyDetector()
+        try:
+            return MLAnomalyDetector.load(model_file, batch_size=256, max_latency=0.01)
+        except Exception as e:
+            logger.warning("[IDS CORE] ML models not loaded: %s", e)
+            return MLAnomalyDetector()
+    
+    def _load_id_whitelist(self, signal_decoder: SignalDecoder) -> UnknownCANIDDetector:
+        """
+        Load the learned CAN ID whitelist, or seed it from the signal map
+        
+        Args:
+            signal_decoder: Signal map whose message IDs are known-good
+        """
+        if os.path.exists(CAN_WHITELIST_FILE):
+            return UnknownCANIDDetector.load(CAN_WHITELIST_FILE)
+        # DBC messages plus the safe-mode command the IDS itself sends
+        return UnknownCANIDDetector(known_ids=list(signal_decoder.messages) + [0x001])
+    
     def start(self):
         """Start the IDS"""
-        print("\n" + "="*60)
-        print("🛡️  STARTING INTRUSION DETECTION SYSTEM")
-        print("="*60)
+        logger.info("%s\n🛡️  STARTING INTRUSION DETECTION SYSTEM\n%s", "=" * 60, "=" * 60)
         
         # Connect to CAN interface
         self.can_if = CANInterface(self.can_interface_name)
         if not self.can_if.connect():
-            print("[IDS ERROR] Failed to connect to CAN interface")
+            logger.error("[IDS ERROR] Failed to connect to CAN interface")
             return False
         
         # Set security handler CAN interface
         self.security_handler.can_interface = self.can_if
         
         self.running = True
+        if self.alert_socket and hasattr(socket, "AF_UNIX"):
+            try:
+                self.alert_socket_server = AlertSocketServer(self.alert_bus, self.alert_socket)
+                self.alert_socket_server.start()
+            except OSError as e:
+                logger.warning("[IDS CORE] Alert socket not started: %s", e)
         self.alert_logger.log_info("IDS system started", "System")
         
         # Start CAN monitoring thread
         can_thread = threading.Thread(target=self._monitor_can, daemon=True)
         can_thread.start()
         
-        print("[IDS CORE] CAN monitoring started")
-        print("[IDS CORE] System is now active")
-        print("="*60 + "\n")
+        logger.info("[IDS CORE] CAN monitoring started")
+        logger.info("[IDS CORE] System is now active\n%s", "=" * 60)
         
         return True
     
     def stop(self):
         """Stop the IDS"""
-        print("\n[IDS CORE] Stopping IDS...")
+        logger.info("[IDS CORE] Stopping IDS...")
         self.running = False
         
         if self.can_if:
             self.can_if.disconnect()
         
+        for alert in self.detectors["ml"].flush():
+            self.alert_logger.log_warning(alert, "ML Scorer")
+        
         self.alert_logger.log_info("IDS system stopped", "System")
+        self.alert_logger.close()
+        if self.alert_socket_server is not None:
+            self.alert_socket_server.stop()
+            self.alert_socket_server = None
+        self.alert_bus.close()
+        self.security_handler.close()
         self.alert_logger.print_stats()
-        print("[IDS CORE] IDS stopped\n")
+        self.security_handler.print_stats()
+        logger.info("[IDS CORE] IDS stopped")
     
     def _monitor_can(self):
         """Monitor CAN bus for anomalies"""
-        print("[IDS CORE] CAN monitoring thread started")
+        logger.info("[IDS CORE] CAN monitoring thread started")
         
         while self.running:
             msg = self.can_if.receive_message(timeout=0.1)
             
             if msg:
                 self._process_can_message(msg)
+            
+            # Anomaly 2: report missing CAN responses even when the bus is silent
+            for alert in self.detectors["ocpp_can_delay"].check_timeouts():
+                self.alert_logger.log_warning(alert, "OCPP-CAN Timeout")
+            
+            # Anomaly 15: score frames still waiting for a full ML batch
+            for alert in self.detectors["ml"].poll():
+                self.alert_logger.log_warning(alert, "ML Scorer")
     
     def _process_can_message(self, msg):
         """
@@ -132,67 +224,135 @@ class IDSCore:
         data = bytes(msg.data)
         timestamp = time.time()
         
+        # Anomaly 13: Unknown CAN ID (one bit test per frame)
+        alert = self.detectors["unknown_id"].detect(can_id, getattr(msg, "is_extended_id", None))
+        if alert:
+            self.alert_logger.log_warning(alert, "Unknown CAN ID", can_id=can_id)
+        
         # Anomaly 1: Frequency Spike
         alert = self.detectors["frequency_spike"].detect(can_id, timestamp)
-        if alert:
-            self.alert_logger.log_warning(alert, "Frequency Spike")
+        if alert and self.alert_logger.log_warning(alert, "Frequency Spike", can_id=can_id):
             self.security_handler.trigger_safe_mode("Frequency Spike", f"CAN ID 0x{can_id:03X}")
         
         # Anomaly 6: Message Burst (Error messages)
         if can_id == 0x301:  # Error message ID
             alert = self.detectors["burst"].detect(can_id, timestamp)
-            if alert:
-                self.alert_logger.log_warning(alert, "Error Burst")
+            if alert and self.alert_logger.log_warning(alert, "Error Burst", can_id=can_id):
                 self.security_handler.trigger_safe_mode("Error Burst", f"CAN ID 0x{can_id:03X}")
         
         # Anomaly 10: Replay Attack
         alert = self.detectors["replay"].detect(can_id, data, timestamp)
-        if alert:
-            self.alert_logger.log_critical(alert, "Replay Attack")
+        if alert and self.alert_logger.log_critical(alert, "Replay Attack", can_id=can_id):
             self.security_handler.trigger_safe_mode("Replay Attack", f"CAN ID 0x{can_id:03X}")
         
+        # Anomaly 2: OCPP → CAN Delay
+        alert = self.detectors["ocpp_can_delay"].detect(can_id, timestamp)
+        if alert:
+            self.alert_logger.log_warning(alert, "OCPP-CAN Delay", can_id=can_id)
+        
         # Anomaly 5: OCPP Bypass (for start commands)
         if can_id == 0x200:  # Start command ID
             alert = self.detectors["bypass"].detect(can_id, timestamp)
-            if alert:
-                self.alert_logger.log_critical(alert, "OCPP Bypass")
+            if alert and self.alert_logger.log_critical(alert, "OCPP Bypass", can_id=can_id):
                 self.security_handler.trigger_safe_mode("OCPP Bypass", f"CAN ID 0x{can_id:03X}")
         
-        # Anomaly 3: Out-of-Range (check current values)
-        if can_id == 0x400 and len(data) >= 2:  # Voltage/Current message
-            current = data[1]  # Assume byte 1 is current
-            alert = self.detectors["out_of_range"].detect("current", current)
-            if alert:
-                self.alert_logger.log_warning(alert, "Out-of-Range")
+        # Anomaly 14: Charging session order (CAN side; applied to the connector waiting for it)
+        alert = self.detectors["session_state"].detect_can(can_id)
+        if alert:
+            self.alert_logger.log_warning(alert, "Session Order", can_id=can_id)
+        
+        # Anomaly 3: Out-of-Range (all decoded signals of the frame)
+        for alert in self.detectors["out_of_range"].detect_frame(can_id, data):
+            self.alert_logger.log_warning(alert, "Out-of-Range", can_id=can_id)
         
-        # Anomaly 4: Rate Change (for periodic messages)
-        if can_id == 0x300:  # Temperature/periodic message
+        # Anomaly 4: Rate Change (periodic CAN IDs, seeded with the DBC cycle time)
+        if can_id in self.periodic_can_ids:
             alert = self.detectors["rate_change"].detect(f"CAN_0x{can_id:03X}", timestamp)
             if alert:
-                self.alert_logger.log_warning(alert, "Rate Change")
+                self.alert_logger.log_warning(alert, "Rate Change", can_id=can_id)
+        
+        # Anomaly 11: Payload statistics (learned per CAN ID)
+        alert = self.detectors["payload_stats"].detect(can_id, data)
+        if alert:
+            self.alert_logger.log_warning(alert, "Payload Statistics", can_id=can_id)
+        
+        # Anomaly 12: Inter-arrival timing fingerprint (learned per CAN ID)
+        alert = self.detectors["timing_fingerprint"].detect(can_id, timestamp)
+        if alert:
+            self.alert_logger.log_warning(alert, "Timing Fingerprint", can_id=can_id)
+        
+        # Anomaly 15: ML scorer (micro-batched, alerts arrive when a batch is scored)
+        for alert in self.detectors["ml"].submit_can(can_id, data, timestamp):
+            self.alert_logger.log_warning(alert, "ML Scorer")
     
-    def process_ocpp_message(self, message_type: str, message_data: dict):
+    def analyze_can_batch(self, can_ids, timestamps, payloads, dlcs=None) -> Dict[str, np.ndarray]:
+        """
+        Run the CAN detectors over a batch of frames (batched ingestion, log replay)
+        
+        Alerts are not logged; callers decide what to do with the flagged rows.
+        
+        Args:
+            can_ids: CAN IDs, shape (n,)
+            timestamps: Frame timestamps, shape (n,)
+            payloads: uint8 payloads, shape (n, 8), zero padded
+            dlcs: Payload lengths (None = all 8)
+            
+        Returns:
+            Detector name: indices of frames that raised an alert
+        """
+        can_ids = np.asarray(can_ids)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        
+        results = {
+            "frequency_spike": self.detectors["frequency_spike"].detect_batch(can_ids, timestamps),
+            "replay": self.detectors["replay"].detect_batch(can_ids, payloads, timestamps, dlcs),
+            "out_of_range": self.detectors["out_of_range"].detect_batch(can_ids, payloads, dlcs),
+        }
+        
+        # Anomaly 6 watches error frames, Anomaly 5 start commands only
+        rows = np.flatnonzero(can_ids == 0x301)
+        results["burst"] = rows[self.detectors["burst"].detect_batch(can_ids[rows], timestamps[rows])]
+        rows = np.flatnonzero(can_ids == 0x200)
+        results["bypass"] = rows[self.detectors["bypass"].detect_batch(can_ids[rows], timestamps[rows])]
+        
+        return results
+    
+    def process_ocpp_message(self, message_type: str, message_data: dict, charge_point_id: str = "default"):
         """
         Process OCPP message through detectors
         
         Args:
             message_type: Type of OCPP message
             message_data: Message data dict
+            charge_point_id: Identity of the sending charge point
         """
         timestamp = time.time()
         
+        # Anomaly 14: Charging session order (OCPP side of the session)
+        alert = self.detectors["session_state"].detect_ocpp(
+            message_type, charge_point_id, message_data.get("connectorId")
+        )
+        if alert:
+            self.alert_logger.log_warning(alert, "Session Order", charge_point_id=charge_point_id)
+        
+        # Anomaly 15: ML scoring of finished charging sessions
+        alert = self.detectors["ml"].handle_ocpp(message_type, message_data, charge_point_id, timestamp)
+        if alert:
+            self.alert_logger.log_warning(alert, "ML Scorer", charge_point_id=charge_point_id)
+        
         # Anomaly 9: Firmware Mismatch
         if message_type == "BootNotification":
             firmware = message_data.get("firmwareVersion", "unknown")
-            alert = self.detectors["firmware"].detect(firmware)
-            if alert:
-                self.alert_logger.log_critical(alert, "Firmware Mismatch")
+            alert = self.detectors["firmware"].detect(firmware, message_data.get("chargePointModel"))
+            if alert and self.alert_logger.log_critical(alert, "Firmware Mismatch", charge_point_id=charge_point_id):
                 self.security_handler.trigger_safe_mode("Firmware Mismatch", f"Version: {firmware}")
         
         # Anomaly 2: OCPP → CAN Delay
         if message_type == "RemoteStartTransaction":
             # Register OCPP command, expect CAN response
-            self.detectors["ocpp_can_delay"].register_ocpp_command("RemoteStart", 0x200)
+            self.detectors["ocpp_can_delay"].register_ocpp_command(
+                "RemoteStart", 0x200, message_data.get("connectorId", 1), timestamp
+            )
             self.detectors["bypass"].authorize_can_command(0x200)
         
         # Anomaly 4 & 8: MeterValues rate and delta
@@ -200,27 +360,35 @@ class IDSCore:
             # Check rate
             alert = self.detectors["rate_change"].detect("MeterValues", timestamp)
             if alert:
-                self.alert_logger.log_warning(alert, "MeterValues Rate")
+                self.alert_logger.log_warning(alert, "MeterValues Rate", charge_point_id=charge_point_id)
             
-            # Check value deltas
-            for meter_value in message_data.get("meterValue", []):
-                for sampled_value in meter_value.get("sampledValue", []):
-                    measurand = sampled_value.get("measurand", "")
-                    value = float(sampled_value.get("value", 0))
-                    
-                    if "Energy" in measurand:
-                        alert = self.detectors["value_delta"].detect("energy", value, timestamp)
-                        if alert:
-                            self.alert_logger.log_critical(alert, "Ghost Measurement")
-                            self.security_handler.trigger_safe_mode("Ghost Measurement", f"Energy: {value}")
+            # Check value deltas (all samples of the message at once)
+            alerts = self.detectors["value_delta"].detect_meter_values(charge_point_id, message_data, timestamp)
+            logged = [self.alert_logger.log_critical(alert, "Ghost Measurement", charge_point_id=charge_point_id)
+                      for alert in alerts]
+            if any(logged):
+                self.security_handler.trigger_safe_mode(
+                    "Ghost Measurement", f"{charge_point_id} connector {message_data.get('connectorId', 0)}"
+                )
     
-    def process_websocket_connection(self):
-        """Process new WebSocket connection"""
+    def process_websocket_connection(self, source_ip: Optional[str] = None,
+                                     charge_point_id: Optional[str] = None):
+        """
+        Process new WebSocket connection
+        
+        Args:
+            source_ip: Remote address of the connection
+            charge_point_id: Charge point identity from the connection path
+        """
         # Anomaly 7: Connection Flood
-        alert = self.detectors["connection_flood"].detect()
-        if alert:
-            self.alert_logger.log_critical(alert, "WebSocket Flood")
-            self.security_handler.trigger_safe_mode("WebSocket Flood", "Too many connections")
+        detector = self.detectors["connection_flood"]
+        timestamp = time.time()
+        alert = detector.detect(timestamp, source_ip=source_ip, charge_point_id=charge_point_id)
+        if alert and source_ip and detector.sources.estimate(source_ip, timestamp) > detector.max_per_source:
+            # A single flooding source: refuse its connections at accept (OCPPServer)
+            self.security_handler.block_connection(source_ip, "WebSocket flood")
+        if alert and self.alert_logger.log_critical(alert, "WebSocket Flood"):
+            self.security_handler.trigger_safe_mode("WebSocket Flood", f"Too many connections from {source_ip or 'unknown'}")
     
     def run(self):
         """Run the IDS (blocking)"""
@@ -230,7 +398,7 @@ class IDSCore:
                 while self.running:
                     time.sleep(1)
             except KeyboardInterrupt:
-                print("\n[IDS CORE] Interrupted by user")
+                logger.info("[IDS CORE] Interrupted by user")
             finally:
                 self.stop()
 
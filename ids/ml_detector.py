@@ -0,0 +1,304 @@
+"""
+Streaming ML Anomaly Scorer
+
+Runs the models trained in `Machine Learning/Anomali_Detection.ipynb` inside
+the IDS:
+- CAN frames -> RandomForest features [CAN_ID, DLC, Data0..Data7]
+- Charging sessions -> IsolationForest features [duration (h), kWh delivered]
+- CAN frames are micro-batched (N frames or T seconds) so model cost is
+  paid once per batch instead of once per frame
+- Models compiled with ids/tree_ensemble.py (.npz) run without scikit-learn
+"""
+
+import pickle
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ids.rules import AnomalyDetector, _parse_sample_time
+from ids import tree_ensemble
+
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+DEFAULT_MODEL_FILE = os.path.join(MODEL_DIR, "ids_models.joblib")
+COMPILED_MODEL_FILE = os.path.join(MODEL_DIR, "ids_models.npz")
+
+CAN_FEATURES = ["CAN_ID", "DLC", "Data0", "Data1", "Data2", "Data3", "Data4", "Data5", "Data6", "Data7"]
+SESSION_FEATURES = ["chargingDuration", "kWhDelivered"]
+
+
+def load_models(path: str = DEFAULT_MODEL_FILE) -> Dict[str, object]:
+    """
+    Load the models exported by the notebook
+    
+    The file holds a dict {"can": RandomForestClassifier, "session": IsolationForest}
+    written with joblib.dump (or pickle). Only load files you trust: unpickling
+    runs code. A .npz file from ids/tree_ensemble.py loads as TreeEnsemble
+    models instead, without pickle or scikit-learn.
+    
+    Args:
+        path: Model file
+    
+    Returns:
+        Dict with "can" and/or "session" models
+    """
+    if path.endswith(".npz"):
+        return tree_ensemble.load_models(path)
+    if JOBLIB_AVAILABLE:
+        return joblib.load(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class MLAnomalyDetector(AnomalyDetector):
+    """Anomaly 15: Scores CAN frames and charging sessions with trained models
+    
+    CAN frames are written into a preallocated feature buffer and scored
+    together when the buffer is full or the oldest frame has waited
+    max_latency seconds. Flagged frames are reported once per CAN ID per
+    batch, so a DoS flood yields one alert per batch instead of thousands.
+    """
+    
+    def __init__(self, can_model=None, session_model=None, batch_size: int = 256,
+                 max_latency: float = 0.01):
+        """
+        Args:
+            can_model: Classifier over CAN_FEATURES, predict() == 1 means attack
+            session_model: Outlier model over SESSION_FEATURES, predict() == -1 means anomaly
+            batch_size: Frames scored per model call
+            max_latency: Longest time (seconds) a frame may wait for its batch
+        """
+        super().__init__("ML Scorer")
+        self.can_model = can_model
+        self.session_model = session_model
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        
+        self.features = np.zeros((batch_size, len(CAN_FEATURES)), dtype=np.float64)
+        self.pending = 0
+        self.oldest = 0.0
+        self.sessions: Dict[Tuple[str, int], List[float]] = {}  # (charge point, connector): [start, meter_start_wh, last_meter_wh]
+        self.frames_scored = 0
+        self.batches_scored = 0
+    
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_FILE, **kwargs) -> "MLAnomalyDetector":
+        """Create a detector from an exported model file (see load_models)"""
+        models = load_models(path)
+        return cls(can_model=models.get("can"), session_model=models.get("session"), **kwargs)
+    
+    @property
+    def enabled(self) -> bool:
+        """True if at least one model is loaded"""
+        return self.can_model is not None or self.session_model is not None
+    
+    def _predict(self, model, features: np.ndarray) -> np.ndarray:
+        with warnings.catch_warnings():
+            # Models fitted on DataFrames warn about unnamed NumPy input
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return np.asarray(model.predict(features))
+    
+    def submit_can(self, can_id: int, data: bytes, timestamp: float = None) -> List[str]:
+        """
+        Queue a CAN frame for scoring
+        
+        Args:
+            can_id: CAN ID
+            data: Payload bytes
+            timestamp: Frame timestamp
+        
+        Returns:
+            Alerts of the batch if this frame completed it (usually empty)
+        """
+        if self.can_model is None:
+            return []
+        if timestamp is None:
+            timestamp = time.time()
+        
+        row = self.features[self.pending]
+        dlc = min(len(data), 8)
+        row[0] = can_id
+        row[1] = dlc
+        row[2:2 + dlc] = np.frombuffer(data, dtype=np.uint8, count=dlc)
+        row[2 + dlc:] = 0
+        if self.pending == 0:
+            self.oldest = timestamp
+        self.pending += 1
+        
+        if self.pending == self.batch_size or timestamp - self.oldest >= self.max_latency:
+            return self.flush()
+        return []
+    
+    def poll(self, timestamp: float = None) -> List[str]:
+        """
+        Score the pending batch if its oldest frame waited long enough
+        
+        Call periodically so frames are scored even when the bus goes quiet.
+        """
+        if self.pending == 0:
+            return []
+        if timestamp is None:
+            timestamp = time.time()
+        if timestamp - self.oldest >= self.max_latency:
+            return self.flush()
+        return []
+    
+    def flush(self) -> List[str]:
+        """
+        Score all pending frames now
+        
+        Returns:
+            One alert per CAN ID with frames flagged as attack
+        """
+        count = self.pending
+        if count == 0:
+            return []
+        self.pending = 0
+        
+        batch = self.features[:count]
+        flagged = self._predict(self.can_model, batch) == 1
+        self.frames_scored += count
+        self.batches_scored += 1
+        if not flagged.any():
+            return []
+        
+        can_ids, hits = np.unique(batch[flagged, 0].astype(np.int64), return_counts=True)
+        return [
+            self.log_alert(f"⚠️  ANOMALY 15: ML model flagged CAN ID 0x{can_id:03X} - {hits_for_id}/{count} frames in batch classified as attack")
+            for can_id, hits_for_id in zip(can_ids.tolist(), hits.tolist())
+        ]
+    
+    def session_start(self, charge_point_id: str, connector_id: int, timestamp: float,
+                      meter_start_wh: Optional[float] = None):
+        """Record the start of a charging session (StartTransaction)"""
+        self.sessions[(charge_point_id, connector_id)] = [timestamp, meter_start_wh, meter_start_wh]
+    
+    def session_meter(self, charge_point_id: str, connector_id: int, energy_wh: float):
+        """Record the latest energy register reading of an open session"""
+        session = self.sessions.get((charge_point_id, connector_id))
+        if session is not None:
+            if session[1] is None:
+                session[1] = energy_wh
+            session[2] = energy_wh
+    
+    def session_stop(self, charge_point_id: str, timestamp: float, connector_id: Optional[int] = None,
+                     meter_stop_wh: Optional[float] = None) -> Optional[str]:
+        """
+        Close a charging session and score it
+        
+        Args:
+            charge_point_id: Charge point identity
+            timestamp: Stop time
+            connector_id: Connector (None = the charge point's open session)
+            meter_stop_wh: Final energy register (None = last MeterValues reading)
+        
+        Returns:
+            Alert message if the session model flags the session
+        """
+        if connector_id is None:
+            connector_id = next((c for cp, c in self.sessions if cp == charge_point_id), None)
+        session = self.sessions.pop((charge_point_id, connector_id), None)
+        if session is None or self.session_model is None:
+            return None
+        
+        start, meter_start, last_meter = session
+        meter_stop = meter_stop_wh if meter_stop_wh is not None else last_meter
+        if meter_start is None or meter_stop is None:
+            return None
+        return self.score_session(timestamp - start, (meter_stop - meter_start) / 1000.0,
+                                  charge_point_id, connector_id)
+    
+    def score_session(self, duration_seconds: float, kwh: float,
+                      charge_point_id: str = "default", connector_id: int = 0) -> Optional[str]:
+        """
+        Score one finished session with the session model
+        
+        Args:
+            duration_seconds: Session duration
+            kwh: Energy delivered
+        
+        Returns:
+            Alert message if the session is an outlier
+        """
+        if self.session_model is None:
+            return None
+        hours = duration_seconds / 3600.0
+        if self._predict(self.session_model, np.array([[hours, kwh]]))[0] == -1:
+            alert = f"⚠️  ANOMALY 15: ML model flagged charging session on {charge_point_id}/connector {connector_id} - {hours:.2f} h, {kwh:.2f} kWh"
+            return self.log_alert(alert)
+        return None
+    
+    def handle_ocpp(self, message_type: str, message_data: Dict, charge_point_id: str = "default",
+                    timestamp: float = None) -> Optional[str]:
+        """
+        Track sessions from OCPP messages
+        
+        Args:
+            message_type: OCPP action
+            message_data: Message payload
+            charge_point_id: Charge point identity
+            timestamp: Receive time (used when the message has no timestamp)
+        
+        Returns:
+            Alert message when a finished session is flagged
+        """
+        if self.session_model is None:
+            return None
+        if timestamp is None:
+            timestamp = time.time()
+        
+        if message_type == "StartTransaction":
+            self.session_start(
+                charge_point_id, message_data.get("connectorId", 1),
+                _parse_sample_time(message_data.get("timestamp"), timestamp),
+                message_data.get("meterStart"),
+            )
+        elif message_type == "MeterValues":
+            for meter_value in message_data.get("meterValue", []):
+                for sampled in meter_value.get("sampledValue", []):
+                    measurand = sampled.get("measurand", "Energy.Active.Import.Register")
+                    if measurand != "Energy.Active.Import.Register":
+                        continue
+                    try:
+                        value = float(sampled.get("value"))
+                    except (TypeError, ValueError):
+                        continue
+                    scale = 1000.0 if sampled.get("unit") == "kWh" else 1.0
+                    self.session_meter(charge_point_id, message_data.get("connectorId", 1), value * scale)
+        elif message_type == "StopTransaction":
+            return self.session_stop(
+                charge_point_id, _parse_sample_time(message_data.get("timestamp"), timestamp),
+                message_data.get("connectorId"), message_data.get("meterStop"),
+            )
+        return None
+
+
+if __name__ == "__main__":
+    print("Testing ML Anomaly Scorer...\n")
+    
+    model_file = next((path for path in (COMPILED_MODEL_FILE, DEFAULT_MODEL_FILE) if os.path.exists(path)), None)
+    if model_file is None:
+        print(f"No exported model at {DEFAULT_MODEL_FILE}")
+        print("Run the export cell of 'Machine Learning/Anomali_Detection.ipynb' first.")
+    else:
+        detector = MLAnomalyDetector.load(model_file)
+        now = time.time()
+        for i in range(300):
+            for alert in detector.submit_can(0x000, bytes(8), now + i * 0.0001):
+                print(alert)
+        for alert in detector.flush():
+            print(alert)
+        print(f"\nScored {detector.frames_scored} frames in {detector.batches_scored} batches")
+        print(detector.score_session(10 * 3600, 15.0) or "Session normal")
@@ -0,0 +1,604 @@
+"""
+Offline Alert Report
+
+Summarizes weeks of IDS logs (ids_alerts.log and can_traffic.log) in one
+pass, without pandas:
+- Every file is cut into byte segments at line boundaries; a process pool
+  scans the segments and returns small partial counts that are merged
+- CAN traffic lines are tokenized with NumPy (fixed field offsets, hex
+  lookup table, no per-line Python); alert lines are split once per field
+- Per-anomaly counts, time-bucketed histograms, top CAN IDs and charge
+  points, and time to detect: first frame of a CAN ID's traffic burst
+  to the first alert about that CAN ID
+- Output: JSON plus a self-contained static HTML page
+
+Timestamps are the logs' wall-clock times, so buckets align with local
+hours and days.
+
+Usage:
+    python ids/report.py --alerts logs/ids_alerts.log --can logs/can_traffic.log --out logs/report
+    python ids/report.py --alerts logs/ids_alerts.log.* --bucket 86400 --top 20
+"""
+
+import argparse
+import bisect
+import calendar
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+SEGMENT_SIZE = 32 * 1024 * 1024
+DEFAULT_BUCKET = 3600
+DEFAULT_GAP = 5.0
+DEFAULT_MAX_TTD = 60.0
+MAX_BUCKETS = 10000
+
+# Time-to-detect histogram bins (upper bounds in ms)
+TTD_BINS = [(10, "<10 ms"), (100, "10-100 ms"), (1000, "0.1-1 s"), (10000, "1-10 s"), (60000, "10-60 s")]
+
+_CAN_ID_RE = re.compile(r"\b(?:CAN ID|CAN|ID)[ _]0x([0-9A-Fa-f]+)")
+_ANOMALY_RE = re.compile(r"ANOMALY (\d+):")
+_CHARGE_POINT_RE = re.compile(r"(?:charge point |ANOMALY 14: .*? - |on )([^\s/:;]+)(?:/connector| connector|:)")
+_SUMMARY_RE = re.compile(r"^(\d+) (?:repeated|rate-limited) .+ alerts aggregated in ")
+
+# CAN log line: [YYYY-mm-dd HH:MM:SS.mmm] RX | ID: 0x123 | DLC: 8 | Data: [...]
+_TS_DIGITS = [1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16, 18, 19, 21, 22, 23]
+_ID_OFFSET = 37
+_ID_DIGITS = 8
+_PAD = _ID_OFFSET + _ID_DIGITS + 1
+_HEX = np.full(256, -1, dtype=np.int64)
+for _i, _c in enumerate(b"0123456789abcdef"):
+    _HEX[_c] = _i
+    _HEX[ord(chr(_c).upper())] = _i
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _segments(paths: Sequence[str], segment_size: int = SEGMENT_SIZE) -> List[Tuple[str, int, int]]:
+    """(path, start, end) byte ranges that start and end on line boundaries"""
+    segments = []
+    for path in paths:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            start = 0
+            while start < size:
+                end = start + segment_size
+                if end < size:
+                    f.seek(end)
+                    f.readline()
+                    end = f.tell()
+                else:
+                    end = size
+                segments.append((path, start, end))
+                start = end
+    return segments
+
+
+def _read(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+_second_cache: Dict[str, int] = {}
+
+
+def _wall_seconds(text: str) -> float:
+    """Wall-clock seconds of 'YYYY-mm-dd HH:MM:SS.mmm' (ValueError if malformed)"""
+    second = _second_cache.get(text[:19])
+    if second is None:
+        second = calendar.timegm(time.strptime(text[:19], "%Y-%m-%d %H:%M:%S"))
+        _second_cache[text[:19]] = second
+    return second + int(text[20:23]) / 1000.0
+
+
+def scan_alert_segment(path: str, start: int, end: int, bucket: int, gap: float) -> Dict:
+    """
+    Count the alert lines of one segment of ids_alerts.log
+    
+    Args:
+        path: Alert log
+        start: First byte (start of a line)
+        end: Byte after the last line
+        bucket: Histogram bucket in seconds
+        gap: Alerts about one CAN ID and type this far apart start a new run
+    
+    Returns:
+        Partial counts, see merge_alert_parts()
+    """
+    part = {"lines": 0, "malformed": 0, "first": None, "last": None, "by_type": {}, "by_level": {},
+            "by_anomaly": {}, "buckets": {}, "can_ids": {}, "charge_points": {}, "runs": []}
+    by_type, by_level, by_anomaly = part["by_type"], part["by_level"], part["by_anomaly"]
+    buckets, can_ids, charge_points = part["buckets"], part["can_ids"], part["charge_points"]
+    last_alert: Dict[Tuple[int, str], float] = {}
+    first = last = None
+    
+    for raw in _read(path, start, end).split(b"\n"):
+        if not raw:
+            continue
+        part["lines"] += 1
+        try:
+            line = raw.decode("utf-8", "replace")
+            ts = _wall_seconds(line[1:24])
+            level_end = line.index("] ", 27)
+            level = line[27:level_end]
+            type_end = line.index("] ", level_end + 3)
+            anomaly_type = line[level_end + 3:type_end]
+        except ValueError:
+            part["malformed"] += 1
+            continue
+        message = line[type_end + 2:]
+        details = message.rfind(" | Details: ")
+        if details >= 0:
+            message = message[:details]
+        if first is None or ts < first:
+            first = ts
+        if last is None or ts > last:
+            last = ts
+        
+        summary = _SUMMARY_RE.match(message)
+        count = int(summary.group(1)) if summary else 1
+        counts = by_type.get(anomaly_type)
+        if counts is None:
+            counts = by_type[anomaly_type] = [0, 0]
+        counts[1 if summary else 0] += count
+        by_level[level] = by_level.get(level, 0) + count
+        key = int(ts // bucket)
+        slot = buckets.get(key)
+        if slot is None:
+            slot = buckets[key] = {}
+        slot[anomaly_type] = slot.get(anomaly_type, 0) + count
+        
+        match = _ANOMALY_RE.search(message)
+        if match:
+            by_anomaly[match.group(1)] = by_anomaly.get(match.group(1), 0) + count
+        match = _CHARGE_POINT_RE.search(message)
+        if match:
+            charge_points[match.group(1)] = charge_points.get(match.group(1), 0) + count
+        if "0x" in message:
+            match = _CAN_ID_RE.search(message)
+            if match:
+                can_id = int(match.group(1), 16)
+                can_ids[can_id] = can_ids.get(can_id, 0) + count
+                if not summary:
+                    previous = last_alert.get((can_id, anomaly_type))
+                    if previous is None or ts - previous > gap:
+                        part["runs"].append((ts, can_id, anomaly_type))
+                    last_alert[(can_id, anomaly_type)] = ts
+    part["first"], part["last"] = first, last
+    return part
+
+
+def scan_can_segment(path: str, start: int, end: int, bucket: int, gap: float) -> Dict:
+    """
+    Count the frames of one segment of can_traffic.log
+    
+    Args:
+        path: CAN traffic log
+        start: First byte (start of a line)
+        end: Byte after the last line
+        bucket: Histogram bucket in seconds
+        gap: Silence on a CAN ID that ends its traffic burst
+    
+    Returns:
+        Partial counts, see merge_can_parts()
+    """
+    raw = _read(path, start, end)
+    data = np.frombuffer(raw + b"\n" + bytes(_PAD), dtype=np.uint8)
+    ends = np.flatnonzero(data[:len(raw) + 1] == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lines = starts[ends - starts > 0]
+    starts = starts[ends - starts >= _PAD]
+    
+    valid = (data[starts] == ord("[")) & (data[starts + 24] == ord("]"))
+    for offset, char in enumerate(b"ID: 0x"):
+        valid &= data[starts + 31 + offset] == char
+    digits = data[starts[:, None] + np.array(_TS_DIGITS)].astype(np.int64) - ord("0")
+    valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    
+    hexes = _HEX[data[starts[:, None] + _ID_OFFSET + np.arange(_ID_DIGITS)]]
+    in_id = np.cumprod(hexes >= 0, axis=1).astype(bool)
+    id_length = in_id.sum(axis=1)
+    valid &= (id_length > 0) & (data[starts + _ID_OFFSET + id_length] == ord(" "))
+    
+    digits, hexes, in_id = digits[valid], hexes[valid], in_id[valid]
+    can_ids = np.zeros(len(digits), dtype=np.int64)
+    for j in range(_ID_DIGITS):
+        can_ids = np.where(in_id[:, j], can_ids * 16 + hexes[:, j], can_ids)
+    
+    weights = [1000, 100, 10, 1, 10, 1, 10, 1, 10, 1, 10, 1, 10, 1, 100, 10, 1]
+    fields = digits * np.array(weights)
+    days = fields[:, 0:4].sum(axis=1) * 10000 + fields[:, 4:6].sum(axis=1) * 100 + fields[:, 6:8].sum(axis=1)
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    day_seconds = np.empty(len(unique_days), dtype=np.float64)
+    bad_days = np.zeros(len(unique_days), dtype=bool)
+    for i, day in enumerate(unique_days.tolist()):
+        try:
+            day_seconds[i] = (date(day // 10000, day // 100 % 100, day % 100).toordinal() - _EPOCH_ORDINAL) * 86400
+        except ValueError:
+            bad_days[i] = True
+    keep = ~bad_days[day_index]
+    timestamps = (day_seconds[day_index] + fields[:, 8:10].sum(axis=1) * 3600 + fields[:, 10:12].sum(axis=1) * 60
+                  + fields[:, 12:14].sum(axis=1) + fields[:, 14:17].sum(axis=1) / 1000.0)[keep]
+    can_ids = can_ids[keep]
+    
+    part = {"frames": int(len(can_ids)), "malformed": int(len(lines) - len(can_ids)), "first": None, "last": None,
+            "can_ids": {}, "buckets": {}, "bursts": {}}
+    if not len(can_ids):
+        return part
+    part["first"], part["last"] = float(timestamps.min()), float(timestamps.max())
+    ids, counts = np.unique(can_ids, return_counts=True)
+    part["can_ids"] = dict(zip(ids.tolist(), counts.tolist()))
+    keys, counts = np.unique((timestamps // bucket).astype(np.int64), return_counts=True)
+    part["buckets"] = dict(zip(keys.tolist(), counts.tolist()))
+    
+    # Burst starts per CAN ID: first frame, and every frame after more than `gap` of silence
+    order = np.lexsort((timestamps, can_ids))
+    sorted_ids, sorted_ts = can_ids[order], timestamps[order]
+    new_id = np.ones(len(order), dtype=bool)
+    new_id[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    new_burst = new_id.copy()
+    new_burst[1:] |= np.diff(sorted_ts) > gap
+    last_of_id = np.append(new_id[1:], True)
+    bursts = part["bursts"]
+    for can_id, ts in zip(sorted_ids[new_burst].tolist(), sorted_ts[new_burst].tolist()):
+        bursts.setdefault(can_id, [[], 0.0])[0].append(ts)
+    for can_id, ts in zip(sorted_ids[last_of_id].tolist(), sorted_ts[last_of_id].tolist()):
+        bursts[can_id][1] = ts
+    return part
+
+
+def _scan(task: Tuple) -> Tuple[str, Dict]:
+    kind, path, start, end, bucket, gap = task
+    scan = scan_alert_segment if kind == "alerts" else scan_can_segment
+    return kind, scan(path, start, end, bucket, gap)
+
+
+def _add(totals: Dict, counts: Dict):
+    for key, count in counts.items():
+        totals[key] = totals.get(key, 0) + count
+
+
+def _span(parts: List[Dict]) -> Tuple[Optional[float], Optional[float]]:
+    firsts = [part["first"] for part in parts if part["first"] is not None]
+    lasts = [part["last"] for part in parts if part["last"] is not None]
+    return (min(firsts) if firsts else None), (max(lasts) if lasts else None)
+
+
+def _label(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds)) + f".{int(round(seconds % 1 * 1000)) % 1000:03d}"
+
+
+def _bucket_keys(buckets: Dict[int, object]) -> List[int]:
+    """Bucket keys in order, with empty buckets filled in (unless that would make the chart huge)"""
+    if not buckets:
+        return []
+    low, high = min(buckets), max(buckets)
+    return list(range(low, high + 1)) if high - low < MAX_BUCKETS else sorted(buckets)
+
+
+def _top(counts: Dict, top: int, name: str, value: str, hex_keys: bool = False) -> List[Dict]:
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]
+    return [{name: f"0x{key:03X}" if hex_keys else key, value: count} for key, count in ranked]
+
+
+def merge_alert_parts(parts: List[Dict], bucket: int, top: int, gap: float) -> Tuple[Dict, List[Tuple]]:
+    """
+    Merge the partial counts of scan_alert_segment()
+    
+    Returns:
+        Alert section of the report, and the alert runs (first alert of each
+        burst of alerts about one CAN ID and type) for time to detect
+    """
+    by_type: Dict[str, List[int]] = {}
+    by_level: Dict[str, int] = {}
+    by_anomaly: Dict[str, int] = {}
+    buckets: Dict[int, Dict[str, int]] = {}
+    can_ids: Dict[int, int] = {}
+    charge_points: Dict[str, int] = {}
+    runs: List[Tuple] = []
+    for part in parts:
+        for anomaly_type, (alerts, aggregated) in part["by_type"].items():
+            counts = by_type.setdefault(anomaly_type, [0, 0])
+            counts[0] += alerts
+            counts[1] += aggregated
+        _add(by_level, part["by_level"])
+        _add(by_anomaly, part["by_anomaly"])
+        for key, slot in part["buckets"].items():
+            _add(buckets.setdefault(key, {}), slot)
+        _add(can_ids, part["can_ids"])
+        _add(charge_points, part["charge_points"])
+        runs.extend(part["runs"])
+    
+    # Runs that continue across a segment boundary are one run
+    runs.sort()
+    last_alert: Dict[Tuple[int, str], float] = {}
+    merged_runs = []
+    for ts, can_id, anomaly_type in runs:
+        previous = last_alert.get((can_id, anomaly_type))
+        if previous is None or ts - previous > gap:
+            merged_runs.append((ts, can_id, anomaly_type))
+        last_alert[(can_id, anomaly_type)] = ts
+    
+    first, last = _span(parts)
+    types = sorted(by_type.items(), key=lambda item: -sum(item[1]))
+    section = {
+        "lines": sum(part["lines"] for part in parts),
+        "malformed": sum(part["malformed"] for part in parts),
+        "first": _label(first),
+        "last": _label(last),
+        "total": sum(sum(counts) for counts in by_type.values()),
+        "by_type": {name: {"alerts": alerts, "aggregated": aggregated, "total": alerts + aggregated}
+                    for name, (alerts, aggregated) in types},
+        "by_level": dict(sorted(by_level.items(), key=lambda item: -item[1])),
+        "by_anomaly": {number: by_anomaly[number] for number in sorted(by_anomaly, key=int)},
+        "histogram": [{"start": _label(key * bucket), "total": sum(buckets.get(key, {}).values()),
+                       "by_type": dict(sorted(buckets.get(key, {}).items(), key=lambda item: -item[1]))}
+                      for key in _bucket_keys(buckets)],
+        "top_can_ids": _top(can_ids, top, "can_id", "alerts", hex_keys=True),
+        "top_charge_points": _top(charge_points, top, "charge_point", "alerts"),
+    }
+    return section, merged_runs
+
+
+def merge_can_parts(parts: List[Dict], bucket: int, top: int, gap: float) -> Tuple[Dict, Dict[int, List[float]]]:
+    """
+    Merge the partial counts of scan_can_segment()
+    
+    Returns:
+        CAN section of the report, and the sorted burst start times per CAN ID
+    """
+    can_ids: Dict[int, int] = {}
+    buckets: Dict[int, int] = {}
+    pieces: Dict[int, List[Tuple[float, float, List[float]]]] = {}
+    for part in parts:
+        _add(can_ids, part["can_ids"])
+        _add(buckets, part["buckets"])
+        for can_id, (starts, last) in part["bursts"].items():
+            pieces.setdefault(can_id, []).append((starts[0], last, starts))
+    
+    # A burst that continues across a segment boundary keeps its first start only
+    bursts: Dict[int, List[float]] = {}
+    for can_id, segments in pieces.items():
+        segments.sort()
+        starts: List[float] = []
+        previous_last = None
+        for first, last, segment_starts in segments:
+            if previous_last is not None and first - previous_last <= gap:
+                segment_starts = segment_starts[1:]
+            starts.extend(segment_starts)
+            previous_last = last if previous_last is None else max(previous_last, last)
+        bursts[can_id] = sorted(starts)
+    
+    first, last = _span(parts)
+    section = {
+        "frames": sum(part["frames"] for part in parts),
+        "malformed": sum(part["malformed"] for part in parts),
+        "first": _label(first),
+        "last": _label(last),
+        "can_ids": len(can_ids),
+        "bursts": sum(len(starts) for starts in bursts.values()),
+        "histogram": [{"start": _label(key * bucket), "frames": buckets.get(key, 0)} for key in _bucket_keys(buckets)],
+        "top_can_ids": _top(can_ids, top, "can_id", "frames", hex_keys=True),
+    }
+    return section, bursts
+
+
+def _distribution(values_ms: List[float]) -> Dict:
+    """Count, mean, percentiles and binned histogram of time-to-detect values (ms)"""
+    if not values_ms:
+        return {"count": 0}
+    values = np.sort(np.asarray(values_ms))
+    histogram, lower = {}, 0
+    for upper, label in TTD_BINS:
+        histogram[label] = int(np.count_nonzero((values >= lower) & (values < upper)))
+        lower = upper
+    histogram[f">={TTD_BINS[-1][0] // 1000} s"] = int(np.count_nonzero(values >= lower))
+    return {
+        "count": int(len(values)),
+        "mean_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p90_ms": round(float(np.percentile(values, 90)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values[-1]), 1),
+        "histogram": histogram,
+    }
+
+
+def time_to_detect(runs: List[Tuple], bursts: Dict[int, List[float]], max_ttd: float) -> Dict:
+    """
+    Time from the first frame of a CAN ID's traffic burst to its first alert
+    
+    Only the first alert run per burst and anomaly type counts. Alerts
+    without CAN traffic (or whose burst started more than max_ttd earlier,
+    e.g. a flood on a periodic ID) are reported as unmatched.
+    """
+    overall: List[float] = []
+    by_type: Dict[str, List[float]] = {}
+    seen = set()
+    unmatched = 0
+    for ts, can_id, anomaly_type in runs:
+        starts = bursts.get(can_id)
+        index = bisect.bisect_right(starts, ts + 0.0005) - 1 if starts else -1
+        if index < 0 or ts - starts[index] > max_ttd:
+            unmatched += 1
+            continue
+        if (can_id, index, anomaly_type) in seen:
+            continue
+        seen.add((can_id, index, anomaly_type))
+        delay = max(0.0, ts - starts[index]) * 1000.0
+        overall.append(delay)
+        by_type.setdefault(anomaly_type, []).append(delay)
+    return {
+        "matched": len(overall),
+        "unmatched": unmatched,
+        "overall": _distribution(overall),
+        "by_type": {name: _distribution(values) for name, values in
+                    sorted(by_type.items(), key=lambda item: -len(item[1]))},
+    }
+
+
+def build_report(alert_paths: Sequence[str] = (), can_paths: Sequence[str] = (), bucket: int = DEFAULT_BUCKET,
+                 top: int = 10, workers: Optional[int] = None, gap: float = DEFAULT_GAP,
+                 max_ttd: float = DEFAULT_MAX_TTD, segment_size: int = SEGMENT_SIZE) -> Dict:
+    """
+    Scan alert and CAN traffic logs and build the report
+    
+    Args:
+        alert_paths: ids_alerts.log files (rotated files in any order)
+        can_paths: can_traffic.log files
+        bucket: Histogram bucket in seconds
+        top: Entries in the top CAN ID / charge point lists
+        workers: Scanning processes (default: CPU count; 1 = no pool)
+        gap: Seconds of silence that end a traffic burst or alert run
+        max_ttd: Longest burst-to-alert delay counted as a detection
+        segment_size: Bytes per scanned segment
+    
+    Returns:
+        Report dict (see write_json / render_html)
+    """
+    started = time.perf_counter()
+    tasks = [("alerts", *segment, bucket, gap) for segment in _segments(alert_paths, segment_size)]
+    tasks += [("can", *segment, bucket, gap) for segment in _segments(can_paths, segment_size)]
+    scanned = sum(end - start for _, _, start, end, _, _ in tasks)
+    
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            results = pool.map(_scan, tasks, chunksize=1)
+    else:
+        results = [_scan(task) for task in tasks]
+    
+    alerts, runs = merge_alert_parts([part for kind, part in results if kind == "alerts"], bucket, top, gap)
+    can, bursts = merge_can_parts([part for kind, part in results if kind == "can"], bucket, top, gap)
+    elapsed = time.perf_counter() - started
+    return {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "inputs": {"alerts": list(alert_paths), "can": list(can_paths), "bytes": scanned,
+                   "segments": len(tasks), "workers": min(workers, max(1, len(tasks)))},
+        "bucket_seconds": bucket,
+        "alerts": alerts,
+        "can": can,
+        "time_to_detect": time_to_detect(runs, bursts, max_ttd),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+
+def write_json(report: Dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def _bars(rows: List[Tuple[str, int]], width: int = 720, height: int = 160) -> str:
+    """Inline SVG bar chart of (label, value) rows"""
+    if not rows:
+        return "<p class=\"muted\">No data</p>"
+    peak = max(value for _, value in rows) or 1
+    step = width / len(rows)
+    bars = []
+    for i, (label, value) in enumerate(rows):
+        bar = value / peak * (height - 20)
+        bars.append(f"<rect x=\"{i * step:.2f}\" y=\"{height - bar:.2f}\" width=\"{max(step - 1, 1):.2f}\" "
+                    f"height=\"{bar:.2f}\"><title>{html.escape(label)}: {value}</title></rect>")
+    return (f"<svg viewBox=\"0 0 {width} {height}\" width=\"{width}\" height=\"{height}\">{''.join(bars)}</svg>"
+            f"<div class=\"axis\"><span>{html.escape(rows[0][0])}</span><span>{html.escape(rows[-1][0])}</span></div>")
+
+
+def _table(headers: List[str], rows: List[List]) -> str:
+    if not rows:
+        return "<p class=\"muted\">No data</p>"
+    head = "".join(f"<th>{html.escape(str(header))}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def render_html(report: Dict) -> str:
+    """Static HTML summary of a report (no scripts, no external files)"""
+    alerts, can, ttd = report["alerts"], report["can"], report["time_to_detect"]
+    overall = ttd["overall"]
+    cards = [("Alerts", alerts["total"]), ("Anomaly types", len(alerts["by_type"])), ("CAN frames", can["frames"]),
+             ("CAN IDs", can["can_ids"]), ("Detections timed", ttd["matched"]),
+             ("Median time to detect", f"{overall['p50_ms']:.0f} ms" if overall["count"] else "-")]
+    ttd_rows = [[name, dist["count"], dist["p50_ms"], dist["p90_ms"], dist["p99_ms"], dist["max_ms"]]
+                for name, dist in [("All types", overall)] + list(ttd["by_type"].items()) if dist["count"]]
+    sections = [
+        "<div class=\"cards\">" + "".join(f"<div><b>{html.escape(str(value))}</b>{html.escape(label)}</div>"
+                                          for label, value in cards) + "</div>",
+        f"<p class=\"muted\">Alerts {alerts['first']} – {alerts['last']}, CAN traffic {can['first']} – "
+        f"{can['last']}; {report['inputs']['bytes'] / 1e6:.1f} MB in {report['elapsed_seconds']:.2f} s "
+        f"({report['inputs']['segments']} segments, {report['inputs']['workers']} workers)</p>",
+        f"<h2>Alerts per {report['bucket_seconds']} s</h2>",
+        _bars([(row["start"], row["total"]) for row in alerts["histogram"]]),
+        "<h2>Alerts by type</h2>",
+        _table(["Type", "Alerts", "Aggregated", "Total"],
+               [[name, c["alerts"], c["aggregated"], c["total"]] for name, c in alerts["by_type"].items()]),
+        "<h2>Alerts by level</h2>", _table(["Level", "Alerts"], [list(item) for item in alerts["by_level"].items()]),
+        "<h2>Top CAN IDs in alerts</h2>", _table(["CAN ID", "Alerts"], [list(row.values()) for row in alerts["top_can_ids"]]),
+        "<h2>Top charge points</h2>",
+        _table(["Charge point", "Alerts"], [list(row.values()) for row in alerts["top_charge_points"]]),
+        "<h2>Time to detect (ms)</h2>",
+        f"<p class=\"muted\">First frame of a CAN ID's traffic burst to its first alert; "
+        f"{ttd['unmatched']} alert runs without matching traffic</p>",
+        _table(["Type", "Count", "p50", "p90", "p99", "Max"], ttd_rows),
+        _table(list(overall.get("histogram", {}).keys()), [list(overall["histogram"].values())] if overall["count"] else []),
+        f"<h2>CAN frames per {report['bucket_seconds']} s</h2>",
+        _bars([(row["start"], row["frames"]) for row in can["histogram"]]),
+        "<h2>Top CAN IDs in traffic</h2>", _table(["CAN ID", "Frames"], [list(row.values()) for row in can["top_can_ids"]]),
+    ]
+    style = ("body{font-family:sans-serif;margin:2em;color:#222}h2{margin-top:1.6em;font-size:1.1em}"
+             "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:3px 10px;text-align:left}"
+             ".cards{display:flex;gap:1em;flex-wrap:wrap}.cards div{border:1px solid #ccc;padding:.6em 1em}"
+             ".cards b{display:block;font-size:1.4em}.muted{color:#777}svg rect{fill:#c0392b}"
+             ".axis{display:flex;justify-content:space-between;width:720px;color:#777;font-size:.8em}")
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>IDS Report</title>"
+            f"<style>{style}</style></head><body><h1>IDS Report</h1>"
+            f"<p class=\"muted\">Generated {html.escape(report['generated'])}</p>{''.join(sections)}</body></html>\n")
+
+
+def main(argv: Optional[list] = None):
+    """Build the report from the command line and write <out>.json and <out>.html"""
+    parser = argparse.ArgumentParser(description="Summarize IDS alert and CAN traffic logs")
+    parser.add_argument("--alerts", nargs="*", default=None, help="Alert logs (default: logs/ids_alerts.log)")
+    parser.add_argument("--can", nargs="*", default=None, help="CAN traffic logs (default: logs/can_traffic.log)")
+    parser.add_argument("--out", default=os.path.join("logs", "report"), help="Output path without extension")
+    parser.add_argument("--bucket", type=int, default=DEFAULT_BUCKET, help="Histogram bucket in seconds")
+    parser.add_argument("--top", type=int, default=10, help="Entries in the top lists")
+    parser.add_argument("--workers", type=int, default=None, help="Scanning processes (default: CPU count)")
+    parser.add_argument("--gap", type=float, default=DEFAULT_GAP, help="Silence (s) that ends a burst")
+    parser.add_argument("--max-ttd", type=float, default=DEFAULT_MAX_TTD, help="Longest time to detect (s)")
+    args = parser.parse_args(argv)
+    
+    alert_paths = args.alerts if args.alerts is not None else [os.path.join("logs", "ids_alerts.log")]
+    can_paths = args.can if args.can is not None else [os.path.join("logs", "can_traffic.log")]
+    missing = [path for path in alert_paths + can_paths if not os.path.exists(path)]
+    if missing:
+        print(f"[REPORT] Skipping missing files: {', '.join(missing)}")
+    alert_paths = [path for path in alert_paths if path not in missing]
+    can_paths = [path for path in can_paths if path not in missing]
+    
+    report = build_report(alert_paths, can_paths, args.bucket, args.top, args.workers, args.gap, args.max_ttd)
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    write_json(report, args.out + ".json")
+    with open(args.out + ".html", "w", encoding="utf-8") as f:
+        f.write(render_html(report))
+    
+    inputs, ttd = report["inputs"], report["time_to_detect"]["overall"]
+    print(f"[REPORT] {inputs['bytes'] / 1e6:.1f} MB in {report['elapsed_seconds']:.2f} s "
+          f"({inputs['segments']} segments, {inputs['workers']} workers)")
+    print(f"[REPORT] {report['alerts']['total']} alerts, {report['can']['frames']} CAN frames, "
+          f"time to detect p50 {ttd.get('p50_ms', '-')} ms over {ttd['count']} detections")
+    print(f"[REPORT] Wrote {args.out}.json and {args.out}.html")
+
+
+if __name__ == "__main__":
+    main()
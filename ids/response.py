@@ -0,0 +1,298 @@
+"""
+Security Response
+
+Stateful response to detected anomalies:
+- A state machine (NORMAL -> SAFE_MODE -> LOCKDOWN) instead of one safe-mode
+  command per alert: safe mode is entered once and held while triggers keep
+  arriving, escalated when an incident keeps going, and released step by
+  step once the hold time passes without triggers
+- Command frames go out from a dedicated sender thread, so detection never
+  waits on the CAN bus or the console; send latency is measured
+- Every incident (NORMAL until NORMAL again) records how many triggers,
+  of which types, and how many frames it caused
+- Blocked connection sources go to an expiring blocklist that the OCPP
+  server checks on accept
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocpp.blocklist import Blocklist
+from common.log import get_logger
+
+
+logger = get_logger("ids.response")
+
+
+class ResponseState(Enum):
+    """Security response states, in escalation order"""
+    NORMAL = "NORMAL"
+    SAFE_MODE = "SAFE_MODE"
+    LOCKDOWN = "LOCKDOWN"
+
+
+_RANK = {state: rank for rank, state in enumerate(ResponseState)}
+
+
+# Command frame sent on CAN ID 0x001 when a state is entered
+COMMAND_CAN_ID = 0x001
+COMMAND_FRAMES = {
+    ResponseState.NORMAL: [0xDE, 0xAD, 0x00],     # resume normal operation
+    ResponseState.SAFE_MODE: [0xDE, 0xAD, 0x01],  # safe mode
+    ResponseState.LOCKDOWN: [0xDE, 0xAD, 0x02],   # stop charging, refuse commands
+}
+
+
+class Incident:
+    """Responses between leaving NORMAL and returning to it"""
+    
+    __slots__ = ("number", "started", "ended", "peak", "triggers", "by_type", "frames")
+    
+    def __init__(self, number: int, started: float):
+        self.number = number
+        self.started = started
+        self.ended: Optional[float] = None
+        self.peak = ResponseState.SAFE_MODE
+        self.triggers = 0
+        self.by_type: Dict[str, int] = {}
+        self.frames = 0
+    
+    def to_dict(self) -> Dict:
+        end = self.ended if self.ended is not None else time.time()
+        return {
+            "incident": self.number,
+            "started": self.started,
+            "ended": self.ended,
+            "duration": round(end - self.started, 3),
+            "peak": self.peak.value,
+            "triggers": self.triggers,
+            "by_type": dict(self.by_type),
+            "frames": self.frames,
+        }
+
+
+class SecurityResponseHandler:
+    """Handles security responses to detected anomalies"""
+    
+    def __init__(self, can_interface=None, hold_seconds: float = 30.0, escalate_after: int = 10,
+                 lockdown_types: Optional[Iterable[str]] = None, release_frames: bool = True,
+                 queue_size: int = 64, blocklist: Optional[Blocklist] = None):
+        """
+        Initialize security response handler
+        
+        Args:
+            can_interface: CAN interface for sending safe mode commands
+            hold_seconds: Keep a state this long after the last trigger before stepping down
+            escalate_after: Triggers within one incident that escalate safe mode to lockdown
+            lockdown_types: Anomaly types that escalate to lockdown immediately
+            release_frames: Send the command frame of the lower state when stepping down
+            queue_size: Pending command frames (transitions are rare; this never fills in practice)
+            blocklist: Blocklist written by block_connection() (shared with OCPPServer)
+        """
+        self.can_interface = can_interface
+        self.hold_seconds = hold_seconds
+        self.escalate_after = escalate_after
+        self.lockdown_types = set(lockdown_types or ())
+        self.release_frames = release_frames
+        self.blocklist = blocklist if blocklist is not None else Blocklist()
+        
+        self.state = ResponseState.NORMAL
+        self.hold_until = 0.0
+        self.response_count = 0
+        self.incident: Optional[Incident] = None
+        self.incidents: List[Incident] = []
+        self._lock = threading.Lock()
+        
+        self.stats = {"frames_sent": 0, "frames_failed": 0, "frames_dropped": 0,
+                      "max_send_latency_ms": 0.0}
+        self._commands: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._sender = threading.Thread(target=self._run_sender, name="security-response", daemon=True)
+        self._sender.start()
+    
+    def trigger_safe_mode(self, anomaly_type: str, details: str = "") -> bool:
+        """
+        Report an anomaly that calls for a safe mode response
+        
+        Only state changes send a command frame; triggers while safe mode
+        (or lockdown) is active extend the hold and count towards escalation.
+        Never blocks on the CAN bus.
+        
+        Args:
+            anomaly_type: Type of anomaly that triggered response
+            details: Additional details
+        
+        Returns:
+            True if the trigger changed the response state
+        """
+        now = time.time()
+        with self._lock:
+            self.response_count += 1
+            changed = False
+            if self.state == ResponseState.NORMAL:
+                self.incident = Incident(len(self.incidents) + 1, now)
+                self.incidents.append(self.incident)
+                self._transition(ResponseState.SAFE_MODE, anomaly_type, details, now)
+                changed = True
+            
+            incident = self.incident
+            incident.triggers += 1
+            incident.by_type[anomaly_type] = incident.by_type.get(anomaly_type, 0) + 1
+            self.hold_until = now + self.hold_seconds
+            
+            if self.state == ResponseState.SAFE_MODE and (incident.triggers >= self.escalate_after
+                                                          or anomaly_type in self.lockdown_types):
+                self._transition(ResponseState.LOCKDOWN, anomaly_type, details, now)
+                changed = True
+        return changed
+    
+    def _transition(self, state: ResponseState, anomaly_type: str, details: str, now: float,
+                    send: bool = True):
+        """Enter a state and queue its command frame (called with the lock held)"""
+        previous, self.state = self.state, state
+        if state == ResponseState.LOCKDOWN:
+            self.incident.peak = state
+        if send:
+            self.incident.frames += 1
+        try:
+            self._commands.put_nowait((previous, state, anomaly_type, details, self.incident.number, send, now))
+        except queue.Full:
+            self.stats["frames_dropped"] += 1
+    
+    def _step_down(self, now: float):
+        """Release one level once the hold time has passed without triggers"""
+        with self._lock:
+            if self.state == ResponseState.NORMAL or now < self.hold_until:
+                return
+            if self.state == ResponseState.LOCKDOWN:
+                self.hold_until = now + self.hold_seconds
+                self._transition(ResponseState.SAFE_MODE, "Hold expired", "", now, self.release_frames)
+            else:
+                self._transition(ResponseState.NORMAL, "Hold expired", "", now, self.release_frames)
+                self.incident.ended = now
+                self.incident = None
+    
+    def _run_sender(self):
+        """Sender thread: send queued command frames and step down expired holds"""
+        while True:
+            with self._lock:
+                deadline = self.hold_until if self.state != ResponseState.NORMAL else None
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                command = self._commands.get(timeout=timeout)
+            except queue.Empty:
+                self._step_down(time.time())
+                continue
+            if command is None:
+                return
+            self._execute(*command)
+    
+    def _execute(self, previous: ResponseState, state: ResponseState, anomaly_type: str, details: str,
+                 incident: int, send: bool, queued_at: float):
+        """Announce a transition and send its command frame"""
+        if _RANK[state] > _RANK[previous]:
+            logger.critical("%s\n🚨 SECURITY RESPONSE: %s 🚨\nAnomaly Type: %s%s\nIncident #%d\n%s",
+                            "!" * 60, state.value, anomaly_type,
+                            f"\nDetails: {details}" if details else "", incident, "!" * 60)
+        else:
+            logger.info("[SECURITY] %s -> %s (no triggers for %g s)", previous.value, state.value, self.hold_seconds)
+        
+        if send:
+            self._send_frame(state, queued_at)
+        if state == ResponseState.NORMAL:
+            logger.info("[SECURITY] %s", self._incident_summary(self.incidents[incident - 1]))
+    
+    def _send_frame(self, state: ResponseState, queued_at: float):
+        frame = COMMAND_FRAMES[state]
+        if not self.can_interface:
+            logger.info("[SECURITY] Simulated: %s command would be sent to CAN bus", state.value)
+            return
+        try:
+            sent = self.can_interface.send_message(arbitration_id=COMMAND_CAN_ID, data=frame, log=False)
+        except Exception as e:
+            sent = False
+            logger.error("[SECURITY ERROR] Failed to send %s command: %s", state.value, e)
+        if not sent:
+            self.stats["frames_failed"] += 1
+            return
+        latency = (time.time() - queued_at) * 1000.0
+        self.stats["frames_sent"] += 1
+        self.stats["max_send_latency_ms"] = max(self.stats["max_send_latency_ms"], round(latency, 3))
+        logger.info("[SECURITY] %s command sent to CAN bus (ID: 0x%03X, %.1f ms after queueing)",
+                    state.value, COMMAND_CAN_ID, latency)
+    
+    @staticmethod
+    def _incident_summary(incident: Incident) -> str:
+        info = incident.to_dict()
+        types = ", ".join(f"{name}: {count}" for name, count in
+                          sorted(info["by_type"].items(), key=lambda item: -item[1]))
+        state = "closed" if incident.ended is not None else "open"
+        return (f"Incident #{info['incident']} {state} after {info['duration']:.1f} s: "
+                f"{info['triggers']} triggers ({types}), peak {info['peak']}, {info['frames']} frames")
+    
+    def get_incidents(self) -> List[Dict]:
+        """Per-incident response counts, oldest first"""
+        with self._lock:
+            return [incident.to_dict() for incident in self.incidents]
+    
+    def get_stats(self) -> Dict:
+        """Current state, trigger and frame counters"""
+        with self._lock:
+            return {"state": self.state.value, "responses": self.response_count,
+                    "incidents": len(self.incidents), **self.stats}
+    
+    def print_stats(self):
+        """Print response statistics and per-incident counts"""
+        stats = self.get_stats()
+        print(f"\nSecurity responses: {stats['responses']} triggers, {stats['incidents']} incidents, "
+              f"{stats['frames_sent']} frames sent (max latency {stats['max_send_latency_ms']:.1f} ms), "
+              f"state {stats['state']}")
+        with self._lock:
+            for incident in self.incidents:
+                print(f"  {self._incident_summary(incident)}")
+    
+    def close(self, timeout: float = 5.0):
+        """Send pending command frames and stop the sender thread"""
+        if self._sender.is_alive():
+            self._commands.put(None)
+            self._sender.join(timeout)
+    
+    def block_connection(self, ip_address: str, reason: str = "", duration: Optional[float] = None) -> str:
+        """
+        Block further connections from an address or network
+        
+        Args:
+            ip_address: IP address or CIDR network to block
+            reason: Reason for blocking
+            duration: Seconds to block (default: the blocklist's default)
+        
+        Returns:
+            The blocklist entry
+        """
+        if duration is None:
+            entry = self.blocklist.block(ip_address, reason=reason)
+            duration = self.blocklist.default_ttl
+        else:
+            entry = self.blocklist.block(ip_address, ttl=duration, reason=reason)
+        until = "until unblocked" if duration is None else f"for {duration:g} s"
+        # Runs on the OCPP server's event loop: only queue the record
+        logger.warning("🚫 CONNECTION BLOCKED: %s (%s)%s", entry, until, f"\n   Reason: {reason}" if reason else "")
+        return entry
+
+
+if __name__ == "__main__":
+    handler = SecurityResponseHandler(hold_seconds=1.0, escalate_after=5)
+    for i in range(20):
+        handler.trigger_safe_mode("Frequency Spike", "CAN ID 0x9FF at 100 msg/s")
+        time.sleep(0.01)
+    time.sleep(2.5)
+    handler.block_connection("192.168.1.100", "WebSocket flood detected")
+    print(f"192.168.1.100 blocked: {handler.blocklist.is_blocked('192.168.1.100')}")
+    handler.close()
+    handler.print_stats()
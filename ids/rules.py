@@ -4,10 +4,24 @@ Detection Rules for CAN ↔ OCPP Anomalies
 Implements detection logic for all 10 anomaly scenarios
 """
 
+import json
+import math
+import re
+import threading
 import time
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
+from bisect import bisect_left
+
+import numpy as np
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ids.sketches import AdaptiveThreshold, SlidingCountMinSketch
+from ocpp.firmware_policy import FirmwarePolicy
 
 
 class AnomalyDetector:
@@ -30,16 +44,103 @@ class AnomalyDetector:
         """Log an alert"""
         self.alerts.append((datetime.now(), message))
         return message
+    
+    def detect_batch(self, *columns) -> np.ndarray:
+        """
+        Detect anomalies over parallel arrays of detect() arguments
+        
+        Fallback that runs detect() row by row; detectors with window or
+        range logic override it with array operations.
+        
+        Returns:
+            Indices of rows that raised an alert
+        """
+        rows = zip(*(np.asarray(column).tolist() for column in columns))
+        return np.array([i for i, row in enumerate(rows) if self.detect(*row)], dtype=np.int64)
+
+
+def _window_counts(keys: np.ndarray, timestamps: np.ndarray, window: float,
+                   tail: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+    """
+    Count, for every row, the rows with the same key in [t - window, t]
+    
+    Equivalent to the per-key deques used by detect(), done with one sort and
+    one searchsorted. Rows from the previous batch that can still fall inside
+    a window are passed back in as tail so consecutive batches stay continuous.
+    
+    Args:
+        keys: Row keys, shape (n,) or (n, k) for composite keys
+        timestamps: Row timestamps, shape (n,)
+        window: Window length in seconds
+        tail: (keys, timestamps) returned by the previous call
+        
+    Returns:
+        (counts for the n rows, new tail)
+    """
+    keys = np.asarray(keys)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    n = len(timestamps)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), tail
+    
+    if tail is not None and len(tail[1]):
+        keys = np.concatenate([tail[0], keys])
+        timestamps = np.concatenate([tail[1], timestamps])
+    offset = len(timestamps) - n
+    
+    if keys.ndim > 1:
+        # Rank composite keys with one lexsort instead of np.unique(axis=0)
+        key_order = np.lexsort(keys.T[::-1])
+        sorted_keys = keys[key_order]
+        changed = np.empty(len(keys), dtype=np.int64)
+        changed[0] = 0
+        changed[1:] = (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)
+        ranks = np.empty(len(keys), dtype=np.int64)
+        ranks[key_order] = np.cumsum(changed)
+    else:
+        _, ranks = np.unique(keys, return_inverse=True)
+        ranks = ranks.reshape(-1)
+    relative = timestamps - timestamps.min()
+    span = relative.max() + window + 1.0
+    composite = ranks * span + relative
+    
+    # Stable: rows with equal key and time keep arrival order
+    order = np.argsort(composite, kind="stable")
+    ordered = composite[order]
+    first = np.searchsorted(ordered, ordered - window, side="left")
+    counts = np.empty(len(order), dtype=np.int64)
+    counts[order] = np.arange(len(order)) - first + 1
+    
+    keep = timestamps >= timestamps.max() - window
+    return counts[offset:], (keys[keep], timestamps[keep])
+
+
+def _key_thresholds(adaptive: Optional[AdaptiveThreshold], keys: np.ndarray, default: float):
+    """Per-row thresholds of a batch (the scalar default when not adaptive)"""
+    if adaptive is None:
+        return default
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return np.array([adaptive.threshold(key, default) for key in unique.tolist()])[inverse.reshape(-1)]
 
 
 class FrequencySpikeDetector(AnomalyDetector):
     """Anomaly 1: Detects abnormal frequency spikes on CAN IDs"""
     
-    def __init__(self, threshold_hz: float = 20.0, window_seconds: float = 1.0):
+    def __init__(self, threshold_hz: float = 20.0, window_seconds: float = 1.0,
+                 adaptive: Optional[AdaptiveThreshold] = None):
+        """
+        Args:
+            threshold_hz: Rate per CAN ID that raises an alert
+            window_seconds: Window the rate is measured over
+            adaptive: Learn the threshold per CAN ID from normal rates
+                (threshold_hz is used until a CAN ID has enough samples)
+        """
         super().__init__("Frequency Spike")
         self.threshold_hz = threshold_hz
         self.window_seconds = window_seconds
+        self.adaptive = adaptive
         self.message_times: Dict[int, deque] = defaultdict(lambda: deque())
+        self.batch_tail = None
     
     def detect(self, can_id: int, timestamp: float = None) -> Optional[str]:
         """
@@ -68,60 +169,290 @@ class FrequencySpikeDetector(AnomalyDetector):
         frequency = count / self.window_seconds
         
         # Check threshold
-        if frequency > self.threshold_hz:
-            alert = f"⚠️  ANOMALY 1: Frequency spike detected on CAN ID 0x{can_id:03X} - {frequency:.1f} msg/s (threshold: {self.threshold_hz} msg/s)"
+        threshold = self.threshold_hz
+        if self.adaptive is not None:
+            threshold = self.adaptive.threshold(can_id, threshold)
+        alerting = frequency > threshold
+        if self.adaptive is not None:
+            self.adaptive.observe(can_id, frequency, alerting)
+        if alerting:
+            alert = f"⚠️  ANOMALY 1: Frequency spike detected on CAN ID 0x{can_id:03X} - {frequency:.1f} msg/s (threshold: {round(threshold, 2)} msg/s)"
             return self.log_alert(alert)
-        
         return None
+    
+    def detect_batch(self, can_ids: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Detect frequency spikes over arrays of frames
+        
+        Batch calls keep their own window state (batch_tail), separate from detect().
+        
+        Args:
+            can_ids: CAN IDs, shape (n,)
+            timestamps: Frame timestamps, shape (n,)
+            
+        Returns:
+            Indices of frames that exceed the threshold
+        """
+        counts, self.batch_tail = _window_counts(can_ids, timestamps, self.window_seconds, self.batch_tail)
+        frequencies = counts / self.window_seconds
+        alerting = frequencies > _key_thresholds(self.adaptive, can_ids, self.threshold_hz)
+        if self.adaptive is not None:
+            self.adaptive.observe_batch(np.asarray(can_ids).tolist(), frequencies.tolist(), alerting.tolist())
+        return np.flatnonzero(alerting)
+
+
+class TimerWheel:
+    """Hashed timer wheel for cheap scheduling of many short-lived deadlines"""
+    
+    def __init__(self, tick_seconds: float = 0.1, slots: int = 512):
+        """
+        Initialize timer wheel
+        
+        Args:
+            tick_seconds: Resolution of one wheel slot
+            slots: Number of slots (one revolution = tick_seconds * slots)
+        """
+        self.tick_seconds = tick_seconds
+        self.slots: List[List[Tuple[float, object]]] = [[] for _ in range(slots)]
+        self.current_tick: Optional[int] = None
+        self.started = False  # True once advance() has run
+        self.size = 0
+    
+    def schedule(self, deadline: float, item: object):
+        """Schedule item to expire at deadline"""
+        tick = int(deadline / self.tick_seconds)
+        if not self.started:
+            # The wheel starts just before the earliest scheduled tick
+            if self.current_tick is None or tick <= self.current_tick:
+                self.current_tick = tick - 1
+        elif tick <= self.current_tick:
+            # Already due - put it in the next slot so the next advance() fires it
+            tick = self.current_tick + 1
+        self.slots[tick % len(self.slots)].append((deadline, item))
+        self.size += 1
+    
+    def advance(self, now: float) -> List[object]:
+        """
+        Advance the wheel to now
+        
+        Args:
+            now: Current time
+            
+        Returns:
+            Items whose deadline has passed
+        """
+        now_tick = int(now / self.tick_seconds)
+        self.started = True
+        if self.current_tick is None:
+            self.current_tick = now_tick
+        if now_tick <= self.current_tick or self.size == 0:
+            self.current_tick = max(self.current_tick, now_tick)
+            return []
+        
+        # Never sweep more than one full revolution
+        first = max(self.current_tick + 1, now_tick - len(self.slots) + 1)
+        expired = []
+        for tick in range(first, now_tick + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            remaining = [entry for entry in slot if entry[0] > now]
+            if len(remaining) != len(slot):
+                expired.extend(item for deadline, item in slot if deadline <= now)
+                self.size -= len(slot) - len(remaining)
+                self.slots[tick % len(self.slots)] = remaining
+        
+        self.current_tick = now_tick
+        return expired
 
 
 class OCPPCANDelayDetector(AnomalyDetector):
     """Anomaly 2: Detects abnormal delay between OCPP command and CAN response"""
     
-    def __init__(self, max_delay_seconds: float = 2.0):
+    # Upper bucket edges (seconds) of the per-pairing delay histograms
+    HISTOGRAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+    
+    def __init__(self, max_delay_seconds: float = 2.0, response_timeout: float = 30.0,
+                 tick_seconds: float = 0.1):
+        """
+        Args:
+            max_delay_seconds: Delay above which a response is anomalous
+            response_timeout: How long a late response is still paired with its command
+            tick_seconds: Timer wheel resolution
+        """
         super().__init__("OCPP → CAN Delay")
         self.max_delay_seconds = max_delay_seconds
-        self.ocpp_command_time: Optional[float] = None
-        self.waiting_for_can = False
-        self.expected_can_id: Optional[int] = None
+        self.response_timeout = max(response_timeout, max_delay_seconds)
+        # (connector_id, expected_can_id): deque[(token, command_type, sent_time)]
+        self.pending: Dict[Tuple[int, int], deque] = defaultdict(deque)
+        self.pending_keys_by_id: Dict[int, set] = defaultdict(set)
+        self.timers = TimerWheel(tick_seconds=tick_seconds)
+        self.next_token = 0
+        # (command_type, can_id): bucket counts, last bucket is overflow
+        self.delay_histograms: Dict[Tuple[str, int], List[int]] = defaultdict(
+            lambda: [0] * (len(self.HISTOGRAM_BUCKETS) + 1)
+        )
+        self.timeout_counts: Dict[Tuple[str, int], int] = defaultdict(int)
+        # Commands are registered on the OCPP thread, responses and timeouts
+        # are handled on the CAN thread
+        self._lock = threading.Lock()
     
-    def register_ocpp_command(self, command_type: str, expected_can_id: int):
-        """Register OCPP command and start waiting for CAN response"""
-        self.ocpp_command_time = time.time()
-        self.waiting_for_can = True
-        self.expected_can_id = expected_can_id
+    @property
+    def waiting_for_can(self) -> bool:
+        """True while at least one command is waiting for its CAN response"""
+        with self._lock:
+            return any(self.pending.values())
     
-    def detect(self, can_id: int, timestamp: float = None) -> Optional[str]:
+    def register_ocpp_command(self, command_type: str, expected_can_id: int,
+                              connector_id: int = 1, timestamp: float = None):
+        """
+        Register OCPP command and start waiting for CAN response
+        
+        Args:
+            command_type: OCPP command name (e.g. RemoteStart)
+            expected_can_id: CAN ID that should answer the command
+            connector_id: Connector the command targets
+            timestamp: Command timestamp
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        key = (connector_id, expected_can_id)
+        with self._lock:
+            token = self.next_token
+            self.next_token += 1
+            self.pending[key].append((token, command_type, timestamp))
+            self.pending_keys_by_id[expected_can_id].add(key)
+            
+            self.timers.schedule(timestamp + self.max_delay_seconds, (token, key, False))
+            self.timers.schedule(timestamp + self.response_timeout, (token, key, True))
+    
+    def _remove_pending(self, key: Tuple[int, int], token: int) -> Optional[Tuple[int, str, float]]:
+        """Remove a pending command by token, returns the entry if it was still pending (lock held)"""
+        queue = self.pending.get(key)
+        if not queue:
+            return None
+        
+        if queue[0][0] == token:
+            entry = queue.popleft()
+        else:
+            entry = next((e for e in queue if e[0] == token), None)
+            if entry is None:
+                return None
+            queue.remove(entry)
+        
+        if not queue:
+            del self.pending[key]
+            self.pending_keys_by_id[key[1]].discard(key)
+        return entry
+    
+    def _record_delay(self, command_type: str, can_id: int, delay: float):
+        """Add a measured delay to the pairing's histogram"""
+        histogram = self.delay_histograms[(command_type, can_id)]
+        histogram[bisect_left(self.HISTOGRAM_BUCKETS, delay)] += 1
+    
+    def check_timeouts(self, timestamp: float = None) -> List[str]:
+        """
+        Report commands whose CAN response has not arrived in time
+        
+        Meant to be called periodically, independent of CAN traffic.
+        
+        Args:
+            timestamp: Current time
+            
+        Returns:
+            Alert messages for newly timed-out commands
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        alerts = []
+        with self._lock:
+            for token, key, final in self.timers.advance(timestamp):
+                if final:
+                    # Give up pairing a late response
+                    self._remove_pending(key, token)
+                    continue
+                
+                entry = next((e for e in self.pending.get(key, ()) if e[0] == token), None)
+                if entry is None:
+                    continue
+                
+                _, command_type, sent_time = entry
+                connector_id, can_id = key
+                self.timeout_counts[(command_type, can_id)] += 1
+                alerts.append(f"⚠️  ANOMALY 2: Missing CAN response - {command_type} on connector {connector_id} → CAN 0x{can_id:03X}: no response after {timestamp - sent_time:.2f}s (threshold: {self.max_delay_seconds}s)")
+        
+        return [self.log_alert(alert) for alert in alerts]
+    
+    def detect(self, can_id: int, timestamp: float = None,
+               connector_id: Optional[int] = None) -> Optional[str]:
         """
         Detect delay anomaly
         
         Args:
             can_id: CAN ID received
             timestamp: CAN message timestamp
+            connector_id: Connector the frame belongs to (None = oldest pending command)
             
         Returns:
             Alert message if delay detected
         """
-        if not self.waiting_for_can or can_id != self.expected_can_id:
+        keys = self.pending_keys_by_id.get(can_id)
+        if not keys:
             return None
         
         if timestamp is None:
             timestamp = time.time()
         
-        delay = timestamp - self.ocpp_command_time
-        self.waiting_for_can = False
+        with self._lock:
+            if connector_id is not None:
+                key = (connector_id, can_id)
+                if key not in keys:
+                    return None
+            elif not keys:
+                return None  # answered on another thread since the check above
+            else:
+                key = min(keys, key=lambda k: self.pending[k][0][2])
+            
+            token, command_type, sent_time = self.pending[key][0]
+            self._remove_pending(key, token)
+            self._record_delay(command_type, can_id, timestamp - sent_time)
         
+        delay = timestamp - sent_time
         if delay > self.max_delay_seconds:
             alert = f"⚠️  ANOMALY 2: Abnormal delay detected - OCPP → CAN 0x{can_id:03X}: {delay:.2f}s (threshold: {self.max_delay_seconds}s)"
             return self.log_alert(alert)
         
         return None
+    
+    def get_delay_histograms(self) -> Dict[str, Dict]:
+        """
+        Get delay histograms for every command/CAN ID pairing
+        
+        Returns:
+            {"<command> → 0x<id>": {"buckets": {...}, "timeouts": n}}
+        """
+        labels = [f"<={edge}s" for edge in self.HISTOGRAM_BUCKETS] + [f">{self.HISTOGRAM_BUCKETS[-1]}s"]
+        with self._lock:
+            pairings = set(self.delay_histograms) | set(self.timeout_counts)
+            return {
+                f"{command_type} → 0x{can_id:03X}": {
+                    "buckets": dict(zip(labels, self.delay_histograms.get((command_type, can_id), [0] * len(labels)))),
+                    "timeouts": self.timeout_counts.get((command_type, can_id), 0),
+                }
+                for command_type, can_id in sorted(pairings)
+            }
 
 
 class OutOfRangeDetector(AnomalyDetector):
     """Anomaly 3: Detects out-of-range payload values"""
     
-    def __init__(self):
+    def __init__(self, signal_decoder=None):
+        """
+        Args:
+            signal_decoder: can.can_signals.SignalDecoder used by detect_frame (optional)
+        """
         super().__init__("Out-of-Range Payload")
         # Define valid ranges for different parameters
         self.ranges = {
@@ -130,6 +461,9 @@ class OutOfRangeDetector(AnomalyDetector):
             "power": (0, 22000),     # 0-22 kW
             "temperature": (-20, 80), # -20 to 80 Celsius
         }
+        self.signal_decoder = signal_decoder
+        # can_id: (message decoder, ((signal index, name, min, max), ...), min array, max array)
+        self._frame_checks: Dict[int, Optional[tuple]] = {}
     
     def detect(self, parameter: str, value: float) -> Optional[str]:
         """
@@ -152,16 +486,175 @@ class OutOfRangeDetector(AnomalyDetector):
             return self.log_alert(alert)
         
         return None
+    
+    def _compile_checks(self, can_id: int) -> Optional[tuple]:
+        """Build the range table for one CAN ID (ranges here win over the signal map's)"""
+        message = self.signal_decoder.get(can_id) if self.signal_decoder else None
+        if message is None:
+            return None
+        
+        checks = []
+        for index, signal in enumerate(message.signals):
+            if signal.name in self.ranges:
+                min_val, max_val = self.ranges[signal.name]
+            elif signal.minimum is not None and signal.maximum is not None:
+                min_val, max_val = signal.minimum, signal.maximum
+            else:
+                continue
+            little_endian, shift, mask, sign_bit, scale, offset, end_byte = message.table[index]
+            checks.append((index, signal.name, min_val, max_val,
+                           little_endian, shift, mask, sign_bit, scale, offset, end_byte))
+        
+        if not checks:
+            return None
+        
+        return (
+            message,
+            tuple(checks),
+            np.array([c[2] for c in checks], dtype=np.float64),
+            np.array([c[3] for c in checks], dtype=np.float64),
+        )
+    
+    def _get_checks(self, can_id: int) -> Optional[tuple]:
+        if can_id not in self._frame_checks:
+            self._frame_checks[can_id] = self._compile_checks(can_id)
+        return self._frame_checks[can_id]
+    
+    def detect_frame(self, can_id: int, data: bytes) -> List[str]:
+        """
+        Decode the range-checked signals of a CAN frame and check them in one pass
+        
+        Args:
+            can_id: CAN ID
+            data: Payload bytes
+            
+        Returns:
+            Alert messages for all out-of-range signals
+        """
+        compiled = self._frame_checks.get(can_id, False)
+        if compiled is False:
+            compiled = self._get_checks(can_id)
+        if compiled is None:
+            return []
+        
+        message, checks = compiled[0], compiled[1]
+        dlc = len(data)
+        padded = data if dlc == 8 else bytes(data[:8]).ljust(8, b"\0")
+        raw_le = int.from_bytes(padded, "little") if message.needs_le else 0
+        raw_be = int.from_bytes(padded, "big") if message.needs_be else 0
+        
+        alerts = []
+        for _, name, min_val, max_val, little_endian, shift, mask, sign_bit, scale, offset, end_byte in checks:
+            if end_byte > dlc:
+                continue
+            raw = ((raw_le if little_endian else raw_be) >> shift) & mask
+            if raw & sign_bit:
+                raw -= sign_bit << 1
+            value = raw * scale + offset
+            if not (min_val <= value <= max_val):
+                alert = f"⚠️  ANOMALY 3: Out-of-range value detected - CAN 0x{can_id:03X} {name}: {value:g} (valid range: {min_val:g}-{max_val:g})"
+                alerts.append(self.log_alert(alert))
+        return alerts
+    
+    def detect_frames(self, can_id: int, payloads: np.ndarray,
+                      dlcs: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Range-check many frames of one CAN ID with array operations
+        
+        Args:
+            can_id: CAN ID
+            payloads: uint8 array of shape (n, 8)
+            dlcs: Payload lengths (None = all 8)
+            
+        Returns:
+            Boolean array (n, checked signals), True where a value is out of range
+        """
+        compiled = self._get_checks(can_id)
+        if compiled is None:
+            return np.zeros((len(payloads), 0), dtype=bool)
+        
+        message, checks, min_vals, max_vals = compiled
+        values = message.decode_batch(payloads, dlcs)[:, [c[0] for c in checks]]
+        # NaN (signal beyond DLC) compares False on both sides
+        return (values < min_vals) | (values > max_vals)
+    
+    def detect_batch(self, can_ids: np.ndarray, payloads: np.ndarray,
+                     dlcs: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Range-check mixed-ID frames with array operations
+        
+        Args:
+            can_ids: CAN IDs, shape (n,)
+            payloads: uint8 array of shape (n, 8)
+            dlcs: Payload lengths (None = all 8)
+            
+        Returns:
+            Indices of frames with at least one out-of-range signal
+        """
+        can_ids = np.asarray(can_ids)
+        payloads = np.asarray(payloads, dtype=np.uint8).reshape(-1, 8)
+        hits = np.zeros(len(can_ids), dtype=bool)
+        
+        for can_id in np.unique(can_ids).tolist():
+            if self._get_checks(can_id) is None:
+                continue
+            rows = np.flatnonzero(can_ids == can_id)
+            row_dlcs = None if dlcs is None else np.asarray(dlcs)[rows]
+            hits[rows] = self.detect_frames(can_id, payloads[rows], row_dlcs).any(axis=1)
+        
+        return np.flatnonzero(hits)
 
 
 class RateChangeDetector(AnomalyDetector):
-    """Anomaly 4: Detects abnormal rate changes in periodic messages"""
+    """Anomaly 4: Detects abnormal rate changes in periodic messages
     
-    def __init__(self, expected_rate_hz: float = 1.0, tolerance: float = 0.2):
+    Learns the period and jitter of every stream (CAN ID, OCPP action) with
+    exponentially weighted statistics, so ECUs sending at 10 ms and 1 s can be
+    watched by the same detector. Alerts only on a sustained deviation and stay
+    quiet until the stream has been back to normal for a while (hysteresis).
+    A deviation that persists (a legitimate permanent rate change) becomes
+    the new baseline after rebaseline_count intervals.
+    """
+    
+    # Per-stream state slots (kept in a flat list instead of storing history)
+    _LAST, _MEAN, _VAR, _COUNT, _RUN, _RUN_SUM, _CLEAR, _ALARM, _RUN_SQ = range(9)
+    
+    def __init__(self, expected_rate_hz: Optional[float] = None, tolerance: float = 0.2,
+                 expected_rates: Optional[Dict[str, float]] = None,
+                 alpha: float = 0.05, sigma: float = 4.0, warmup_samples: int = 10,
+                 trigger_count: int = 3, clear_count: int = 5, rebaseline_count: int = 50):
+        """
+        Args:
+            expected_rate_hz: Prior rate for streams without an entry in expected_rates
+                (None = learn every stream from scratch)
+            tolerance: Minimum relative deviation of the period treated as anomalous
+            expected_rates: Known rates per stream id, used as trusted priors
+            alpha: EWMA smoothing factor for period/jitter learning
+            sigma: Deviation in learned standard deviations treated as anomalous
+            warmup_samples: Intervals to learn before a stream is judged
+            trigger_count: Consecutive deviating intervals needed to raise an alert
+            clear_count: Consecutive normal intervals needed to clear the alert state
+            rebaseline_count: Consecutive deviating intervals after which their mean
+                and jitter are adopted as the stream's new period
+        """
         super().__init__("Rate Change")
         self.expected_rate_hz = expected_rate_hz
+        self.expected_rates = expected_rates or {}
         self.tolerance = tolerance
-        self.last_times: Dict[str, float] = {}
+        self.alpha = alpha
+        self.sigma = sigma
+        self.warmup_samples = warmup_samples
+        self.trigger_count = trigger_count
+        self.clear_count = clear_count
+        self.rebaseline_count = rebaseline_count
+        self.streams: Dict[str, list] = {}
+    
+    def _new_stream(self, message_id: str, timestamp: float) -> list:
+        """Create state for a new stream, seeded from a prior rate if one is known"""
+        rate = self.expected_rates.get(message_id, self.expected_rate_hz)
+        if rate:
+            return [timestamp, 1.0 / rate, 0.0, self.warmup_samples, 0, 0.0, 0, False, 0.0]
+        return [timestamp, 0.0, 0.0, 0, 0, 0.0, 0, False, 0.0]
     
     def detect(self, message_id: str, timestamp: float = None) -> Optional[str]:
         """
@@ -177,20 +670,87 @@ class RateChangeDetector(AnomalyDetector):
         if timestamp is None:
             timestamp = time.time()
         
-        if message_id in self.last_times:
-            delta = timestamp - self.last_times[message_id]
-            actual_rate = 1.0 / delta if delta > 0 else 0
-            
-            expected_min = self.expected_rate_hz * (1 - self.tolerance)
-            expected_max = self.expected_rate_hz * (1 + self.tolerance)
+        state = self.streams.get(message_id)
+        if state is None:
+            self.streams[message_id] = self._new_stream(message_id, timestamp)
+            return None
+        
+        delta = timestamp - state[self._LAST]
+        state[self._LAST] = timestamp
+        mean = state[self._MEAN]
+        count = state[self._COUNT]
+        
+        if count < self.warmup_samples:
+            # Warm-up: running mean/variance (Welford), alpha=1/n
+            count += 1
+            diff = delta - mean
+            mean += diff / count
+            state[self._VAR] += (diff * (delta - mean) - state[self._VAR]) / count
+            state[self._MEAN] = mean
+            state[self._COUNT] = count
+            return None
+        
+        band = max(self.sigma * state[self._VAR] ** 0.5, self.tolerance * mean)
+        
+        if abs(delta - mean) <= band:
+            # Normal interval: keep learning, count towards clearing the alarm
+            diff = delta - mean
+            state[self._MEAN] = mean + self.alpha * diff
+            state[self._VAR] = (1 - self.alpha) * (state[self._VAR] + self.alpha * diff * diff)
+            state[self._RUN] = 0
+            state[self._RUN_SUM] = 0.0
+            state[self._RUN_SQ] = 0.0
+            if state[self._ALARM]:
+                state[self._CLEAR] += 1
+                if state[self._CLEAR] >= self.clear_count:
+                    state[self._ALARM] = False
+            return None
+        
+        # Deviating interval: do not learn from it
+        state[self._RUN] += 1
+        state[self._RUN_SUM] += delta
+        state[self._RUN_SQ] += delta * delta
+        state[self._CLEAR] = 0
+        
+        if state[self._RUN] >= self.rebaseline_count:
+            # Sustained change: the deviating run is the new normal
+            run = state[self._RUN]
+            state[self._MEAN] = state[self._RUN_SUM] / run
+            state[self._VAR] = max(0.0, state[self._RUN_SQ] / run - state[self._MEAN] ** 2)
+            state[self._RUN] = 0
+            state[self._RUN_SUM] = 0.0
+            state[self._RUN_SQ] = 0.0
+            return None
+        
+        if state[self._ALARM] or state[self._RUN] < self.trigger_count:
+            return None
+        
+        state[self._ALARM] = True
+        actual_rate = state[self._RUN] / state[self._RUN_SUM] if state[self._RUN_SUM] > 0 else 0
+        expected_rate = 1.0 / mean if mean > 0 else 0
+        alert = f"⚠️  ANOMALY 4: Rate anomaly detected - {message_id}: {actual_rate:.2f} Hz (expected: {expected_rate:.2f} Hz ±{band / mean * 100 if mean > 0 else 0:.0f}%)"
+        return self.log_alert(alert)
+    
+    def get_model(self, message_id: str) -> Optional[Dict]:
+        """
+        Get the learned model of a stream
+        
+        Args:
+            message_id: Message identifier
             
-            if not (expected_min <= actual_rate <= expected_max):
-                alert = f"⚠️  ANOMALY 4: Rate anomaly detected - {message_id}: {actual_rate:.2f} Hz (expected: {self.expected_rate_hz} Hz ±{self.tolerance*100}%)"
-                self.last_times[message_id] = timestamp
-                return self.log_alert(alert)
+        Returns:
+            Dict with period, jitter, learning and alarm state, or None
+        """
+        state = self.streams.get(message_id)
+        if state is None:
+            return None
         
-        self.last_times[message_id] = timestamp
-        return None
+        return {
+            "period": state[self._MEAN],
+            "jitter": state[self._VAR] ** 0.5,
+            "learned": state[self._COUNT] >= self.warmup_samples,
+            "alarm": state[self._ALARM],
+        }
 
 
 class BypassDetector(AnomalyDetector):
@@ -237,11 +797,21 @@ class BypassDetector(AnomalyDetector):
 class BurstDetector(AnomalyDetector):
     """Anomaly 6: Detects message bursts (too many messages in short time)"""
     
-    def __init__(self, max_messages: int = 10, window_seconds: float = 1.0):
+    def __init__(self, max_messages: int = 10, window_seconds: float = 1.0,
+                 adaptive: Optional[AdaptiveThreshold] = None):
+        """
+        Args:
+            max_messages: Messages per window and ID that raise an alert
+            window_seconds: Burst window
+            adaptive: Learn the threshold per ID from normal window counts
+                (max_messages is used until an ID has enough samples)
+        """
         super().__init__("Message Burst")
         self.max_messages = max_messages
         self.window_seconds = window_seconds
+        self.adaptive = adaptive
         self.message_times: Dict[int, deque] = defaultdict(lambda: deque())
+        self.batch_tail = None
     
     def detect(self, message_id: int, timestamp: float = None) -> Optional[str]:
         """
@@ -267,28 +837,109 @@ class BurstDetector(AnomalyDetector):
         
         # Check burst
         count = len(self.message_times[message_id])
-        if count > self.max_messages:
-            alert = f"⚠️  ANOMALY 6: Message burst detected - ID 0x{message_id:03X}: {count} messages in {self.window_seconds}s (threshold: {self.max_messages})"
+        threshold = self.max_messages
+        if self.adaptive is not None:
+            threshold = self.adaptive.threshold(message_id, threshold)
+        alerting = count > threshold
+        if self.adaptive is not None:
+            self.adaptive.observe(message_id, count, alerting)
+        if alerting:
+            alert = f"⚠️  ANOMALY 6: Message burst detected - ID 0x{message_id:03X}: {count} messages in {self.window_seconds}s (threshold: {round(threshold, 2)})"
             return self.log_alert(alert)
-        
         return None
+    
+    def detect_batch(self, message_ids: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Detect message bursts over arrays of messages
+        
+        Args:
+            message_ids: Message IDs, shape (n,)
+            timestamps: Message timestamps, shape (n,)
+            
+        Returns:
+            Indices of messages that exceed max_messages in their window
+        """
+        counts, self.batch_tail = _window_counts(message_ids, timestamps, self.window_seconds, self.batch_tail)
+        alerting = counts > _key_thresholds(self.adaptive, message_ids, self.max_messages)
+        if self.adaptive is not None:
+            self.adaptive.observe_batch(np.asarray(message_ids).tolist(), counts.tolist(), alerting.tolist())
+        return np.flatnonzero(alerting)
 
 
 class ConnectionFloodDetector(AnomalyDetector):
-    """Anomaly 7: Detects WebSocket connection floods"""
+    """Anomaly 7: Detects WebSocket connection floods
     
-    def __init__(self, max_connections: int = 10, window_seconds: float = 5.0):
+    Connections are counted per source address and per charge point identity
+    in fixed-size sliding-window sketches, so a fleet reconnecting from many
+    addresses stays quiet while a single flooding source is caught, and a
+    flood of spoofed sources cannot grow memory. The global count is kept as
+    a secondary guard.
+    """
+    
+    def __init__(self, max_connections: int = 500, window_seconds: float = 5.0,
+                 max_per_source: int = 10, max_per_charge_point: int = 5,
+                 buckets: int = 5, sketch_width: int = 16384, top_k: int = 64):
+        """
+        Args:
+            max_connections: Global connections per window (secondary guard)
+            window_seconds: Sliding window length
+            max_per_source: Connections per source address per window
+            max_per_charge_point: Connections per charge point identity per window
+            buckets: Sub-buckets per window (window edge granularity)
+            sketch_width: Counters per sketch row
+            top_k: Offenders remembered per sketch / alert suppression entries
+        """
         super().__init__("Connection Flood")
         self.max_connections = max_connections
         self.window_seconds = window_seconds
-        self.connection_times: deque = deque()
+        self.max_per_source = max_per_source
+        self.max_per_charge_point = max_per_charge_point
+        self.sources = SlidingCountMinSketch(window_seconds, buckets, sketch_width, top_k=top_k)
+        self.charge_points = SlidingCountMinSketch(window_seconds, buckets, sketch_width, top_k=top_k)
+        self.global_counts = [0] * buckets
+        self.global_bucket: Optional[int] = None
+        self.bucket_seconds = window_seconds / buckets
+        # (kind, key): window end; one alert per offender per window
+        self.suppressed: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.max_suppressed = top_k * 4
+        self.batch_tail = None
+        self.source_tail = None
+        self.charge_point_tail = None
+    
+    def _count_global(self, timestamp: float) -> int:
+        """Count a connection in the global ring and return the window total"""
+        bucket = int(timestamp / self.bucket_seconds)
+        if self.global_bucket is None:
+            self.global_bucket = bucket
+        for step in range(1, min(bucket - self.global_bucket, len(self.global_counts)) + 1):
+            self.global_counts[(self.global_bucket + step) % len(self.global_counts)] = 0
+        self.global_bucket = max(self.global_bucket, bucket)
+        self.global_counts[self.global_bucket % len(self.global_counts)] += 1
+        return sum(self.global_counts)
     
-    def detect(self, timestamp: float = None) -> Optional[str]:
+    def _should_alert(self, kind: str, key: str, timestamp: float) -> bool:
+        """True the first time an offender crosses its limit within a window"""
+        # Entries are in expiry order: drop expired ones from the front
+        while self.suppressed:
+            oldest_key, expiry = next(iter(self.suppressed.items()))
+            if expiry > timestamp and len(self.suppressed) < self.max_suppressed:
+                break
+            del self.suppressed[oldest_key]
+        
+        if (kind, key) in self.suppressed:
+            return False
+        self.suppressed[(kind, key)] = timestamp + self.window_seconds
+        return True
+    
+    def detect(self, timestamp: float = None, source_ip: Optional[str] = None,
+               charge_point_id: Optional[str] = None) -> Optional[str]:
         """
         Detect connection flood
         
         Args:
             timestamp: Connection timestamp
+            source_ip: Remote address (None = counted as "unknown")
+            charge_point_id: Charge point identity from the connection path (optional)
             
         Returns:
             Alert message if flood detected
@@ -296,42 +947,167 @@ class ConnectionFloodDetector(AnomalyDetector):
         if timestamp is None:
             timestamp = time.time()
         
-        # Add connection time
-        self.connection_times.append(timestamp)
+        source = source_ip or "unknown"
+        alerts = []
         
-        # Remove old connections
-        cutoff = timestamp - self.window_seconds
-        while self.connection_times and self.connection_times[0] < cutoff:
-            self.connection_times.popleft()
+        count = self.sources.add(source, timestamp)
+        if count > self.max_per_source and self._should_alert("source", source, timestamp):
+            alerts.append(f"source {source}: {count} connections in {self.window_seconds}s (threshold: {self.max_per_source})")
+        
+        if charge_point_id is not None:
+            count = self.charge_points.add(charge_point_id, timestamp)
+            if count > self.max_per_charge_point and self._should_alert("charge_point", charge_point_id, timestamp):
+                alerts.append(f"charge point {charge_point_id}: {count} connections in {self.window_seconds}s (threshold: {self.max_per_charge_point})")
         
-        # Check flood
-        count = len(self.connection_times)
-        if count > self.max_connections:
-            alert = f"⚠️  ANOMALY 7: WebSocket flood detected - {count} connections in {self.window_seconds}s (threshold: {self.max_connections})"
+        count = self._count_global(timestamp)
+        if count > self.max_connections and self._should_alert("global", "", timestamp):
+            alerts.append(f"{count} connections in {self.window_seconds}s from all sources (threshold: {self.max_connections})")
+        
+        if alerts:
+            alert = f"⚠️  ANOMALY 7: WebSocket flood detected - {'; '.join(alerts)}"
             return self.log_alert(alert)
         
         return None
+    
+    def get_top_offenders(self, n: int = 10) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Get the sources and charge points with the most connections in the window
+        
+        Args:
+            n: Entries per category
+            
+        Returns:
+            {"sources": [(address, count)], "charge_points": [(id, count)]}
+        """
+        return {"sources": self.sources.top(n), "charge_points": self.charge_points.top(n)}
+    
+    def detect_batch(self, timestamps: np.ndarray, source_ips=None, charge_point_ids=None) -> np.ndarray:
+        """
+        Detect connection floods over arrays of connections
+        
+        Applies the same limits as detect(): per source, per charge point and
+        global, with exact sliding windows instead of the sketches.
+        
+        Args:
+            timestamps: Connection timestamps, shape (n,)
+            source_ips: Remote addresses, shape (n,) (None entries or None = "unknown")
+            charge_point_ids: Charge point identities, shape (n,) (None entries are not counted)
+            
+        Returns:
+            Indices of connections that exceed any limit in their window
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = len(timestamps)
+        flagged = np.zeros(n, dtype=bool)
+        
+        sources = ["unknown" if source is None else str(source)
+                   for source in (source_ips if source_ips is not None else [None] * n)]
+        counts, self.source_tail = _window_counts(np.array(sources, dtype=str), timestamps,
+                                                  self.window_seconds, self.source_tail)
+        flagged |= counts > self.max_per_source
+        
+        if charge_point_ids is not None:
+            rows = np.array([i for i, cp in enumerate(charge_point_ids) if cp is not None], dtype=np.int64)
+            if len(rows):
+                keys = np.array([str(charge_point_ids[i]) for i in rows.tolist()], dtype=str)
+                counts, self.charge_point_tail = _window_counts(keys, timestamps[rows], self.window_seconds,
+                                                                self.charge_point_tail)
+                flagged[rows[counts > self.max_per_charge_point]] = True
+        
+        keys = np.zeros(n, dtype=np.int64)
+        counts, self.batch_tail = _window_counts(keys, timestamps, self.window_seconds, self.batch_tail)
+        flagged |= counts > self.max_connections
+        return np.flatnonzero(flagged)
+
+
+def _parse_sample_time(value, default: float) -> float:
+    """Convert an OCPP meterValue timestamp (epoch or ISO 8601) to epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return default
 
 
 class ValueDeltaDetector(AnomalyDetector):
-    """Anomaly 8: Detects abnormal value deltas (ghost measurements)"""
+    """Anomaly 8: Detects abnormal value deltas (ghost measurements)
+    
+    State is kept per (charge point, connector, measurand, phase) in flat
+    NumPy arrays indexed through a slot table, so thousands of connectors
+    cost a few bytes each and a whole MeterValues message is checked in one
+    pass. Import and export registers or phases L1/L2/L3 are separate
+    series; the coarse parameter (energy, power) only selects the limit.
+    """
     
-    def __init__(self, max_delta_per_second: Dict[str, float] = None):
+    def __init__(self, max_delta_per_second: Dict[str, float] = None, initial_capacity: int = 1024,
+                 adaptive: Optional[AdaptiveThreshold] = None):
+        """
+        Args:
+            max_delta_per_second: Maximum change per second for each parameter
+            initial_capacity: Preallocated state slots (grown on demand)
+            adaptive: Learn the limit per parameter from normal deltas
+                (max_delta_per_second is used until a parameter has enough samples)
+        """
         super().__init__("Value Delta")
+        self.adaptive = adaptive
         self.max_delta_per_second = max_delta_per_second or {
             "energy": 5.0,    # 5 kWh/s max
             "power": 10000,   # 10 kW/s max change
         }
-        self.last_values: Dict[str, Tuple[float, float]] = {}  # parameter: (value, timestamp)
+        # (charge_point, connector, measurand, phase): slot
+        self.slots: Dict[Tuple[str, int, str, Optional[str]], int] = {}
+        self.last_value = np.full(initial_capacity, np.nan)
+        self.last_time = np.full(initial_capacity, np.nan)
+        self.slot_limit = np.full(initial_capacity, np.inf)
+        self.slot_parameter: List[str] = []
+        self.slot_series: List[str] = []  # Measurand/phase label used in alerts
+    
+    def _slot(self, charge_point_id: str, connector_id: int, measurand: str,
+              phase: Optional[str] = None) -> int:
+        """Get (or allocate) the state slot for a key"""
+        key = (charge_point_id, connector_id, measurand, phase)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.slots)
+            if slot >= len(self.last_value):
+                grow = len(self.last_value)
+                self.last_value = np.concatenate([self.last_value, np.full(grow, np.nan)])
+                self.last_time = np.concatenate([self.last_time, np.full(grow, np.nan)])
+                self.slot_limit = np.concatenate([self.slot_limit, np.full(grow, np.inf)])
+            parameter = self.parameter_for_measurand(measurand)
+            self.slots[key] = slot
+            self.slot_parameter.append(parameter)
+            self.slot_series.append(" ".join(part for part in (measurand if measurand != parameter else "", phase) if part))
+            self.slot_limit[slot] = self.max_delta_per_second.get(parameter, np.inf)
+        return slot
+    
+    @staticmethod
+    def parameter_for_measurand(measurand: str) -> str:
+        """Map an OCPP measurand (e.g. Energy.Active.Import.Register) to a parameter name"""
+        return (measurand or "Energy.Active.Import.Register").split(".", 1)[0].lower()
     
-    def detect(self, parameter: str, value: float, timestamp: float = None) -> Optional[str]:
+    def _format_alert(self, slot: int, delta_per_second: float, max_delta: float,
+                      charge_point_id: Optional[str], connector_id: Optional[int]) -> str:
+        source = f" on {charge_point_id}/connector {connector_id}" if charge_point_id is not None else ""
+        series = f" ({self.slot_series[slot]})" if self.slot_series[slot] else ""
+        return f"⚠️  ANOMALY 8: Abnormal {self.slot_parameter[slot]} delta{source}{series} - {delta_per_second:.2f}/s (threshold: {round(float(max_delta), 4)}/s)"
+    
+    def detect(self, parameter: str, value: float, timestamp: float = None,
+               charge_point_id: Optional[str] = None, connector_id: int = 0,
+               phase: Optional[str] = None) -> Optional[str]:
         """
         Detect abnormal delta
         
         Args:
-            parameter: Parameter name
+            parameter: Parameter name or full OCPP measurand
             value: Current value
             timestamp: Measurement timestamp
+            charge_point_id: Charge point identity (None = shared default)
+            connector_id: Connector ID
+            phase: Phase of the reading (e.g. "L1"), if any
             
         Returns:
             Alert message if abnormal delta detected
@@ -339,47 +1115,233 @@ class ValueDeltaDetector(AnomalyDetector):
         if timestamp is None:
             timestamp = time.time()
         
-        if parameter in self.last_values:
-            last_value, last_time = self.last_values[parameter]
-            time_delta = timestamp - last_time
+        slot = self._slot(charge_point_id or "", connector_id, parameter, phase)
+        parameter = self.slot_parameter[slot]
+        last_value = self.last_value[slot]
+        time_delta = timestamp - self.last_time[slot]
+        self.last_value[slot] = value
+        self.last_time[slot] = timestamp
+        
+        # NaN (first sample) compares False
+        if time_delta > 0:
+            delta_per_second = abs(value - last_value) / time_delta
+            max_delta = self.slot_limit[slot]
+            if self.adaptive is not None:
+                max_delta = self.adaptive.threshold(parameter, max_delta)
             
-            if time_delta > 0:
-                value_delta = abs(value - last_value)
-                delta_per_second = value_delta / time_delta
-                
-                max_delta = self.max_delta_per_second.get(parameter, float('inf'))
-                
-                if delta_per_second > max_delta:
-                    alert = f"⚠️  ANOMALY 8: Abnormal {parameter} delta - {delta_per_second:.2f}/s (threshold: {max_delta}/s)"
-                    self.last_values[parameter] = (value, timestamp)
-                    return self.log_alert(alert)
+            alerting = delta_per_second > max_delta
+            if self.adaptive is not None:
+                self.adaptive.observe(parameter, delta_per_second, alerting)
+            if alerting:
+                alert = self._format_alert(slot, delta_per_second, max_delta, charge_point_id, connector_id)
+                return self.log_alert(alert)
         
-        self.last_values[parameter] = (value, timestamp)
         return None
+    
+    def detect_meter_values(self, charge_point_id: str, message: Dict,
+                            timestamp: float = None) -> List[str]:
+        """
+        Check every sample of a MeterValues message in one vectorized pass
+        
+        Args:
+            charge_point_id: Charge point identity
+            message: MeterValues payload (connectorId, meterValue[])
+            timestamp: Receive time, used for samples without a timestamp
+            
+        Returns:
+            Alert messages for all abnormal deltas in the message
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        connector_id = message.get("connectorId", 0)
+        slots, values, times = [], [], []
+        for meter_value in message.get("meterValue", []):
+            sample_time = _parse_sample_time(meter_value.get("timestamp"), timestamp)
+            for sampled_value in meter_value.get("sampledValue", []):
+                measurand = sampled_value.get("measurand") or "Energy.Active.Import.Register"
+                if self.parameter_for_measurand(measurand) not in self.max_delta_per_second:
+                    continue
+                try:
+                    value = float(sampled_value.get("value", 0))
+                except (TypeError, ValueError):
+                    continue
+                slots.append(self._slot(charge_point_id, connector_id, measurand, sampled_value.get("phase")))
+                values.append(value)
+                times.append(sample_time)
+        
+        if not slots:
+            return []
+        
+        slots = np.asarray(slots)
+        values = np.asarray(values, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        
+        # Order samples per slot by time, then pair each with its predecessor
+        order = np.lexsort((times, slots))
+        slots, values, times = slots[order], values[order], times[order]
+        first = np.ones(len(slots), dtype=bool)
+        first[1:] = slots[1:] != slots[:-1]
+        
+        prev_values = np.empty_like(values)
+        prev_times = np.empty_like(times)
+        prev_values[1:], prev_times[1:] = values[:-1], times[:-1]
+        prev_values[first] = self.last_value[slots[first]]
+        prev_times[first] = self.last_time[slots[first]]
+        
+        time_deltas = times - prev_times
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.abs(values - prev_values) / time_deltas
+        
+        # Store the newest sample of every slot
+        last = np.ones(len(slots), dtype=bool)
+        last[:-1] = slots[:-1] != slots[1:]
+        self.last_value[slots[last]] = values[last]
+        self.last_time[slots[last]] = times[last]
+        
+        limits = self.slot_limit[slots]
+        if self.adaptive is not None:
+            limits = np.array([
+                self.adaptive.threshold(self.slot_parameter[slot], limit)
+                for slot, limit in zip(slots.tolist(), limits.tolist())
+            ])
+        valid = time_deltas > 0
+        alerting = rates > limits
+        hits = np.flatnonzero(valid & alerting)
+        
+        if self.adaptive is not None:
+            valid_rows = np.flatnonzero(valid)
+            self.adaptive.observe_batch([self.slot_parameter[slot] for slot in slots[valid_rows].tolist()],
+                                        rates[valid_rows].tolist(), alerting[valid_rows].tolist())
+        
+        return [
+            self.log_alert(self._format_alert(slots[i], rates[i], limits[i], charge_point_id, connector_id))
+            for i in hits.tolist()
+        ]
+    
+    def detect_batch(self, parameter: str, values: np.ndarray, timestamps: np.ndarray,
+                     series: Optional[np.ndarray] = None, charge_point_ids=None,
+                     phase: Optional[str] = None) -> np.ndarray:
+        """
+        Detect abnormal deltas over arrays of readings of one measurand
+        
+        Readings are paired with the previous reading of the same series
+        (charge point and connector); state is shared with detect().
+        
+        Args:
+            parameter: Parameter name or full OCPP measurand
+            values: Readings, shape (n,)
+            timestamps: Reading timestamps, shape (n,)
+            series: Connector ID of each reading (None = all connector 0)
+            charge_point_ids: Charge point of each reading (None = shared default)
+            phase: Phase of the readings (e.g. "L1"), if any
+            
+        Returns:
+            Indices of readings with an abnormal delta
+        """
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64)
+        connectors = [0] * len(values) if series is None else np.asarray(series).tolist()
+        charge_points = [""] * len(values) if charge_point_ids is None else [cp or "" for cp in charge_point_ids]
+        
+        slot_of: Dict[Tuple[str, int], int] = {}
+        for key in zip(charge_points, connectors):
+            if key not in slot_of:
+                slot_of[key] = self._slot(key[0], key[1], parameter, phase)
+        slots = np.array([slot_of[key] for key in zip(charge_points, connectors)], dtype=np.int64)
+        parameter = self.slot_parameter[slots[0]]
+        
+        order = np.lexsort((timestamps, slots))
+        ordered_slots, ordered_values, ordered_times = slots[order], values[order], timestamps[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ordered_slots[1:] != ordered_slots[:-1]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = first[1:]
+        
+        prev_values = np.roll(ordered_values, 1)
+        prev_times = np.roll(ordered_times, 1)
+        prev_values[first] = self.last_value[ordered_slots[first]]
+        prev_times[first] = self.last_time[ordered_slots[first]]
+        
+        self.last_value[ordered_slots[last]] = ordered_values[last]
+        self.last_time[ordered_slots[last]] = ordered_times[last]
+        
+        time_deltas = ordered_times - prev_times
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.abs(ordered_values - prev_values) / time_deltas
+        limits = self.slot_limit[ordered_slots]
+        if self.adaptive is not None:
+            limits = self.adaptive.threshold(parameter, self.max_delta_per_second.get(parameter, np.inf))
+        valid = time_deltas > 0
+        alerting = rates > limits
+        if self.adaptive is not None:
+            self.adaptive.observe_batch([parameter] * int(valid.sum()), rates[valid].tolist(), alerting[valid].tolist())
+        return np.sort(order[valid & alerting])
 
 
 class FirmwareValidationDetector(AnomalyDetector):
-    """Anomaly 9: Detects firmware version mismatches"""
+    """Anomaly 9: Detects firmware version mismatches
+    
+    Decisions come from the shared FirmwarePolicy (exact versions, semver
+    ranges, model rules, deny lists), the same one the OCPP server uses.
+    """
     
-    def __init__(self, allowed_versions: List[str] = None):
+    def __init__(self, allowed_versions: List[str] = None, policy: Optional[FirmwarePolicy] = None):
+        """
+        Args:
+            allowed_versions: Plain version whitelist (overrides the policy file)
+            policy: Firmware policy (None = load ocpp/firmware_policy.json)
+        """
         super().__init__("Firmware Mismatch")
-        self.allowed_versions = allowed_versions or ["v1.5-stable", "v1.6-release", "v2.0.1-prod"]
+        if allowed_versions is not None:
+            policy = FirmwarePolicy(allow=allowed_versions)
+        self.policy = policy or FirmwarePolicy.load()
+    
+    @property
+    def allowed_versions(self) -> List[str]:
+        """Global allow rules of the policy"""
+        return self.policy.allow
     
-    def detect(self, firmware_version: str) -> Optional[str]:
+    def detect(self, firmware_version: str, model: Optional[str] = None) -> Optional[str]:
         """
         Detect firmware mismatch
         
         Args:
             firmware_version: Firmware version string
+            model: chargePointModel for model-specific rules
             
         Returns:
             Alert message if mismatch detected
         """
-        if firmware_version not in self.allowed_versions:
-            alert = f"⚠️  ANOMALY 9: Firmware mismatch - '{firmware_version}' not in whitelist {self.allowed_versions}"
+        allowed, reason = self.policy.check(firmware_version, model)
+        if not allowed:
+            alert = f"⚠️  ANOMALY 9: Firmware mismatch - '{firmware_version}' {reason}"
             return self.log_alert(alert)
         
         return None
+    
+    def detect_batch(self, firmware_versions: np.ndarray, models: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Validate many firmware versions at once
+        
+        Args:
+            firmware_versions: Version strings, shape (n,)
+            models: chargePointModel of each version (None = global rules only)
+            
+        Returns:
+            Indices of versions the policy rejects
+        """
+        firmware_versions = np.asarray(firmware_versions)
+        if models is None:
+            unique, inverse = np.unique(firmware_versions, return_inverse=True)
+            allowed = np.array([self.policy.is_allowed(version) for version in unique.tolist()], dtype=bool)
+        else:
+            pairs = np.rec.fromarrays([firmware_versions, np.asarray(models)])
+            unique, inverse = np.unique(pairs, return_inverse=True)
+            allowed = np.array([self.policy.is_allowed(str(version), str(model)) for version, model in unique.tolist()], dtype=bool)
+        return np.flatnonzero(~allowed[inverse.reshape(-1)])
 
 
 class ReplayDetector(AnomalyDetector):
@@ -390,6 +1352,7 @@ class ReplayDetector(AnomalyDetector):
         self.window_seconds = window_seconds
         self.max_duplicates = max_duplicates
         self.message_signatures: Dict[str, deque] = defaultdict(lambda: deque())
+        self.batch_tail = None
     
     def detect(self, can_id: int, data: bytes, timestamp: float = None) -> Optional[str]:
         """
@@ -424,6 +1387,645 @@ class ReplayDetector(AnomalyDetector):
             return self.log_alert(alert)
         
         return None
+    
+    def detect_batch(self, can_ids: np.ndarray, payloads: np.ndarray, timestamps: np.ndarray,
+                     dlcs: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Detect replayed frames over arrays of frames
+        
+        Each frame's signature is (CAN ID, DLC, payload as one 64-bit word),
+        so hashing and counting are done with array operations.
+        
+        Args:
+            can_ids: CAN IDs, shape (n,)
+            payloads: uint8 array of shape (n, 8), zero padded
+            timestamps: Frame timestamps, shape (n,)
+            dlcs: Payload lengths (None = all 8)
+            
+        Returns:
+            Indices of frames whose signature was seen more than max_duplicates times
+        """
+        can_ids = np.asarray(can_ids, dtype=np.uint64)
+        payloads = np.ascontiguousarray(payloads, dtype=np.uint8).reshape(-1, 8)
+        dlcs = np.full(len(can_ids), 8, dtype=np.uint64) if dlcs is None else np.asarray(dlcs, dtype=np.uint64)
+        
+        # Zero bytes beyond the DLC so padding never splits a signature
+        mask = np.arange(8) < dlcs[:, None].astype(np.int64)
+        words = np.ascontiguousarray(np.where(mask, payloads, 0), dtype=np.uint8).view("<u8").ravel()
+        signatures = np.stack([(can_ids << np.uint64(4)) | dlcs, words], axis=1)
+        
+        counts, self.batch_tail = _window_counts(signatures, timestamps, self.window_seconds, self.batch_tail)
+        return np.flatnonzero(counts > self.max_duplicates)
+
+
+class PayloadProfile:
+    """Per-byte value histogram and per-bit flip counts of one CAN ID"""
+    
+    def __init__(self):
+        self.value_counts = [0] * (8 * 256)   # byte position * 256 + value
+        self.position_counts = [0] * 8        # frames that carried each byte
+        self.flip_counts = [0] * 64           # byte position * 8 + bit
+        self.flip_frames = [0] * 8            # consecutive frame pairs per byte
+        self.previous: Optional[bytes] = None
+        self.frames = 0
+        # Filled in once the baseline is learned
+        self.value_excess: Optional[List[float]] = None
+        self.flip_excess: Optional[List[float]] = None
+        self.entropy: List[float] = [0.0] * 8
+    
+    def learn(self, data: bytes):
+        """Add a frame to the histograms"""
+        values = self.value_counts
+        for position, value in enumerate(data):
+            values[position * 256 + value] += 1
+            self.position_counts[position] += 1
+        
+        previous = self.previous
+        if previous is not None:
+            for position in range(min(len(data), len(previous))):
+                self.flip_frames[position] += 1
+                flipped = data[position] ^ previous[position]
+                while flipped:
+                    low = flipped & -flipped
+                    self.flip_counts[position * 8 + low.bit_length() - 1] += 1
+                    flipped ^= low
+        self.frames += 1
+    
+    def freeze(self, alpha: float = 0.5):
+        """
+        Turn the histograms into per-byte lookup tables of excess surprisal
+        
+        value_excess[pos*256+v] is how many bits more surprising value v is at
+        pos than a typical value there (surprisal minus the byte's entropy).
+        flip_excess[pos*256+x] is the largest excess over the 8 bits for the
+        flip pattern x (xor with the previous frame) at pos.
+        """
+        self.value_excess = [0.0] * (8 * 256)
+        for position in range(8):
+            total = self.position_counts[position]
+            if total == 0:
+                continue
+            denominator = total + 256 * alpha
+            counts = self.value_counts[position * 256:(position + 1) * 256]
+            surprisal = [-math.log2((c + alpha) / denominator) for c in counts]
+            entropy = sum(c / total * s for c, s in zip(counts, surprisal) if c)
+            self.entropy[position] = entropy
+            self.value_excess[position * 256:(position + 1) * 256] = [s - entropy for s in surprisal]
+        
+        self.flip_excess = [0.0] * (8 * 256)
+        for position in range(8):
+            pairs = self.flip_frames[position]
+            if pairs == 0:
+                continue
+            bit_cost = []
+            for bit in range(8):
+                p_flip = (self.flip_counts[position * 8 + bit] + alpha) / (pairs + 2 * alpha)
+                cost_flip, cost_keep = -math.log2(p_flip), -math.log2(1 - p_flip)
+                entropy = p_flip * cost_flip + (1 - p_flip) * cost_keep
+                bit_cost.append((cost_keep - entropy, cost_flip - entropy))
+            self.flip_excess[position * 256:(position + 1) * 256] = [
+                max(bit_cost[bit][(pattern >> bit) & 1] for bit in range(8))
+                for pattern in range(256)
+            ]
+
+
+class PayloadStatisticsDetector(AnomalyDetector):
+    """Anomaly 11: Detects payloads that do not fit the learned byte/bit statistics
+    
+    Learns, per CAN ID, a value histogram for every byte and flip rates for
+    every bit, then scores each frame with two table lookups per byte. Catches
+    fuzzing and spoofed payloads without a hand-written range per signal.
+    """
+    
+    def __init__(self, learning_frames: int = 1000, value_threshold_bits: float = 4.0,
+                 flip_threshold_bits: float = 8.0):
+        """
+        Args:
+            learning_frames: Frames per CAN ID used to learn the baseline
+            value_threshold_bits: Excess surprisal of a byte value that raises an alert
+            flip_threshold_bits: Excess surprisal of a bit flip (or missing flip) that raises an alert
+        """
+        super().__init__("Payload Statistics")
+        self.learning_frames = learning_frames
+        self.value_threshold_bits = value_threshold_bits
+        self.flip_threshold_bits = flip_threshold_bits
+        self.profiles: Dict[int, PayloadProfile] = {}
+    
+    def detect(self, can_id: int, data: bytes) -> Optional[str]:
+        """
+        Detect payload anomaly
+        
+        Args:
+            can_id: CAN ID
+            data: Message data bytes
+            
+        Returns:
+            Alert message if the payload does not fit the learned baseline
+        """
+        profile = self.profiles.get(can_id)
+        if profile is None:
+            profile = self.profiles[can_id] = PayloadProfile()
+        
+        data = bytes(data[:8])
+        if profile.value_excess is None:
+            profile.learn(data)
+            if profile.frames >= self.learning_frames:
+                profile.freeze()
+            profile.previous = data
+            return None
+        
+        value_excess, flip_excess, previous = profile.value_excess, profile.flip_excess, profile.previous
+        worst_value, worst_value_at = 0.0, -1
+        worst_flip, worst_flip_at = 0.0, -1
+        for position, value in enumerate(data):
+            excess = value_excess[position * 256 + value]
+            if excess > worst_value:
+                worst_value, worst_value_at = excess, position
+            if previous is not None and position < len(previous):
+                excess = flip_excess[position * 256 + (value ^ previous[position])]
+                if excess > worst_flip:
+                    worst_flip, worst_flip_at = excess, position
+        profile.previous = data
+        
+        if worst_value > self.value_threshold_bits:
+            alert = f"⚠️  ANOMALY 11: Payload anomaly on CAN ID 0x{can_id:03X} - byte {worst_value_at} value 0x{data[worst_value_at]:02X} is {worst_value:.1f} bits above baseline entropy (threshold: {self.value_threshold_bits} bits)"
+            return self.log_alert(alert)
+        
+        if worst_flip > self.flip_threshold_bits:
+            alert = f"⚠️  ANOMALY 11: Payload anomaly on CAN ID 0x{can_id:03X} - bit flips in byte {worst_flip_at} are {worst_flip:.1f} bits above baseline (threshold: {self.flip_threshold_bits} bits)"
+            return self.log_alert(alert)
+        
+        return None
+    
+    def get_profile(self, can_id: int) -> Optional[Dict]:
+        """
+        Get the learned statistics of a CAN ID
+        
+        Args:
+            can_id: CAN ID
+            
+        Returns:
+            Dict with learning state, per-byte entropy and per-bit flip rates, or None
+        """
+        profile = self.profiles.get(can_id)
+        if profile is None:
+            return None
+        
+        return {
+            "frames": profile.frames,
+            "learned": profile.value_excess is not None,
+            "byte_entropy": list(profile.entropy),
+            "bit_flip_rate": [
+                profile.flip_counts[bit] / profile.flip_frames[bit // 8] if profile.flip_frames[bit // 8] else 0.0
+                for bit in range(64)
+            ],
+        }
+
+
+class TimingFingerprintDetector(AnomalyDetector):
+    """Anomaly 12: Detects changes in the inter-arrival time distribution of a CAN ID
+    
+    Spoofed frames injected next to the legitimate ECU reshape the gaps
+    between frames long before the average rate crosses a frequency
+    threshold. Each CAN ID keeps a log-bucketed inter-arrival histogram
+    learned from normal traffic and a sliding window of the latest gaps;
+    the window is compared against the baseline with the total variation
+    distance (O(buckets), no allocations per frame).
+    """
+    
+    # Per-ID state header; baseline, window histogram and window ring follow it
+    _LAST, _SAMPLES, _POS, _FILLED, _ALARM = range(5)
+    _HEADER = 5
+    
+    def __init__(self, min_interval: float = 0.001, buckets_per_octave: int = 2, buckets: int = 24,
+                 learning_samples: int = 500, window_size: int = 32, threshold: float = 0.5):
+        """
+        Args:
+            min_interval: Gap (seconds) mapped to the first bucket; shorter gaps share it
+            buckets_per_octave: Histogram resolution (buckets per doubling of the gap)
+            buckets: Number of histogram buckets; longer gaps share the last one
+            learning_samples: Gaps per CAN ID used to learn the baseline histogram
+            window_size: Number of latest gaps compared against the baseline
+            threshold: Total variation distance (0-1) that raises an alert
+        """
+        super().__init__("Timing Fingerprint")
+        self.min_interval = min_interval
+        self.buckets_per_octave = buckets_per_octave
+        self.buckets = buckets
+        self.learning_samples = learning_samples
+        self.window_size = window_size
+        self.threshold = threshold
+        self.streams: Dict[int, list] = {}
+    
+    def _bucket(self, gap: float) -> int:
+        """Log-scale histogram bucket of an inter-arrival gap"""
+        if gap <= self.min_interval:
+            return 0
+        bucket = int(math.log2(gap / self.min_interval) * self.buckets_per_octave)
+        return bucket if bucket < self.buckets else self.buckets - 1
+    
+    def detect(self, can_id: int, timestamp: float = None) -> Optional[str]:
+        """
+        Detect inter-arrival timing anomaly
+        
+        Args:
+            can_id: CAN ID
+            timestamp: Message timestamp
+            
+        Returns:
+            Alert message if the recent gaps diverge from the learned distribution
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        state = self.streams.get(can_id)
+        if state is None:
+            # Header + baseline + window histogram + window ring, allocated once
+            self.streams[can_id] = [timestamp, 0, 0, 0, False] + [0.0] * (2 * self.buckets) + [0] * self.window_size
+            return None
+        
+        gap = timestamp - state[self._LAST]
+        state[self._LAST] = timestamp
+        bucket = self._bucket(gap)
+        baseline = self._HEADER
+        window = baseline + self.buckets
+        
+        # Learning: count gaps, then freeze into smoothed probabilities
+        if state[self._SAMPLES] < self.learning_samples:
+            state[baseline + bucket] += 1.0
+            state[self._SAMPLES] += 1
+            if state[self._SAMPLES] == self.learning_samples:
+                total = self.learning_samples + 0.5 * self.buckets
+                for i in range(baseline, window):
+                    state[i] = (state[i] + 0.5) / total
+            return None
+        
+        # Slide the window: replace the oldest gap's bucket with the new one
+        ring = window + self.buckets
+        pos = state[self._POS]
+        if state[self._FILLED] == self.window_size:
+            state[window + state[ring + pos]] -= 1.0
+        else:
+            state[self._FILLED] += 1
+        state[ring + pos] = bucket
+        state[window + bucket] += 1.0
+        state[self._POS] = (pos + 1) % self.window_size
+        if state[self._FILLED] < self.window_size:
+            return None
+        
+        distance = 0.0
+        scale = 1.0 / self.window_size
+        for i in range(self.buckets):
+            distance += abs(state[window + i] * scale - state[baseline + i])
+        distance *= 0.5
+        
+        if distance <= self.threshold:
+            state[self._ALARM] = False
+            return None
+        if state[self._ALARM]:
+            return None  # Still the same episode
+        
+        state[self._ALARM] = True
+        alert = f"⚠️  ANOMALY 12: Inter-arrival timing changed for CAN ID 0x{can_id:03X} - distance {distance:.2f} from learned fingerprint (threshold: {self.threshold})"
+        return self.log_alert(alert)
+    
+    def get_fingerprint(self, can_id: int) -> Optional[Dict]:
+        """
+        Get the learned and current inter-arrival histograms of a CAN ID
+        
+        Args:
+            can_id: CAN ID
+            
+        Returns:
+            Dict with bucket lower edges (seconds), baseline and window histograms, or None
+        """
+        state = self.streams.get(can_id)
+        if state is None:
+            return None
+        
+        baseline = self._HEADER
+        window = baseline + self.buckets
+        learned = state[self._SAMPLES] >= self.learning_samples
+        return {
+            "learned": learned,
+            "bucket_edges": [self.min_interval * 2 ** (i / self.buckets_per_octave) for i in range(self.buckets)],
+            "baseline": state[baseline:window] if learned else None,
+            "window": [count / max(state[self._FILLED], 1) for count in state[window:window + self.buckets]],
+        }
+
+
+_CAPTURE_ID_RE = re.compile(r"ID: 0x([0-9A-Fa-f]+)|\s([0-9A-Fa-f]{3}|[0-9A-Fa-f]{8})#")
+
+
+class UnknownCANIDDetector(AnomalyDetector):
+    """Anomaly 13: Detects frames from CAN IDs outside the communication matrix
+    
+    Standard (11-bit) IDs are looked up in a 2048-bit bitmap, extended
+    (29-bit) IDs in a hashed set, so every frame costs a single bit test.
+    The first frame of each unknown ID raises an alert; the whitelist can be
+    learned from a capture and persisted as JSON.
+    """
+    
+    def __init__(self, known_ids: Optional[List[int]] = None, learning: bool = False,
+                 max_reported: int = 4096):
+        """
+        Args:
+            known_ids: Whitelisted CAN IDs (IDs above 0x7FF are treated as extended)
+            learning: Start in learning mode (frames extend the whitelist instead of alerting)
+            max_reported: Unknown extended IDs remembered for once-per-ID alerting
+        """
+        super().__init__("Unknown CAN ID")
+        self.standard = bytearray(256)  # 2048 bits, one per 11-bit ID
+        self.extended = set()
+        self.reported_standard = bytearray(256)
+        self.reported_extended = set()
+        self.max_reported = max_reported
+        self.learning = learning
+        for can_id in known_ids or []:
+            self.add(can_id)
+    
+    def add(self, can_id: int, is_extended: Optional[bool] = None):
+        """Add a CAN ID to the whitelist"""
+        # IDs above 11 bits can only be extended, whatever the frame flag says
+        is_extended = is_extended or can_id > 0x7FF
+        if is_extended:
+            self.extended.add(can_id & 0x1FFFFFFF)
+        else:
+            self.standard[can_id >> 3] |= 1 << (can_id & 7)
+    
+    def is_known(self, can_id: int, is_extended: Optional[bool] = None) -> bool:
+        """Check whether a CAN ID is whitelisted"""
+        # IDs above 11 bits can only be extended, whatever the frame flag says
+        is_extended = is_extended or can_id > 0x7FF
+        if is_extended:
+            return (can_id & 0x1FFFFFFF) in self.extended
+        return bool(self.standard[can_id >> 3] & (1 << (can_id & 7)))
+    
+    def detect(self, can_id: int, is_extended: Optional[bool] = None) -> Optional[str]:
+        """
+        Detect frame from an unknown CAN ID
+        
+        Args:
+            can_id: CAN ID
+            is_extended: Extended (29-bit) frame (None = infer from the ID value)
+            
+        Returns:
+            Alert message on the first frame of an unknown ID
+        """
+        # IDs above 11 bits can only be extended, whatever the frame flag says
+        is_extended = is_extended or can_id > 0x7FF
+        
+        if not is_extended:
+            byte, bit = can_id >> 3, 1 << (can_id & 7)
+            if self.standard[byte] & bit:
+                return None
+            if self.learning:
+                self.standard[byte] |= bit
+                return None
+            if self.reported_standard[byte] & bit:
+                return None
+            self.reported_standard[byte] |= bit
+            id_text = f"0x{can_id:03X}"
+        else:
+            can_id &= 0x1FFFFFFF
+            if can_id in self.extended:
+                return None
+            if self.learning:
+                self.extended.add(can_id)
+                return None
+            if can_id in self.reported_extended:
+                return None
+            if len(self.reported_extended) >= self.max_reported:
+                self.reported_extended.clear()
+            self.reported_extended.add(can_id)
+            id_text = f"0x{can_id:08X} (extended)"
+        
+        alert = f"⚠️  ANOMALY 13: Unknown CAN ID {id_text} - not in the communication matrix"
+        return self.log_alert(alert)
+    
+    def learn_from_capture(self, path: str) -> int:
+        """
+        Whitelist every CAN ID found in a capture file
+        
+        Understands the CANMessageLogger format ("ID: 0x123") and candump
+        logs ("vcan0 123#DEADBEEF", 8 hex digits for extended IDs).
+        
+        Args:
+            path: Capture file
+            
+        Returns:
+            Number of IDs added to the whitelist
+        """
+        before = len(self)
+        with open(path, "r") as f:
+            for line in f:
+                match = _CAPTURE_ID_RE.search(line)
+                if not match:
+                    continue
+                if match.group(1):
+                    self.add(int(match.group(1), 16))
+                else:
+                    text = match.group(2)
+                    self.add(int(text, 16), is_extended=len(text) == 8)
+        return len(self) - before
+    
+    def known_ids(self) -> Tuple[List[int], List[int]]:
+        """
+        Get the whitelist
+        
+        Returns:
+            (standard IDs, extended IDs), both sorted
+        """
+        standard = [can_id for can_id in range(2048) if self.standard[can_id >> 3] & (1 << (can_id & 7))]
+        return standard, sorted(self.extended)
+    
+    def save(self, path: str):
+        """Persist the whitelist as JSON"""
+        standard, extended = self.known_ids()
+        with open(path, "w") as f:
+            json.dump({
+                "standard": [f"0x{can_id:03X}" for can_id in standard],
+                "extended": [f"0x{can_id:08X}" for can_id in extended],
+            }, f, indent=2)
+    
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "UnknownCANIDDetector":
+        """Create a detector from a whitelist saved with save()"""
+        with open(path, "r") as f:
+            whitelist = json.load(f)
+        detector = cls(**kwargs)
+        for can_id in whitelist.get("standard", []):
+            detector.add(int(can_id, 16), is_extended=False)
+        for can_id in whitelist.get("extended", []):
+            detector.add(int(can_id, 16), is_extended=True)
+        return detector
+    
+    def __len__(self) -> int:
+        return sum(bin(byte).count("1") for byte in self.standard) + len(self.extended)
+
+
+class SessionStateDetector(AnomalyDetector):
+    """Anomaly 14: Detects charging sessions that skip or reorder their steps
+    
+    A session goes Boot -> Status -> RemoteStart/StartTransaction -> CAN 0x200
+    -> MeterValues -> Stop. Each connector runs a finite state machine driven
+    by a flat transition table, so every event is one table lookup and a
+    connector's state is a single byte. A connector first seen mid-session
+    (e.g. after an IDS restart) syncs to the state its first event implies
+    instead of alerting; after an illegal transition it resyncs the same way.
+    """
+    
+    STATES = ("Unknown", "Booted", "Available", "Authorized", "Energized", "Charging")
+    UNKNOWN, BOOTED, AVAILABLE, AUTHORIZED, ENERGIZED, CHARGING = range(6)
+    
+    EVENT_NAMES = ("BootNotification", "StatusNotification", "StartTransaction",
+                   "CAN 0x200", "MeterValues", "StopTransaction")
+    BOOT, STATUS, START, CAN_START, METER, STOP = range(6)
+    
+    # OCPP actions and CAN IDs that drive the state machine
+    OCPP_EVENTS = {
+        "BootNotification": BOOT,
+        "StatusNotification": STATUS,
+        "RemoteStartTransaction": START,
+        "StartTransaction": START,
+        "MeterValues": METER,
+        "RemoteStopTransaction": STOP,
+        "StopTransaction": STOP,
+    }
+    CAN_EVENTS = {0x200: CAN_START}
+    
+    _X = 0xFF  # Illegal transition
+    # Next state per (state, event); columns follow EVENT_NAMES.
+    # The Unknown row doubles as the resync target of every event.
+    TRANSITIONS = bytes([
+        # Boot     Status     Start       CAN 0x200  Meter     Stop
+        BOOTED,    AVAILABLE, AUTHORIZED, ENERGIZED, CHARGING, AVAILABLE,  # Unknown
+        BOOTED,    AVAILABLE, _X,         _X,        _X,       _X,         # Booted
+        BOOTED,    AVAILABLE, AUTHORIZED, _X,        _X,       _X,         # Available
+        BOOTED,    AUTHORIZED, AUTHORIZED, ENERGIZED, _X,      AVAILABLE,  # Authorized
+        BOOTED,    ENERGIZED, ENERGIZED,  ENERGIZED, CHARGING, AVAILABLE,  # Energized
+        BOOTED,    CHARGING,  _X,         CHARGING,  CHARGING, AVAILABLE,  # Charging
+    ])
+    
+    def __init__(self, default_connector: int = 1):
+        """
+        Args:
+            default_connector: Connector used when an event does not name one
+                and no connector of the charge point is waiting for it
+        """
+        super().__init__("Session State")
+        self.default_connector = default_connector
+        self.slots: Dict[Tuple[str, int], int] = {}  # (charge point, connector): slot
+        self.connectors: Dict[str, List[int]] = defaultdict(list)  # charge point: connectors
+        self.states = bytearray()
+    
+    def _slot(self, charge_point_id: str, connector_id: int) -> int:
+        """Get or allocate the state slot of a connector"""
+        key = (charge_point_id, connector_id)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.slots[key] = len(self.states)
+            self.states.append(self.UNKNOWN)
+            self.connectors[charge_point_id].append(connector_id)
+        return slot
+    
+    def _resolve_connector(self, charge_point_id: str, event: int) -> int:
+        """Pick the connector an event without connectorId belongs to"""
+        n_events = len(self.EVENT_NAMES)
+        for connector_id in self.connectors.get(charge_point_id, ()):
+            state = self.states[self.slots[(charge_point_id, connector_id)]]
+            if state != self.UNKNOWN and self.TRANSITIONS[state * n_events + event] != self._X:
+                return connector_id
+        return self.default_connector
+    
+    def _resolve_waiting(self, event: int) -> Tuple[str, int]:
+        """Pick the connector a CAN event that names no charge point belongs to
+        
+        The CAN bus carries no charge point identity, so the event goes to the
+        connector waiting for it (the event moves it to a new state), else to
+        a connector for which it is a legal repeat (e.g. the periodic 0x200
+        while Energized/Charging), else to the first known connector.
+        """
+        n_events = len(self.EVENT_NAMES)
+        repeat = None
+        for key, slot in self.slots.items():
+            state = self.states[slot]
+            next_state = self.TRANSITIONS[state * n_events + event]
+            if state == self.UNKNOWN or next_state == self._X:
+                continue
+            if next_state != state:
+                return key
+            if repeat is None:
+                repeat = key
+        if repeat is not None:
+            return repeat
+        return next(iter(self.slots), ("default", self.default_connector))
+    
+    def detect(self, event: int, charge_point_id: str = "default",
+               connector_id: Optional[int] = None) -> Optional[str]:
+        """
+        Advance a connector's state machine
+        
+        Args:
+            event: Event index (see OCPP_EVENTS / CAN_EVENTS)
+            charge_point_id: Charge point identity
+            connector_id: Connector (None = resolve from the current states)
+            
+        Returns:
+            Alert message if the event is illegal in the connector's state
+        """
+        if event == self.BOOT or (event == self.STATUS and connector_id == 0):
+            # Charge-point wide events apply to every connector
+            alerts = [self._advance(charge_point_id, c, event)
+                      for c in self.connectors.get(charge_point_id) or [self.default_connector]]
+            return next((alert for alert in alerts if alert), None)
+        
+        if connector_id is None:
+            connector_id = self._resolve_connector(charge_point_id, event)
+        return self._advance(charge_point_id, connector_id, event)
+    
+    def _advance(self, charge_point_id: str, connector_id: int, event: int) -> Optional[str]:
+        """Apply one transition, resyncing and alerting if it is illegal"""
+        slot = self._slot(charge_point_id, connector_id)
+        n_events = len(self.EVENT_NAMES)
+        state = self.states[slot]
+        next_state = self.TRANSITIONS[state * n_events + event]
+        if next_state != self._X:
+            self.states[slot] = next_state
+            return None
+        
+        self.states[slot] = self.TRANSITIONS[self.UNKNOWN * n_events + event]
+        expected = [name for i, name in enumerate(self.EVENT_NAMES)
+                    if self.TRANSITIONS[state * n_events + i] != self._X and i != self.BOOT]
+        alert = f"⚠️  ANOMALY 14: Charging session order violated - {charge_point_id} connector {connector_id}: {self.EVENT_NAMES[event]} while {self.STATES[state]} (expected: {', '.join(expected)})"
+        return self.log_alert(alert)
+    
+    def detect_ocpp(self, action: str, charge_point_id: str = "default",
+                    connector_id: Optional[int] = None) -> Optional[str]:
+        """Feed an OCPP action (actions outside the session flow are ignored)"""
+        event = self.OCPP_EVENTS.get(action)
+        if event is None:
+            return None
+        return self.detect(event, charge_point_id, connector_id)
+    
+    def detect_can(self, can_id: int, charge_point_id: Optional[str] = None,
+                   connector_id: Optional[int] = None) -> Optional[str]:
+        """Feed a CAN frame (IDs outside the session flow are ignored)
+        
+        Without a charge point the frame is applied to the connector waiting
+        for it (see _resolve_waiting).
+        """
+        event = self.CAN_EVENTS.get(can_id)
+        if event is None:
+            return None
+        if charge_point_id is None:
+            charge_point_id, connector_id = self._resolve_waiting(event)
+        return self.detect(event, charge_point_id, connector_id)
+    
+    def get_state(self, charge_point_id: str, connector_id: int) -> str:
+        """Get the session state name of a connector"""
+        slot = self.slots.get((charge_point_id, connector_id))
+        return self.STATES[self.states[slot] if slot is not None else self.UNKNOWN]
 
 
 if __name__ == "__main__":
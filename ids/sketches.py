@@ -0,0 +1,350 @@
+"""
+Streaming Sketches for IDS
+
+Fixed-memory summaries used by detectors that must survive hostile input:
+- SlidingCountMinSketch: approximate per-key counts over a sliding window
+- KLLSketch: mergeable streaming quantiles of a metric
+- AdaptiveThreshold: per-key detector thresholds learned from KLL sketches
+"""
+
+import math
+import random
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class SlidingCountMinSketch:
+    """Count-Min sketch over a sliding time window
+    
+    The window is split into sub-buckets, each holding its own Count-Min
+    table; expired buckets are zeroed as time advances. Memory is fixed at
+    buckets * depth * width counters no matter how many distinct keys are
+    seen, so spoofed-source floods cannot grow it. Counts are never
+    underestimated; the window edge has sub-bucket granularity.
+    """
+    
+    def __init__(self, window_seconds: float, buckets: int = 5, width: int = 2048,
+                 depth: int = 4, top_k: int = 64):
+        """
+        Initialize sketch
+        
+        Args:
+            window_seconds: Sliding window length
+            buckets: Number of sub-buckets the window is split into
+            width: Counters per hash row
+            depth: Number of hash rows
+            top_k: How many heavy hitters to remember for reporting
+        """
+        self.window_seconds = window_seconds
+        self.bucket_seconds = window_seconds / buckets
+        self.width = width
+        self.depth = depth
+        self.tables: List[List[int]] = [[0] * (width * depth) for _ in range(buckets)]
+        self.current_bucket = None
+        self.top_k = top_k
+        self.heavy_hitters: Dict[Hashable, Tuple[int, int]] = {}  # key: (estimate, bucket)
+    
+    def _indexes(self, key: Hashable) -> List[int]:
+        """Counter positions of a key (double hashing, one per row)"""
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+    
+    def _advance(self, timestamp: float):
+        """Rotate the ring, zeroing buckets that fell out of the window"""
+        bucket = int(timestamp / self.bucket_seconds)
+        if self.current_bucket is None:
+            self.current_bucket = bucket
+            return
+        
+        steps = min(bucket - self.current_bucket, len(self.tables))
+        for step in range(1, steps + 1):
+            table = self.tables[(self.current_bucket + step) % len(self.tables)]
+            table[:] = [0] * len(table)
+        if bucket > self.current_bucket:
+            self.current_bucket = bucket
+    
+    def add(self, key: Hashable, timestamp: float, count: int = 1) -> int:
+        """
+        Count an event and return the key's estimated count in the window
+        
+        Args:
+            key: Event key (e.g. source address)
+            timestamp: Event time
+            count: Increment
+        
+        Returns:
+            Estimated number of events for key in the window
+        """
+        self._advance(timestamp)
+        indexes = self._indexes(key)
+        current = self.tables[self.current_bucket % len(self.tables)]
+        for index in indexes:
+            current[index] += count
+        
+        estimate = min(sum(table[index] for table in self.tables) for index in indexes)
+        self._track(key, estimate)
+        return estimate
+    
+    def estimate(self, key: Hashable, timestamp: float) -> int:
+        """Estimated number of events for key in the window ending at timestamp"""
+        self._advance(timestamp)
+        return min(sum(table[index] for table in self.tables) for index in self._indexes(key))
+    
+    def _weight(self, entry: Tuple[int, int]) -> int:
+        """Heavy-hitter estimate, or 0 once its bucket left the window"""
+        estimate, bucket = entry
+        return estimate if self.current_bucket - bucket < len(self.tables) else 0
+    
+    def _track(self, key: Hashable, estimate: int):
+        """Keep a bounded list of the heaviest keys seen recently"""
+        if key not in self.heavy_hitters and len(self.heavy_hitters) >= self.top_k:
+            # Evict the lightest entry; new keys only get in if they outweigh it
+            lightest = min(self.heavy_hitters, key=lambda k: self._weight(self.heavy_hitters[k]))
+            if self._weight(self.heavy_hitters[lightest]) > estimate:
+                return
+            del self.heavy_hitters[lightest]
+        self.heavy_hitters[key] = (estimate, self.current_bucket)
+    
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        """
+        Get the heaviest keys of the current window
+        
+        Args:
+            n: Number of keys
+        
+        Returns:
+            (key, estimated count) pairs, heaviest first
+        """
+        weights = [(key, self._weight(entry)) for key, entry in self.heavy_hitters.items()]
+        return sorted((item for item in weights if item[1] > 0), key=lambda item: item[1], reverse=True)[:n]
+
+
+class KLLSketch:
+    """KLL streaming quantile sketch
+    
+    A stack of compactors: when a level fills up it is sorted and every
+    other item is promoted to the next level with twice the weight. Memory
+    stays around k / (1 - c) items plus one per level, whatever the stream
+    length, and two sketches merge by concatenating their levels, so
+    sharded workers can combine baselines cheaply.
+    """
+    
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0, seed: Optional[int] = None):
+        """
+        Initialize sketch
+        
+        Args:
+            k: Capacity of the top level (rank error is roughly 1.7 / k)
+            c: Capacity ratio between a level and the one above it
+            seed: Seed for the compaction coin flips (None = random)
+        """
+        self.k = k
+        self.c = c
+        self.compactors: List[List[float]] = [[]]
+        self.count = 0
+        self.size = 0
+        self.max_size = 0
+        self._random = random.Random(seed)
+        self._update_max_size()
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+    
+    def _update_max_size(self):
+        self.max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+    
+    def add(self, value: float):
+        """Add a value to the sketch"""
+        self.compactors[0].append(value)
+        self.count += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+    
+    def _compress(self):
+        """Compact full levels until the sketch is back under its budget"""
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+                self._update_max_size()
+            
+            # Keep a random half of the sorted pairs; an odd item stays behind
+            items.sort()
+            paired = len(items) - len(items) % 2
+            offset = self._random.getrandbits(1)
+            self.compactors[level + 1].extend(items[offset:paired:2])
+            del items[:paired]
+            
+            self.size = sum(len(compactor) for compactor in self.compactors)
+            if self.size < self.max_size:
+                break
+    
+    def merge(self, other: "KLLSketch"):
+        """
+        Merge another sketch into this one
+        
+        Args:
+            other: Sketch built with the same k and c
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.size = sum(len(compactor) for compactor in self.compactors)
+        self._update_max_size()
+        while self.size >= self.max_size:
+            self._compress()
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile
+        
+        Args:
+            q: Quantile in [0, 1]
+        
+        Returns:
+            Estimated value at quantile q (None if the sketch is empty)
+        """
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        if not weighted:
+            return None
+        
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+    
+    def __len__(self) -> int:
+        return self.count
+
+
+OVERFLOW_KEY = "__overflow__"
+
+
+class AdaptiveThreshold:
+    """Per-key thresholds set at a quantile of the observed metric times a margin
+    
+    Detectors feed the metric they compare against their threshold (rate,
+    delta per second, burst count) for every event; the threshold of a key
+    becomes quantile(q) * margin once min_samples are seen. During that
+    warm-up every value is learned, since the hand-set default may sit far
+    below a key's normal level (a 100 Hz ECU against a 20 Hz default);
+    afterwards alerting values are dropped. The first learned threshold is
+    kept as the key's baseline and later refreshes may not grow past
+    baseline * max_growth, so a slow ramp cannot raise the limit step by
+    step. Every learned threshold is also capped at ceiling * default.
+    Thresholds are cached and refreshed every few samples.
+    
+    At most max_keys keys get their own sketch; keys first seen after that
+    (e.g. a flood of spoofed CAN IDs) share one overflow sketch, so memory
+    stays fixed and learned keys are never evicted.
+    """
+    
+    def __init__(self, quantile: float = 0.999, margin: float = 1.5, min_samples: int = 500,
+                 k: int = 200, refresh_every: int = 64, max_growth: float = 1.25,
+                 ceiling: float = 10.0, max_keys: int = 2048):
+        """
+        Initialize adaptive threshold
+        
+        Args:
+            quantile: Quantile of the normal metric the threshold is based on
+            margin: Multiplier applied to the quantile
+            min_samples: Samples per key before the learned threshold replaces the default
+            k: KLL sketch size
+            refresh_every: Samples between threshold recomputations
+            max_growth: Largest factor a threshold may grow past its warm-up baseline
+            ceiling: Hard cap on a learned threshold, as a multiple of the default
+            max_keys: Keys with their own sketch (later keys share OVERFLOW_KEY)
+        """
+        self.quantile = quantile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.k = k
+        self.refresh_every = refresh_every
+        self.max_growth = max_growth
+        self.ceiling = ceiling
+        self.max_keys = max_keys
+        self.sketches: Dict[Hashable, KLLSketch] = {}
+        self.thresholds: Dict[Hashable, float] = {}
+        self.baselines: Dict[Hashable, float] = {}
+    
+    def _key(self, key: Hashable) -> Hashable:
+        """Map a key to its own sketch, or to the overflow sketch once max_keys are tracked"""
+        if key in self.sketches or len(self.sketches) < self.max_keys:
+            return key
+        return OVERFLOW_KEY
+    
+    def learning(self, key: Hashable) -> bool:
+        """Whether a key is still warming up (its default threshold is in use)"""
+        sketch = self.sketches.get(self._key(key))
+        return sketch is None or sketch.count < self.min_samples
+    
+    def observe(self, key: Hashable, value: float, alerting: bool = False):
+        """
+        Feed a value of the metric
+        
+        Args:
+            key: Metric key
+            value: Metric value
+            alerting: The value raised an alert (learned only during warm-up)
+        """
+        if alerting and not self.learning(key):
+            return
+        key = self._key(key)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = KLLSketch(self.k)
+        sketch.add(value)
+        if sketch.count >= self.min_samples and (sketch.count - self.min_samples) % self.refresh_every == 0:
+            self._refresh(key)
+    
+    def observe_batch(self, keys: Iterable[Hashable], values: Iterable[float],
+                      alerting: Iterable[bool]):
+        """Feed the values of a batch in order (see observe)"""
+        for key, value, alert in zip(keys, values, alerting):
+            self.observe(key, value, alert)
+    
+    def _refresh(self, key: Hashable):
+        sketch = self.sketches[key]
+        if sketch.count >= self.min_samples:
+            learned = float(sketch.quantile(self.quantile)) * self.margin
+            baseline = self.baselines.setdefault(key, learned)
+            self.thresholds[key] = min(learned, baseline * self.max_growth)
+    
+    def threshold(self, key: Hashable, default: float) -> float:
+        """
+        Get the current threshold of a key
+        
+        Args:
+            key: Metric key (e.g. CAN ID, parameter)
+            default: Hand-set threshold used until the key has min_samples
+        """
+        learned = self.thresholds.get(self._key(key))
+        if learned is None:
+            return default
+        return min(learned, default * self.ceiling)
+    
+    def merge(self, other: "AdaptiveThreshold"):
+        """Merge the baselines learned by another worker into this one"""
+        for key, sketch in other.sketches.items():
+            key = self._key(key)
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = mine = KLLSketch(self.k)
+                mine.merge(sketch)
+            self._refresh(key)
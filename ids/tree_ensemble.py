@@ -0,0 +1,291 @@
+"""
+Compiled Tree Ensembles
+
+Runs the notebook's RandomForest and IsolationForest without scikit-learn:
+- export_models(): flattens fitted sklearn forests into NumPy arrays
+  (feature, threshold, left, right, leaf value) saved as one .npz file
+- TreeEnsemble: vectorized batch evaluator (all trees, all rows per step)
+  whose predictions match sklearn exactly
+- CLI: convert a joblib export and benchmark it against sklearn
+
+Usage:
+    python ids/tree_ensemble.py ids_models.joblib ids/models/ids_models.npz
+"""
+
+import argparse
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+
+RANDOM_FOREST = "random_forest"
+ISOLATION_FOREST = "isolation_forest"
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Average path length of an unsuccessful BST search (same formula as sklearn)"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros(n_samples.shape)
+    result[n_samples == 2] = 1.0
+    rest = n_samples > 2
+    result[rest] = (2.0 * (np.log(n_samples[rest] - 1.0) + np.euler_gamma)
+                    - 2.0 * (n_samples[rest] - 1.0) / n_samples[rest])
+    return result
+
+
+def export_model(model) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted RandomForestClassifier or IsolationForest
+    
+    All trees are concatenated into one node table. Leaves point to
+    themselves, so evaluation can step every row until nothing moves.
+    
+    Args:
+        model: Fitted sklearn forest
+    
+    Returns:
+        Dict of arrays (see TreeEnsemble)
+    """
+    is_isolation = hasattr(model, "offset_")
+    n_features = model.n_features_in_
+    # Bagged trees only see a feature subset when max_features < n_features
+    subsample = is_isolation and model._max_features != n_features
+    
+    features, thresholds, lefts, rights, values, roots, depths = [], [], [], [], [], [], []
+    offset = 0
+    for i, estimator in enumerate(model.estimators_):
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n_nodes)
+        
+        feature = tree.feature.astype(np.int64)
+        if subsample:
+            feature = np.where(leaf, 0, np.asarray(model.estimators_features_[i])[np.maximum(feature, 0)])
+        features.append(np.where(leaf, 0, feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, own, tree.children_left + offset))
+        rights.append(np.where(leaf, own, tree.children_right + offset))
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        
+        if is_isolation:
+            # Path contribution of each leaf, computed exactly as sklearn does
+            values.append(tree.compute_node_depths() + _average_path_length(tree.n_node_samples) - 1.0)
+        else:
+            proba = tree.value[:, 0, :model.n_classes_].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+        offset += n_nodes
+    
+    arrays = {
+        "kind": np.array(ISOLATION_FOREST if is_isolation else RANDOM_FOREST),
+        "n_features": np.array(n_features),
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "max_depth": np.array(max(depths)),
+    }
+    if is_isolation:
+        arrays["offset"] = np.array(model.offset_, dtype=np.float64)
+        arrays["denominator"] = np.array(len(model.estimators_) * _average_path_length(np.array([model._max_samples]))[0])
+    else:
+        arrays["classes"] = np.asarray(model.classes_)
+    return arrays
+
+
+def export_models(models: Dict[str, object], path: str):
+    """
+    Save several fitted forests into one .npz file
+    
+    Args:
+        models: {"can": RandomForestClassifier, "session": IsolationForest}
+        path: Output .npz file
+    """
+    arrays = {}
+    for name, model in models.items():
+        for key, array in export_model(model).items():
+            arrays[f"{name}.{key}"] = array
+    np.savez(path, **arrays)
+
+
+def load_models(path: str) -> Dict[str, "TreeEnsemble"]:
+    """Load every model stored with export_models()"""
+    with np.load(path, allow_pickle=False) as data:
+        grouped: Dict[str, Dict[str, np.ndarray]] = {}
+        for key in data.files:
+            name, field = key.split(".", 1)
+            grouped.setdefault(name, {})[field] = data[key]
+    return {name: TreeEnsemble(arrays) for name, arrays in grouped.items()}
+
+
+class TreeEnsemble:
+    """Vectorized evaluator for an exported forest
+    
+    Every step moves all unfinished (row, tree) pairs one level down with
+    array gathers and drops the pairs that reached a leaf, so deep trees
+    only cost work on the paths that are actually long. Inputs are rounded
+    to float32 and tree outputs are summed in tree order, as sklearn does,
+    so predictions match it exactly.
+    """
+    
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Args:
+            arrays: Output of export_model()
+        """
+        self.kind = str(arrays["kind"])
+        self.n_features = int(arrays["n_features"])
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.classes = arrays.get("classes")
+        # children[node, went_left]: one gather per step instead of two plus a select
+        self.children = np.stack([self.right, self.left], axis=1)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.offset = float(arrays["offset"]) if "offset" in arrays else None
+        self.denominator = float(arrays["denominator"]) if "denominator" in arrays else None
+    
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Find the leaf of every row in every tree
+        
+        Args:
+            X: Features, shape (n, n_features)
+        
+        Returns:
+            Global leaf node indices, shape (n, n_trees)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = len(X), len(self.roots)
+        flat_X = X.ravel()
+        
+        # One slot per (row, tree); row offsets into flat_X are precomputed
+        nodes = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * self.n_features, n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            went_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            moved = self.children[current, went_left.view(np.int8)]
+            nodes[active] = moved
+            active = active[~self.is_leaf[moved]]
+        return nodes.reshape(n_rows, n_trees)
+    
+    def _accumulate(self, X: np.ndarray) -> np.ndarray:
+        """Sum leaf values over trees in tree order"""
+        leaves = self.apply(X)
+        total = np.zeros((len(leaves),) + self.value.shape[1:], dtype=np.float64)
+        for tree in range(leaves.shape[1]):
+            total += self.value[leaves[:, tree]]
+        return total
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities (random forest)"""
+        return self._accumulate(X) / len(self.roots)
+    
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Opposite of the anomaly score (isolation forest; lower = more abnormal)"""
+        depths = self._accumulate(X)
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-(depths / self.denominator)))
+    
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """score_samples shifted so that negative values are outliers (isolation forest)"""
+        return self.score_samples(X) - self.offset
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict like the exported sklearn model
+        
+        Returns:
+            Class labels (random forest) or 1 / -1 for inlier / outlier (isolation forest)
+        """
+        if self.kind == ISOLATION_FOREST:
+            decision = self.decision_function(X)
+            labels = np.ones(len(decision), dtype=int)
+            labels[decision < 0] = -1
+            return labels
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+    
+    def synthetic_inputs(self, n: int, seed: int = 0) -> np.ndarray:
+        """Random rows spanning every feature's split range (for checks and benchmarks)"""
+        rng = np.random.default_rng(seed)
+        X = np.zeros((n, self.n_features))
+        split = np.isfinite(self.threshold)
+        for feature in range(self.n_features):
+            cuts = self.threshold[split & (self.feature == feature)]
+            if len(cuts):
+                low, high = cuts.min(), cuts.max()
+                margin = 0.1 * (high - low) + 1.0
+                X[:, feature] = rng.uniform(low - margin, high + margin, n)
+        return X
+
+
+def benchmark(sklearn_model, ensemble: TreeEnsemble, X: np.ndarray, batch_size: int = 256,
+              repeat: int = 20) -> Dict[str, float]:
+    """
+    Check that an exported model matches sklearn and time both per batch
+    
+    Args:
+        sklearn_model: Original fitted model
+        ensemble: Its exported TreeEnsemble
+        X: Test rows
+        batch_size: Rows per timed batch
+        repeat: Timed batches per implementation
+    
+    Returns:
+        Dict with mismatches and mean batch latency (ms) of both implementations
+    """
+    mismatches = int(np.sum(np.asarray(sklearn_model.predict(X)) != ensemble.predict(X)))
+    batch = X[:batch_size]
+    
+    def timed(predict) -> float:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predict(batch)
+        return (time.perf_counter() - start) / repeat * 1000.0
+    
+    return {
+        "rows": len(X),
+        "mismatches": mismatches,
+        "sklearn_ms": timed(sklearn_model.predict),
+        "compiled_ms": timed(ensemble.predict),
+    }
+
+
+def main(argv: Optional[list] = None):
+    """Convert a joblib model export to .npz and verify it against sklearn"""
+    parser = argparse.ArgumentParser(description="Export sklearn forests for the IDS")
+    parser.add_argument("source", help="joblib file with {'can': ..., 'session': ...}")
+    parser.add_argument("target", help="Output .npz file")
+    parser.add_argument("--samples", type=int, default=10000, help="Synthetic test rows per model")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per benchmark batch")
+    args = parser.parse_args(argv)
+    
+    import joblib
+    models = joblib.load(args.source)
+    export_models(models, args.target)
+    print(f"Exported {', '.join(models)} to {args.target}")
+    
+    for name, ensemble in load_models(args.target).items():
+        X = ensemble.synthetic_inputs(args.samples)
+        result = benchmark(models[name], ensemble, X, args.batch_size)
+        print(f"  {name} ({ensemble.kind}, {len(ensemble.roots)} trees): "
+              f"{result['mismatches']}/{result['rows']} mismatches, "
+              f"batch of {args.batch_size}: sklearn {result['sklearn_ms']:.2f} ms, "
+              f"compiled {result['compiled_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
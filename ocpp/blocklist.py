@@ -0,0 +1,217 @@
+"""
+Connection Blocklist
+
+Expiring blocklist of source addresses and networks, shared by the IDS
+(which adds offenders) and the OCPP server (which drops their connections
+before the WebSocket handshake):
+- Single addresses are found with one dict lookup on the address string
+- Networks (CIDR) are kept in one hash table per prefix length; a lookup
+  masks the address once per prefix length in use (a handful at most)
+- Entries expire on their own; lookups never take a lock or modify the
+  tables (expired entries are removed by prune())
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+
+DEFAULT_BLOCK_SECONDS = 300.0
+_DEFAULT_TTL = object()
+
+
+def _network_name(version: int, prefixlen: int, key: int) -> str:
+    address = ipaddress.IPv4Address(key) if version == 4 else ipaddress.IPv6Address(key)
+    return f"{address}/{prefixlen}"
+
+
+def _parse_address(address: str) -> Optional[Tuple[int, int]]:
+    """(IP version, address as int), or None if the string is not an address"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, address.split("%", 1)[0]), "big")
+    except OSError:
+        return None
+
+
+class Blocklist:
+    """Expiring IP/CIDR blocklist with constant-time lookups"""
+    
+    def __init__(self, default_ttl: Optional[float] = DEFAULT_BLOCK_SECONDS):
+        """
+        Initialize blocklist
+        
+        Args:
+            default_ttl: Seconds an entry stays blocked (None = until unblocked)
+        """
+        self.default_ttl = default_ttl
+        self._hosts: Dict[str, float] = {}  # normalized address: expiry
+        # (version, prefix length): {network address as int: expiry}
+        self._networks: Dict[Tuple[int, int], Dict[int, float]] = {}
+        self._reasons: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+    
+    def block(self, source: str, ttl=_DEFAULT_TTL, reason: str = "") -> str:
+        """
+        Block an address or a network
+        
+        Args:
+            source: Address ("192.168.1.100") or network ("10.0.0.0/8")
+            ttl: Seconds to block (default: default_ttl, None = until unblocked)
+            reason: Why the source is blocked
+        
+        Returns:
+            The normalized entry
+        """
+        if ttl is _DEFAULT_TTL:
+            ttl = self.default_ttl
+        expiry = float("inf") if ttl is None else time.time() + ttl
+        network = ipaddress.ip_network(source, strict=False)
+        
+        with self._lock:
+            if network.num_addresses == 1:
+                entry = str(network.network_address)
+                self._hosts[entry] = max(expiry, self._hosts.get(entry, 0.0))
+            else:
+                entry = str(network)
+                table = self._networks.setdefault((network.version, network.prefixlen), {})
+                key = int(network.network_address)
+                table[key] = max(expiry, table.get(key, 0.0))
+            if reason:
+                self._reasons[entry] = reason
+        return entry
+    
+    def unblock(self, source: str) -> bool:
+        """
+        Remove an address or network entry
+        
+        Returns:
+            True if the entry existed
+        """
+        network = ipaddress.ip_network(source, strict=False)
+        with self._lock:
+            if network.num_addresses == 1:
+                entry = str(network.network_address)
+                found = self._hosts.pop(entry, None) is not None
+            else:
+                entry = str(network)
+                table = self._networks.get((network.version, network.prefixlen), {})
+                found = table.pop(int(network.network_address), None) is not None
+                if not table:
+                    self._networks.pop((network.version, network.prefixlen), None)
+            self._reasons.pop(entry, None)
+        return found
+    
+    def is_blocked(self, address: str, now: Optional[float] = None) -> bool:
+        """
+        Check a source address
+        
+        Args:
+            address: Remote address as reported by the socket
+            now: Current time (default: now)
+        
+        Returns:
+            True if the address or one of its networks is blocked
+        """
+        if not self._hosts and not self._networks:
+            return False
+        if now is None:
+            now = time.time()
+        
+        if self._hosts.get(address, 0.0) > now:
+            return True
+        
+        parsed = _parse_address(address)
+        if parsed is None:
+            return False
+        version, value = parsed
+        if version == 6 and value >> 32 == 0xFFFF:  # IPv4-mapped (dual-stack socket)
+            version, value = 4, value & 0xFFFFFFFF
+            if self._hosts.get(socket.inet_ntoa(value.to_bytes(4, "big")), 0.0) > now:
+                return True
+        if not self._networks:
+            return False
+        
+        bits = 32 if version == 4 else 128
+        for (table_version, prefixlen), table in list(self._networks.items()):
+            if table_version == version:
+                shift = bits - prefixlen
+                if table.get(value >> shift << shift, 0.0) > now:
+                    return True
+        return False
+    
+    def reject(self, address: str) -> bool:
+        """is_blocked() that also counts rejected connections"""
+        if self.is_blocked(address):
+            self.rejected += 1
+            return True
+        return False
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Drop expired entries
+        
+        Returns:
+            Number of removed entries
+        """
+        if now is None:
+            now = time.time()
+        removed = 0
+        with self._lock:
+            for address in [address for address, expiry in self._hosts.items() if expiry <= now]:
+                del self._hosts[address]
+                self._reasons.pop(address, None)
+                removed += 1
+            for (version, prefixlen), table in list(self._networks.items()):
+                for key in [key for key, expiry in table.items() if expiry <= now]:
+                    del table[key]
+                    self._reasons.pop(_network_name(version, prefixlen, key), None)
+                    removed += 1
+                if not table:
+                    del self._networks[(version, prefixlen)]
+        return removed
+    
+    def entries(self) -> List[Dict[str, Union[str, float, None]]]:
+        """Active entries with their expiry time (None = permanent) and reason"""
+        self.prune()
+        result = []
+        with self._lock:
+            for address, expiry in self._hosts.items():
+                result.append((address, expiry))
+            for (version, prefixlen), table in self._networks.items():
+                for key, expiry in table.items():
+                    result.append((_network_name(version, prefixlen, key), expiry))
+            return [{"source": source, "expires": None if expiry == float("inf") else expiry,
+                     "reason": self._reasons.get(source, "")} for source, expiry in result]
+    
+    def __len__(self) -> int:
+        return len(self._hosts) + sum(len(table) for table in self._networks.values())
+    
+    def __contains__(self, address: str) -> bool:
+        return self.is_blocked(address)
+
+
+if __name__ == "__main__":
+    blocklist = Blocklist(default_ttl=60.0)
+    blocklist.block("192.168.1.100", reason="WebSocket flood")
+    blocklist.block("10.20.0.0/16", ttl=None, reason="Untrusted network")
+    blocklist.block("2001:db8::/32", ttl=5.0)
+    
+    for address in ["192.168.1.100", "192.168.1.101", "10.20.3.4", "::ffff:10.20.3.4", "2001:db8::1"]:
+        print(f"{address:20s} blocked: {blocklist.is_blocked(address)}")
+    
+    start = time.perf_counter()
+    for _ in range(100000):
+        blocklist.is_blocked("192.168.1.100")
+    print(f"Host lookup: {(time.perf_counter() - start) * 10:.2f} us")
+    start = time.perf_counter()
+    for _ in range(100000):
+        blocklist.is_blocked("10.20.3.4")
+    print(f"Network lookup: {(time.perf_counter() - start) * 10:.2f} us")
+    print(blocklist.entries())
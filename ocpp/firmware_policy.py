@@ -0,0 +1,191 @@
+"""
+Firmware Policy Engine
+
+Single source of truth for which firmware a charge point may boot with,
+shared by the OCPP server and the IDS:
+- Exact versions (case-insensitive) and semver ranges (">=1.5.0,<2.1.0")
+- Model-specific allow lists and deny lists
+- Rules compiled into hashed sets, decisions memoized per (version, model)
+"""
+
+import json
+import operator
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "firmware_policy.json")
+
+_VERSION_RE = re.compile(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:[-+](.*))?$", re.IGNORECASE)
+_COMPARATOR_RE = re.compile(r"^\s*(>=|<=|==|!=|>|<)\s*(\S+)\s*$")
+_OPERATORS = {">=": operator.ge, "<=": operator.le, "==": operator.eq,
+              "!=": operator.ne, ">": operator.gt, "<": operator.lt}
+
+# Suffixes that mark a release build; any other suffix (pre-releases, vendor
+# tags) keeps a version out of range rules
+RELEASE_SUFFIXES = ("release", "stable", "prod")
+
+Version = Tuple[int, int, int]
+Range = Tuple[Tuple[Tuple[object, Version], ...], str]  # ((op, version), ...), source text
+Rules = Tuple[Dict[str, str], Tuple[Range, ...]]  # {normalized exact version: rule}, ranges
+
+
+def normalize_version(version: str) -> str:
+    """Normalize a version string for exact matching (case and surrounding whitespace)"""
+    return version.strip().lower()
+
+
+def parse_version(version: str, release_suffixes: Optional[Tuple[str, ...]] = RELEASE_SUFFIXES) -> Optional[Version]:
+    """
+    Parse the numeric core of a firmware version
+    
+    Args:
+        version: Version string (e.g. "v1.6-release", "2.0.1")
+        release_suffixes: Suffixes accepted after the numeric core (None = any)
+    
+    Returns:
+        (major, minor, patch), or None if the string is not a release
+        version. A version with any other suffix ("v1.9-beta",
+        "v1.9-malicious") can only match exact allow rules, never an
+        allow range; deny ranges still see its numeric core.
+    """
+    match = _VERSION_RE.match(version.strip())
+    if not match:
+        return None
+    suffix = match.group(4)
+    if suffix is not None and release_suffixes is not None and suffix.lower() not in release_suffixes:
+        return None
+    return tuple(int(part or 0) for part in match.groups()[:3])
+
+
+def _compile_rules(entries: List[str]) -> Rules:
+    """Split rule strings into a hashed map of exact versions and parsed ranges"""
+    exact, ranges = {}, []
+    for entry in entries:
+        if entry[:1] not in "<>=!":
+            exact[normalize_version(entry)] = entry
+            continue
+        comparators = []
+        for part in entry.split(","):
+            match = _COMPARATOR_RE.match(part)
+            bound = parse_version(match.group(2), None) if match else None
+            if bound is None:
+                raise ValueError(f"Invalid firmware range: {entry!r}")
+            comparators.append((_OPERATORS[match.group(1)], bound))
+        ranges.append((tuple(comparators), entry))
+    return exact, tuple(ranges)
+
+
+def _match(version: str, parsed: Optional[Version], rules: Rules) -> Optional[str]:
+    """Return the rule matching a version (None if no rule matches)"""
+    exact, ranges = rules
+    rule = exact.get(normalize_version(version))
+    if rule is not None:
+        return rule
+    if parsed is not None:
+        for comparators, source in ranges:
+            if all(compare(parsed, bound) for compare, bound in comparators):
+                return source
+    return None
+
+
+class FirmwarePolicy:
+    """Compiled firmware allow/deny policy with a decision cache"""
+    
+    def __init__(self, allow: Optional[List[str]] = None, deny: Optional[List[str]] = None,
+                 models: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 release_suffixes: Optional[List[str]] = None, cache_size: int = 65536):
+        """
+        Initialize policy
+        
+        Args:
+            allow: Exact versions or semver ranges allowed for every model
+            deny: Exact versions or ranges that are always rejected (deny wins)
+            models: Per chargePointModel rules {"model": {"allow": [...], "deny": [...]}};
+                a model's allow list replaces the global one, deny lists add up
+            release_suffixes: Version suffixes treated as releases by range rules
+                (None = RELEASE_SUFFIXES)
+            cache_size: Memoized decisions kept before the cache is reset
+        """
+        self.allow = list(allow or [])
+        self.deny = list(deny or [])
+        self.models = models or {}
+        self.release_suffixes = tuple(suffix.lower() for suffix in (release_suffixes or RELEASE_SUFFIXES))
+        self.cache_size = cache_size
+        
+        self._allow = _compile_rules(self.allow)
+        self._deny = _compile_rules(self.deny)
+        self._model_allow = {model: _compile_rules(rules["allow"])
+                             for model, rules in self.models.items() if "allow" in rules}
+        self._model_deny = {model: _compile_rules(rules.get("deny", []))
+                            for model, rules in self.models.items()}
+        self._cache: Dict[Tuple[str, Optional[str]], Tuple[bool, str]] = {}
+    
+    @classmethod
+    def load(cls, path: str = DEFAULT_POLICY_FILE) -> "FirmwarePolicy":
+        """Load a policy from a JSON file ({"allow": [...], "deny": [...], "models": {...}})"""
+        with open(path, "r") as f:
+            definition = json.load(f)
+        return cls(definition.get("allow"), definition.get("deny"), definition.get("models"),
+                   definition.get("release_suffixes"))
+    
+    def check(self, version: str, model: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Decide whether a firmware version may boot
+        
+        Args:
+            version: Firmware version reported in BootNotification
+            model: chargePointModel (None = global rules only)
+        
+        Returns:
+            (allowed, reason)
+        """
+        key = (version, model)
+        decision = self._cache.get(key)
+        if decision is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            decision = self._cache[key] = self._decide(version, model)
+        return decision
+    
+    def is_allowed(self, version: str, model: Optional[str] = None) -> bool:
+        """Check whether a firmware version may boot"""
+        return self.check(version, model)[0]
+    
+    def _decide(self, version: str, model: Optional[str]) -> Tuple[bool, str]:
+        # Deny rules see the numeric core of any version, allow ranges only releases
+        core = parse_version(version, None)
+        rule = _match(version, core, self._deny)
+        if rule is None and model in self._model_deny:
+            rule = _match(version, core, self._model_deny[model])
+        if rule is not None:
+            return False, f"denied by rule '{rule}'"
+        
+        parsed = parse_version(version, self.release_suffixes)
+        
+        if model in self._model_allow:
+            if _match(version, parsed, self._model_allow[model]) is not None:
+                return True, "allowed"
+            return False, f"not allowed for model '{model}' {self.models[model]['allow']}"
+        
+        if _match(version, parsed, self._allow) is not None:
+            return True, "allowed"
+        return False, f"not in whitelist {self.allow}"
+    
+    def describe(self) -> str:
+        """Short human readable summary of the policy"""
+        text = f"allow {self.allow}"
+        if self.deny:
+            text += f", deny {self.deny}"
+        if self.models:
+            text += f", model rules for {sorted(self.models)}"
+        return text
+
+
+if __name__ == "__main__":
+    policy = FirmwarePolicy.load()
+    print(f"Firmware policy: {policy.describe()}")
+    for version in ["v1.6-release", "v2.0.1-prod", "evil-v9"]:
+        allowed, reason = policy.check(version)
+        print(f"  {version}: {'OK' if allowed else 'REJECTED'} ({reason})")
@@ -7,9 +7,11 @@ Mock OCPP Charge Point client for testing
 import asyncio
 import websockets
 import json
-from datetime import datetime
 from typing import Optional, Dict
 from ocpp.ocpp_messages import OCPPMessageBuilder
+from common.log import get_logger
+
+logger = get_logger("ocpp.client")
 
 
 class OCPPClient:
@@ -37,11 +39,10 @@ class OCPPClient:
         try:
             self.websocket = await websockets.connect(self.server_url)
             self.connected = True
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"[OCPP CLIENT] [{timestamp}] Connected to {self.server_url}")
+            logger.info("[OCPP CLIENT] Connected to %s", self.server_url)
             return True
         except Exception as e:
-            print(f"[OCPP CLIENT ERROR] Failed to connect: {e}")
+            logger.error("[OCPP CLIENT ERROR] Failed to connect: %s", e)
             return False
     
     async def disconnect(self):
@@ -49,8 +50,7 @@ class OCPPClient:
         if self.websocket:
             await self.websocket.close()
             self.connected = False
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"[OCPP CLIENT] [{timestamp}] Disconnected")
+            logger.info("[OCPP CLIENT] Disconnected")
     
     async def send_message(self, message: Dict, message_type: str = "Unknown") -> Optional[Dict]:
         """
@@ -64,13 +64,12 @@ class OCPPClient:
             Server response or None
         """
         if not self.connected or not self.websocket:
-            print("[OCPP CLIENT ERROR] Not connected to server")
+            logger.error("[OCPP CLIENT ERROR] Not connected to server")
             return None
         
         try:
             message_str = json.dumps(message)
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"[OCPP CLIENT] [{timestamp}] Sending {message_type}")
+            logger.info("[OCPP CLIENT] Sending %s", message_type)
             
             await self.websocket.send(message_str)
             
@@ -78,11 +77,11 @@ class OCPPClient:
             response_str = await self.websocket.recv()
             response = json.loads(response_str)
             
-            print(f"[OCPP CLIENT] [{timestamp}] Response: {response}")
+            logger.info("[OCPP CLIENT] Response: %s", response)
             return response
         
         except Exception as e:
-            print(f"[OCPP CLIENT ERROR] Failed to send message: {e}")
+            logger.error("[OCPP CLIENT ERROR] Failed to send message: %s", e)
             return None
     
     async def send_boot_notification(self, **kwargs) -> Optional[Dict]:
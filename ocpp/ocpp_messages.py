@@ -6,7 +6,13 @@ Provides templates and builder functions for common OCPP messages
 
 import json
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocpp.firmware_policy import FirmwarePolicy
 
 
 class OCPPMessageBuilder:
@@ -273,18 +279,29 @@ def validate_boot_notification(message: Dict[str, Any]) -> tuple[bool, Optional[
     return True, None
 
 
-def validate_firmware_version(firmware: str, allowed_list: List[str]) -> bool:
+_list_policies: Dict[tuple, FirmwarePolicy] = {}
+
+
+def validate_firmware_version(firmware: str, allowed_list: Union[List[str], FirmwarePolicy],
+                              model: Optional[str] = None) -> bool:
     """
     Validate firmware version against whitelist
     
     Args:
         firmware: Firmware version string
-        allowed_list: List of allowed versions
+        allowed_list: Firmware policy, or list of allowed versions/ranges
+        model: chargePointModel for model-specific rules
         
     Returns:
         True if valid, False otherwise
     """
-    return firmware in allowed_list
+    if not isinstance(allowed_list, FirmwarePolicy):
+        key = tuple(allowed_list)
+        policy = _list_policies.get(key)
+        if policy is None:
+            policy = _list_policies[key] = FirmwarePolicy(allow=list(key))
+        allowed_list = policy
+    return allowed_list.is_allowed(firmware, model)
 
 
 def validate_meter_values(message: Dict[str, Any]) -> tuple[bool, Optional[str]]:
@@ -5,29 +5,72 @@ Mock OCPP Central System server for testing
 """
 
 import asyncio
+import functools
+import logging
 import websockets
 import json
 from datetime import datetime
 from typing import Set, Dict, Optional, Callable
-from ocpp.ocpp_messages import OCPPMessageBuilder, validate_boot_notification, validate_firmware_version
+from ocpp.ocpp_messages import OCPPMessageBuilder, validate_boot_notification
+from ocpp.firmware_policy import FirmwarePolicy
+from ocpp.blocklist import Blocklist
+from common.log import get_logger
+
+logger = get_logger("ocpp.server")
+
+
+class _ConnectionGate(asyncio.Protocol):
+    """First protocol of every accepted TCP connection
+    
+    Blocked sources are aborted right after accept, before a WebSocket
+    protocol is built or a byte of the HTTP upgrade is read; other
+    connections are handed over to the WebSocket protocol.
+    """
+    
+    __slots__ = ("blocklist", "factory")
+    
+    def __init__(self, blocklist: Blocklist, factory: Callable[[], asyncio.Protocol]):
+        self.blocklist = blocklist
+        self.factory = factory
+    
+    def connection_made(self, transport):
+        peer = transport.get_extra_info("peername")
+        if peer and self.blocklist.reject(peer[0]):
+            transport.abort()
+            return
+        protocol = self.factory()
+        transport.set_protocol(protocol)
+        protocol.connection_made(transport)
 
 
 class OCPPServer:
     """Mock OCPP 1.6 Central System Server"""
     
-    def __init__(self, host: str = "localhost", port: int = 9000):
+    def __init__(self, host: str = "localhost", port: int = 9000, ids=None,
+                 firmware_policy: Optional[FirmwarePolicy] = None, blocklist: Optional[Blocklist] = None):
         """
         Initialize OCPP server
         
         Args:
             host: Server host
             port: Server port
+            ids: IDSCore notified of every new connection (optional)
+            firmware_policy: Firmware policy (defaults to the IDS's policy, or
+                ocpp/firmware_policy.json) so the server and the IDS always agree
+            blocklist: Sources whose connections are dropped at accept (defaults
+                to the IDS's blocklist, so sources the IDS blocks are refused)
         """
         self.host = host
         self.port = port
+        self.ids = ids
         self.clients: Set[websockets.WebSocketServerProtocol] = set()
         self.message_handlers: Dict[str, Callable] = {}
-        self.allowed_firmware: list = ["v1.5-stable", "v1.6-release", "v2.0.1-prod"]
+        if firmware_policy is None and ids is not None:
+            firmware_policy = ids.detectors["firmware"].policy
+        self.firmware_policy = firmware_policy or FirmwarePolicy.load()
+        if blocklist is None and ids is not None:
+            blocklist = ids.security_handler.blocklist
+        self.blocklist = blocklist if blocklist is not None else Blocklist()
         self.connection_count = 0
         self.connection_times = []
         
@@ -55,22 +98,21 @@ class OCPPServer:
     
     async def _handle_boot_notification(self, websocket, message: Dict) -> Dict:
         """Handle BootNotification message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
         # Validate message
         is_valid, error = validate_boot_notification(message)
         if not is_valid:
-            print(f"[OCPP] [{timestamp}] Invalid BootNotification: {error}")
+            logger.warning("[OCPP] Invalid BootNotification: %s", error)
             return {"status": "Rejected"}
         
         # Check firmware version
         firmware = message.get("firmwareVersion", "unknown")
-        if not validate_firmware_version(firmware, self.allowed_firmware):
-            print(f"[OCPP] [{timestamp}] ⚠️  FIRMWARE MISMATCH: '{firmware}' not in whitelist")
-            print(f"[OCPP] [{timestamp}]    Allowed: {self.allowed_firmware}")
+        allowed, reason = self.firmware_policy.check(firmware, message.get("chargePointModel"))
+        if not allowed:
+            logger.warning("[OCPP] ⚠️  FIRMWARE MISMATCH: '%s' %s", firmware, reason)
+            logger.warning("[OCPP]    Policy: %s", self.firmware_policy.describe())
             return {"status": "Rejected", "interval": 0}
         
-        print(f"[OCPP] [{timestamp}] BootNotification accepted - Firmware: {firmware}")
+        logger.info("[OCPP] BootNotification accepted - Firmware: %s", firmware)
         return {
             "status": "Accepted",
             "currentTime": datetime.utcnow().isoformat() + "Z",
@@ -79,26 +121,25 @@ class OCPPServer:
     
     async def _handle_remote_start(self, websocket, message: Dict) -> Dict:
         """Handle RemoteStartTransaction message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
         connector_id = message.get("connectorId", 1)
         id_tag = message.get("idTag", "unknown")
         
-        print(f"[OCPP] [{timestamp}] RemoteStartTransaction - Connector: {connector_id}, Tag: {id_tag}")
+        logger.info("[OCPP] RemoteStartTransaction - Connector: %s, Tag: %s", connector_id, id_tag)
         
         return {"status": "Accepted"}
     
     async def _handle_remote_stop(self, websocket, message: Dict) -> Dict:
         """Handle RemoteStopTransaction message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
         transaction_id = message.get("transactionId", 0)
         
-        print(f"[OCPP] [{timestamp}] RemoteStopTransaction - Transaction: {transaction_id}")
+        logger.info("[OCPP] RemoteStopTransaction - Transaction: %s", transaction_id)
         
         return {"status": "Accepted"}
     
     async def _handle_meter_values(self, websocket, message: Dict) -> Dict:
         """Handle MeterValues message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        if not logger.isEnabledFor(logging.INFO):
+            return {}
         connector_id = message.get("connectorId", 1)
         
         # Extract values
@@ -110,7 +151,7 @@ class OCPPServer:
                 unit = sampled_value.get("unit", "")
                 values_str.append(f"{measurand}: {value}{unit}")
         
-        print(f"[OCPP] [{timestamp}] MeterValues - Connector: {connector_id}, Values: {', '.join(values_str)}")
+        logger.info("[OCPP] MeterValues - Connector: %s, Values: %s", connector_id, ', '.join(values_str))
         
         return {}
     
@@ -120,25 +161,27 @@ class OCPPServer:
     
     async def _handle_status_notification(self, websocket, message: Dict) -> Dict:
         """Handle StatusNotification message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
         connector_id = message.get("connectorId", 0)
         status = message.get("status", "Unknown")
         error_code = message.get("errorCode", "NoError")
         
-        print(f"[OCPP] [{timestamp}] StatusNotification - Connector: {connector_id}, Status: {status}, Error: {error_code}")
+        logger.info("[OCPP] StatusNotification - Connector: %s, Status: %s, Error: %s", connector_id, status, error_code)
         
         return {}
     
     async def _handle_client(self, websocket, path):
         """Handle client connection"""
         client_addr = websocket.remote_address
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
         self.clients.add(websocket)
         self.connection_count += 1
         self.connection_times.append(datetime.now())
         
-        print(f"[OCPP] [{timestamp}] Client connected: {client_addr[0]}:{client_addr[1]} (Total: {len(self.clients)})")
+        logger.info("[OCPP] Client connected: %s:%s (Total: %d)", client_addr[0], client_addr[1], len(self.clients))
+        
+        if self.ids:
+            # OCPP-J: the charge point identity is the last path segment (ws://host/ocpp/CP001)
+            charge_point_id = (path or "").rstrip("/").rsplit("/", 1)[-1] or None
+            self.ids.process_websocket_connection(client_addr[0], charge_point_id)
         
         try:
             async for message_str in websocket:
@@ -175,34 +218,40 @@ class OCPPServer:
                         response = await self.message_handlers[message_type](websocket, message_payload)
                         await websocket.send(json.dumps(response))
                     else:
-                        print(f"[OCPP] [{timestamp}] Unknown message type: {message_str[:100]}")
+                        logger.warning("[OCPP] Unknown message type: %s", message_str[:100])
                         await websocket.send(json.dumps({"error": "Unknown message type"}))
                 
                 except json.JSONDecodeError:
-                    print(f"[OCPP] [{timestamp}] Invalid JSON: {message_str[:100]}")
+                    logger.warning("[OCPP] Invalid JSON: %s", message_str[:100])
                 except Exception as e:
-                    print(f"[OCPP] [{timestamp}] Error handling message: {e}")
+                    logger.error("[OCPP] Error handling message: %s", e)
         
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
             self.clients.remove(websocket)
-            print(f"[OCPP] [{timestamp}] Client disconnected: {client_addr[0]}:{client_addr[1]} (Total: {len(self.clients)})")
+            logger.info("[OCPP] Client disconnected: %s:%s (Total: %d)", client_addr[0], client_addr[1], len(self.clients))
     
     async def start(self):
         """Start the OCPP server"""
-        print(f"[OCPP] Starting OCPP server on {self.host}:{self.port}")
-        print(f"[OCPP] Allowed firmware versions: {self.allowed_firmware}")
+        logger.info("[OCPP] Starting OCPP server on %s:%s", self.host, self.port)
+        logger.info("[OCPP] Firmware policy: %s", self.firmware_policy.describe())
+        
+        def create_protocol(*args, **kwargs):
+            return _ConnectionGate(self.blocklist, functools.partial(websockets.WebSocketServerProtocol,
+                                                                     *args, **kwargs))
         
-        async with websockets.serve(self._handle_client, self.host, self.port):
-            await asyncio.Future()  # Run forever
+        async with websockets.serve(self._handle_client, self.host, self.port, create_protocol=create_protocol):
+            while True:  # Run forever, dropping expired blocklist entries once a minute
+                await asyncio.sleep(60)
+                self.blocklist.prune()
     
     def run(self):
         """Run the server (blocking)"""
         try:
             asyncio.run(self.start())
         except KeyboardInterrupt:
-            print("\n[OCPP] Server stopped by user")
+            logger.info("[OCPP] Server stopped by user")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+"""AdaptiveThreshold warm-up, growth cap and the detector paths feeding it"""
+
+import numpy as np
+
+from ids.rules import FrequencySpikeDetector, ValueDeltaDetector
+from ids.sketches import OVERFLOW_KEY, AdaptiveThreshold
+
+
+def test_fast_ecu_is_learned_above_the_default():
+    detector = FrequencySpikeDetector(threshold_hz=20.0, adaptive=AdaptiveThreshold(min_samples=500))
+    for i in range(2000):
+        detector.detect(0x100, 1000.0 + i * 0.01)  # 100 Hz
+    threshold = detector.adaptive.threshold(0x100, 20.0)
+    assert 100.0 < threshold <= 200.0
+    alerts = sum(bool(detector.detect(0x100, 1020.0 + i * 0.01)) for i in range(500))
+    assert alerts == 0
+
+
+def test_slow_ramp_cannot_raise_the_threshold_past_the_cap():
+    adaptive = AdaptiveThreshold(min_samples=500, max_growth=1.25)
+    for _ in range(500):
+        adaptive.observe("power", 100.0)
+    baseline = adaptive.threshold("power", 1000.0)
+    value = 100.0
+    for _ in range(200):
+        # Stay just below the current threshold so nothing alerts
+        value = adaptive.threshold("power", 1000.0) * 0.99
+        for _ in range(64):
+            adaptive.observe("power", value)
+    assert adaptive.threshold("power", 1000.0) <= baseline * 1.25
+
+
+def test_learned_threshold_is_capped_by_the_ceiling():
+    adaptive = AdaptiveThreshold(min_samples=100, ceiling=10.0)
+    for _ in range(128):
+        adaptive.observe("energy", 1e6, alerting=True)  # Learned during warm-up
+    assert adaptive.threshold("energy", 5.0) == 50.0
+
+
+def test_value_delta_batch_path_learns():
+    detector = ValueDeltaDetector(adaptive=AdaptiveThreshold(min_samples=500))
+    timestamps = 1000.0 + np.arange(1000, dtype=np.float64)
+    values = np.cumsum(np.full(1000, 20000.0))  # 20 kW/s, twice the 10 kW/s default
+    first = detector.detect_batch("power", values[:600], timestamps[:600])
+    assert len(first) > 0
+    assert len(detector.detect_batch("power", values[600:], timestamps[600:])) == 0
+
+
+def test_key_count_is_capped():
+    adaptive = AdaptiveThreshold(min_samples=10, max_keys=4)
+    for can_id in range(4):
+        for _ in range(10):
+            adaptive.observe(can_id, 50.0)
+    for can_id in range(0x100, 0x100 + 5000):  # Spoofed IDs
+        adaptive.observe(can_id, 1000.0)
+    assert len(adaptive.sketches) == 5
+    assert set(adaptive.sketches) == {0, 1, 2, 3, OVERFLOW_KEY}
+    # Learned keys keep their thresholds; new keys use the shared overflow sketch
+    assert adaptive.threshold(0, 20.0) == 75.0
+    assert adaptive.threshold(0x7FF, 20.0) == adaptive.threshold(0x100, 20.0) == 200.0
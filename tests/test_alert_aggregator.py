@@ -0,0 +1,52 @@
+"""AlertAggregator: windowed grouping, summaries and per-type rate limits"""
+
+from ids.alert_aggregator import AlertAggregator
+from ids.alerts import AlertLevel
+
+
+def test_repeats_inside_the_window_are_summarized():
+    aggregator = AlertAggregator(window_seconds=5.0)
+    logged = [aggregator.submit("Frequency spike detected on CAN ID 0x100", "Frequency Spike",
+                                AlertLevel.WARNING, 1000.0 + i * 0.1) for i in range(20)]
+    assert logged == [True] + [False] * 19
+    assert aggregator.expire(1004.9) == []
+    
+    summaries = aggregator.expire(1005.0)
+    assert len(summaries) == 1
+    summary = summaries[0]
+    assert summary["can_id"] == 0x100
+    assert summary["details"]["count"] == 19
+    assert summary["details"]["first_seen"] == 1000.0
+    assert summary["ts"] == 1005.0
+    # A new window starts a new group
+    assert aggregator.submit("Frequency spike detected on CAN ID 0x100", "Frequency Spike",
+                             AlertLevel.WARNING, 1006.0)
+
+
+def test_single_alert_has_no_summary():
+    aggregator = AlertAggregator(window_seconds=1.0)
+    assert aggregator.submit("Replay attack", "Replay Attack", AlertLevel.CRITICAL, 10.0, can_id=0x200)
+    assert aggregator.flush() == []
+
+
+def test_rate_limit_caps_new_groups_per_type():
+    aggregator = AlertAggregator(window_seconds=5.0, rate_limits={"Unknown CAN ID": 5.0})
+    logged = sum(aggregator.submit(f"Unknown CAN ID 0x{0x600 + i:03X}", "Unknown CAN ID",
+                                   AlertLevel.WARNING, 1000.0 + i * 0.001) for i in range(1000))
+    assert logged == 5 + 4  # Burst of one second, then 5/s over the remaining 0.999 s
+    assert aggregator.get_stats()["rate_limited"] == 991
+    summaries = aggregator.flush()
+    assert len(summaries) == 1
+    assert summaries[0]["details"]["count"] == 991
+    assert summaries[0]["details"]["rate_limited"]
+    assert summaries[0]["can_id"] is None
+
+
+def test_rate_limited_group_does_not_swallow_keyless_alerts():
+    aggregator = AlertAggregator(window_seconds=5.0, rate_limits={"Connection Flood": 1.0})
+    assert aggregator.submit("flood from 10.0.0.1", "Connection Flood", AlertLevel.WARNING, 100.0,
+                             charge_point_id="CP1")
+    assert not aggregator.submit("flood from 10.0.0.2", "Connection Flood", AlertLevel.WARNING, 100.1,
+                                 charge_point_id="CP2")
+    # Tokens refill; an alert without CAN ID, charge point or connector opens its own group
+    assert aggregator.submit("global connection flood", "Connection Flood", AlertLevel.WARNING, 102.0)
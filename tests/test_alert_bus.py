@@ -0,0 +1,94 @@
+"""AlertBus: per-subscriber drop policies, filters and the socket fan-out"""
+
+import threading
+import time
+
+import pytest
+
+from ids.alert_bus import DROP_NEWEST, DROP_OLDEST, AlertBus, AlertSocketServer, read_socket_alerts
+
+
+def _alerts(count, anomaly_type="Frequency Spike", level="WARNING"):
+    return [{"ts": float(i), "level": level, "type": anomaly_type, "message": f"alert {i}"} for i in range(count)]
+
+
+def _messages(batch):
+    return [record["message"] for record in batch]
+
+
+def test_drop_oldest_keeps_latest_alerts():
+    bus = AlertBus()
+    subscription = bus.subscribe("dashboard", maxsize=3, policy=DROP_OLDEST)
+    bus.publish(_alerts(10))
+    assert _messages(subscription.get_batch(timeout=0)) == ["alert 7", "alert 8", "alert 9"]
+    assert subscription.stats()["dropped"] == 7 and subscription.delivered == 3
+
+
+def test_drop_newest_keeps_backlog():
+    bus = AlertBus()
+    subscription = bus.subscribe("archiver", maxsize=3, policy=DROP_NEWEST)
+    bus.publish(_alerts(10))
+    assert _messages(subscription.get_batch(timeout=0)) == ["alert 0", "alert 1", "alert 2"]
+    assert subscription.dropped == 7
+
+
+def test_slow_subscriber_does_not_affect_others():
+    bus = AlertBus()
+    slow = bus.subscribe("slow", maxsize=2)
+    fast = bus.subscribe("fast", maxsize=100)
+    bus.publish(_alerts(50))
+    assert len(fast.get_batch(100, timeout=0)) == 50 and fast.dropped == 0
+    assert slow.dropped == 48
+    assert bus.get_stats()["published"] == 50
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AlertBus().subscribe(policy="block")
+
+
+def test_type_and_level_filters():
+    bus = AlertBus()
+    replays = bus.subscribe(types=["Replay Attack"])
+    critical = bus.subscribe(levels=["CRITICAL"])
+    bus.publish(_alerts(2) + _alerts(3, "Replay Attack") + _alerts(1, "Firmware Update", "CRITICAL"))
+    assert len(replays.get_batch(timeout=0)) == 3
+    assert [record["type"] for record in critical.get_batch(timeout=0)] == ["Firmware Update"]
+
+
+def test_callback_subscriber_and_close():
+    bus = AlertBus()
+    received, done = [], threading.Event()
+    
+    def callback(record):
+        received.append(record["message"])
+        if len(received) == 5:
+            done.set()
+    
+    bus.subscribe("callback", callback=callback)
+    bus.publish(_alerts(5))
+    assert done.wait(5.0)
+    bus.close()
+    assert received == [f"alert {i}" for i in range(5)]
+    assert bus.get_stats()["subscribers"] == []
+
+
+def test_socket_fan_out(tmp_path):
+    bus = AlertBus()
+    server = AlertSocketServer(bus, str(tmp_path / "ids_alerts.sock"))
+    server.start()
+    try:
+        stream = read_socket_alerts(server.path)
+        received = []
+        reader = threading.Thread(target=lambda: received.extend([next(stream), next(stream)]), daemon=True)
+        reader.start()
+        # The client subscribes once the server handles its connection
+        deadline = time.monotonic() + 5.0
+        while not bus.get_stats()["subscribers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        bus.publish(_alerts(2))
+        reader.join(5.0)
+        assert _messages(received) == ["alert 0", "alert 1"]
+        stream.close()
+    finally:
+        server.stop()
@@ -0,0 +1,60 @@
+"""AlertLogger: background writer thread, flushing and drop accounting"""
+
+import time
+
+from ids.alerts import AlertLevel, AlertLogger
+
+
+def _logger(log_dir, **kwargs):
+    return AlertLogger(str(log_dir), stats_interval=60.0, structured=False, indexed=False, **kwargs)
+
+
+def test_close_writes_pending_alerts_and_stats(tmp_path):
+    logger = _logger(tmp_path)
+    for i in range(100):
+        logger.log_alert(f"alert {i}", AlertLevel.WARNING, "Replay Attack", can_id=0x200)
+    logger.log_critical("lockdown", "Firmware Update")
+    logger.close()
+    
+    assert not logger._writer.is_alive()
+    lines = (tmp_path / "ids_alerts.log").read_text().splitlines()
+    assert len(lines) == 101
+    assert "[WARNING] [Replay Attack] alert 0" in lines[0]
+    assert "[CRITICAL] [Firmware Update] lockdown" in lines[-1]
+    
+    stats = logger.get_merged_stats()
+    assert stats["total_alerts"] == 101
+    assert stats["alerts_by_level"]["CRITICAL"] == 1
+    assert stats["alerts_by_type"]["Replay Attack"] == 100
+
+
+def test_flush_waits_for_writer(tmp_path):
+    logger = _logger(tmp_path)
+    logger.log_info("first")
+    assert logger.flush()
+    assert "first" in (tmp_path / "ids_alerts.log").read_text()
+    assert logger.get_recent_alerts(1)[0].rstrip().endswith("first")
+    logger.close()
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    logger = _logger(tmp_path, queue_size=2)
+    with logger._file_lock:
+        # The writer takes the first alert and then waits for the file lock
+        logger.log_info("taken")
+        deadline = time.monotonic() + 5.0
+        while not logger._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for i in range(5):
+            assert logger.log_info(f"queued {i}")
+        assert logger.get_stats()["alerts_dropped"] == 3
+    logger.close()
+    assert len((tmp_path / "ids_alerts.log").read_text().splitlines()) == 3
+
+
+def test_alerts_after_close_are_written_inline(tmp_path):
+    logger = _logger(tmp_path)
+    logger.close()
+    logger.log_warning("late")
+    logger.close()
+    assert "late" in (tmp_path / "ids_alerts.log").read_text()
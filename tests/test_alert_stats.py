@@ -0,0 +1,69 @@
+"""Alert statistics shards: per-thread counting and merging across processes"""
+
+import json
+import multiprocessing
+import os
+import threading
+
+from ids.alert_stats import STATS_DIR, StatsShard, compact_stats, merge_stats
+
+
+def _worker(log_dir, worker_id, count):
+    shard = StatsShard(log_dir)
+    for i in range(count):
+        shard.add("total_alerts")
+        shard.add("level:WARNING")
+        shard.add(f"type:Worker {worker_id}")
+        if i % 100 == 0:
+            shard.save()
+    shard.save()
+
+
+def test_threads_count_without_losing_increments(tmp_path):
+    shard = StatsShard(str(tmp_path))
+    threads = [threading.Thread(target=lambda: [shard.add("total_alerts") for _ in range(10000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shard.stats()["total_alerts"] == 80000
+
+
+def test_processes_merge_and_compact(tmp_path):
+    log_dir = str(tmp_path)
+    processes = [multiprocessing.Process(target=_worker, args=(log_dir, n, 500)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    
+    merged = merge_stats(log_dir)
+    assert merged["total_alerts"] == 2000
+    assert merged["alerts_by_level"]["WARNING"] == 2000
+    assert merged["alerts_by_type"] == {f"Worker {n}": 500 for n in range(4)}
+    assert merged["processes"] == 4 and merged["running"] == 0
+    
+    # Finished shards fold into base.json without changing the totals
+    assert compact_stats(log_dir) == 4
+    assert sorted(os.listdir(os.path.join(log_dir, STATS_DIR))) == [".lock", "base.json"]
+    assert merge_stats(log_dir) == merged
+    
+    # A new process adds to the folded history
+    current = StatsShard(log_dir)
+    current.add("total_alerts", 5)
+    current.save()
+    merged = merge_stats(log_dir)
+    assert merged["total_alerts"] == 2005
+    assert merged["processes"] == 5 and merged["running"] == 1
+
+
+def test_legacy_stats_file_is_imported(tmp_path):
+    with open(tmp_path / "ids_stats.json", "w") as f:
+        json.dump({"total_alerts": 3, "alerts_by_type": {"Replay Attack": 3},
+                   "session_start": "2024-01-01T00:00:00"}, f)
+    StatsShard(str(tmp_path))
+    merged = merge_stats(str(tmp_path))
+    assert merged["alerts_by_type"] == {"Replay Attack": 3}
+    assert merged["session_start"] == "2024-01-01T00:00:00"
@@ -0,0 +1,68 @@
+"""AlertStore: indexed queries, counts and retention"""
+
+import time
+
+import pytest
+
+from ids.alert_store import AlertStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AlertStore(str(tmp_path / "ids_alerts.db"))
+    now = 1700000000.0
+    store.add({
+        "ts": now + i,
+        "level": "CRITICAL" if i % 10 == 0 else "WARNING",
+        "type": "Replay Attack" if i % 2 else "Frequency Spike",
+        "anomaly": 3 if i % 2 else 1,
+        "message": f"alert {i}",
+        "can_id": 0x200 if i % 3 == 0 else 0x100,
+        "charge_point": "CP1" if i < 50 else "CP2",
+        "connector": 1,
+        "metrics": {"rate": float(i)} if i == 42 else None,
+    } for i in range(100))
+    yield store
+    store.close()
+
+
+def test_time_range_and_order(store):
+    found = store.query(since=1700000010.0, until=1700000019.0)
+    assert [record["message"] for record in found] == [f"alert {i}" for i in range(10, 20)]
+    newest = store.query(limit=3, newest_first=True)
+    assert [record["message"] for record in newest] == ["alert 99", "alert 98", "alert 97"]
+
+
+def test_filters_combine(store):
+    found = store.query(types=["Replay Attack"], can_id=0x200, charge_point="CP1")
+    assert [record["message"] for record in found] == [f"alert {i}" for i in range(3, 50, 6)]
+    critical = store.query(levels=["CRITICAL"])
+    assert len(critical) == 10
+    assert all(record["type"] == "Frequency Spike" for record in critical)
+
+
+def test_records_round_trip(store):
+    record = store.query(since=1700000042.0, until=1700000042.0)[0]
+    assert record == {"ts": 1700000042.0, "level": "WARNING", "type": "Frequency Spike", "anomaly": 1,
+                      "can_id": 0x200, "charge_point": "CP1", "connector": 1, "message": "alert 42",
+                      "metrics": {"rate": 42.0}}
+
+
+def test_count_by_type_and_prune(store):
+    assert store.count_by_type() == {"Replay Attack": 50, "Frequency Spike": 50}
+    assert store.count_by_type(since=1700000090.0) == {"Replay Attack": 5, "Frequency Spike": 5}
+    assert store.prune(1700000090.0) == 90
+    assert len(store) == 10
+
+
+def test_retention_on_open(tmp_path):
+    path = str(tmp_path / "ids_alerts.db")
+    store = AlertStore(path)
+    now = time.time()
+    store.add([{"ts": now - 3 * 86400, "level": "INFO", "type": "Old", "message": "old"},
+               {"ts": now, "level": "INFO", "type": "New", "message": "new"}])
+    store.close()
+    
+    store = AlertStore(path, retention_days=1.0)
+    assert [record["message"] for record in store.query()] == ["new"]
+    store.close()
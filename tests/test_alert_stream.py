@@ -0,0 +1,84 @@
+"""RotatingJSONLWriter rotation, compression and retention; read_alerts filters"""
+
+import os
+import time
+
+from ids.alert_stream import RotatingJSONLWriter, list_segments, read_alerts
+
+
+def _record(ts, i, anomaly_type="Frequency Spike", level="WARNING", can_id=0x100):
+    return {"ts": ts, "level": level, "type": anomaly_type, "message": f"alert {i}", "can_id": can_id}
+
+
+def test_rotation_by_size_compresses_segments(tmp_path):
+    path = str(tmp_path / "ids_alerts.jsonl")
+    writer = RotatingJSONLWriter(path, max_bytes=1024)
+    now = time.time() - 1000
+    for i in range(200):
+        writer.write([_record(now + i, i)])
+    writer.close()
+    
+    segments = list_segments(path)
+    assert len(segments) > 2
+    assert segments[-1] == path
+    assert all(segment.endswith(".jsonl.gz") for segment in segments[:-1])
+    assert [record["message"] for record in read_alerts(path)] == [f"alert {i}" for i in range(200)]
+
+
+def test_rotation_by_age(tmp_path):
+    path = str(tmp_path / "ids_alerts.jsonl")
+    writer = RotatingJSONLWriter(path, max_age=60.0, compress=False)
+    now = time.time() - 1000
+    for i in range(10):
+        writer.write([_record(now + 30 * i, i)])
+    writer.close()
+    
+    # 30 s apart with a 60 s limit: two records per segment
+    assert len(list_segments(path)) == 5
+
+
+def test_read_alerts_filters(tmp_path):
+    path = str(tmp_path / "ids_alerts.jsonl")
+    writer = RotatingJSONLWriter(path, max_bytes=512)
+    now = time.time() - 1000
+    for i in range(100):
+        if i % 10 == 0:
+            writer.write([_record(now + i, i, "Replay Attack", "CRITICAL", 0x200)])
+        else:
+            writer.write([_record(now + i, i)])
+    writer.close()
+    
+    selected = list(read_alerts(path, since=now + 20, until=now + 29))
+    assert [record["message"] for record in selected] == [f"alert {i}" for i in range(20, 30)]
+    
+    replays = list(read_alerts(path, types=["Replay Attack"]))
+    assert [record["message"] for record in replays] == [f"alert {i}" for i in range(0, 100, 10)]
+    assert list(read_alerts(path, levels=["CRITICAL"])) == replays
+    assert list(read_alerts(path, can_id=0x200)) == replays
+
+
+def test_retention_by_segment_count(tmp_path):
+    path = str(tmp_path / "ids_alerts.jsonl")
+    writer = RotatingJSONLWriter(path, max_bytes=256, max_segments=3, compress=False)
+    now = time.time() - 1000
+    for i in range(100):
+        writer.write([_record(now + i, i)])
+    writer.close()
+    
+    segments = list_segments(path)
+    assert len(segments) == 4  # three rotated plus the active one
+    assert list(read_alerts(path))[-1]["message"] == "alert 99"
+
+
+def test_resume_appends_to_active_segment(tmp_path):
+    path = str(tmp_path / "ids_alerts.jsonl")
+    now = time.time() - 1000
+    writer = RotatingJSONLWriter(path)
+    writer.write([_record(now, 0)])
+    writer.close()
+    
+    writer = RotatingJSONLWriter(path)
+    writer.write([_record(now + 1, 1)])
+    writer.close()
+    assert os.listdir(tmp_path) == ["ids_alerts.jsonl"]
+    assert [record["message"] for record in read_alerts(path)] == ["alert 0", "alert 1"]
@@ -0,0 +1,101 @@
+"""Blocklist lookups and the OCPP server's accept gate"""
+
+import time
+
+import pytest
+
+from ocpp.blocklist import Blocklist
+from ocpp.ocpp_server import _ConnectionGate
+
+
+def test_host_and_cidr_lookups():
+    blocklist = Blocklist()
+    assert blocklist.block("192.168.1.100") == "192.168.1.100"
+    assert blocklist.block("10.20.5.6/16") == "10.20.0.0/16"
+    assert blocklist.block("2001:db8::/32") == "2001:db8::/32"
+    
+    assert blocklist.is_blocked("192.168.1.100")
+    assert not blocklist.is_blocked("192.168.1.101")
+    assert blocklist.is_blocked("10.20.255.1")
+    assert not blocklist.is_blocked("10.21.0.1")
+    assert blocklist.is_blocked("2001:db8:1::5")
+    assert not blocklist.is_blocked("2001:db9::1")
+    assert not blocklist.is_blocked("not an address")
+    assert len(blocklist) == 3
+
+
+@pytest.mark.parametrize("address", ["::ffff:192.168.1.100", "::ffff:10.20.3.4", "::FFFF:10.20.3.4"])
+def test_ipv4_mapped_addresses(address):
+    blocklist = Blocklist()
+    blocklist.block("192.168.1.100")
+    blocklist.block("10.20.0.0/16")
+    assert blocklist.is_blocked(address)
+
+
+def test_expiry_and_prune():
+    blocklist = Blocklist(default_ttl=60.0)
+    blocklist.block("192.168.1.100")
+    blocklist.block("10.0.0.0/8", ttl=10.0, reason="scan")
+    blocklist.block("172.16.0.1", ttl=None)
+    now = time.time()
+    
+    assert blocklist.is_blocked("10.1.2.3", now=now + 5)
+    assert not blocklist.is_blocked("10.1.2.3", now=now + 11)
+    assert blocklist.is_blocked("192.168.1.100", now=now + 59)
+    assert not blocklist.is_blocked("192.168.1.100", now=now + 61)
+    assert blocklist.is_blocked("172.16.0.1", now=now + 1e9)
+    
+    assert blocklist.prune(now + 61) == 2
+    assert blocklist.entries() == [{"source": "172.16.0.1", "expires": None, "reason": ""}]
+
+
+def test_unblock():
+    blocklist = Blocklist()
+    blocklist.block("10.0.0.0/8")
+    assert blocklist.unblock("10.0.0.0/8")
+    assert not blocklist.unblock("10.0.0.0/8")
+    assert not blocklist.is_blocked("10.1.2.3")
+
+
+class FakeTransport:
+    def __init__(self, peer):
+        self.peer = peer
+        self.aborted = False
+        self.protocol = None
+    
+    def get_extra_info(self, name):
+        return self.peer if name == "peername" else None
+    
+    def abort(self):
+        self.aborted = True
+    
+    def set_protocol(self, protocol):
+        self.protocol = protocol
+
+
+class RecordingProtocol:
+    def __init__(self):
+        self.transport = None
+    
+    def connection_made(self, transport):
+        self.transport = transport
+
+
+def test_gate_drops_blocked_sources_before_handshake():
+    blocklist = Blocklist()
+    blocklist.block("203.0.113.0/24")
+    built = []
+    
+    def factory():
+        built.append(RecordingProtocol())
+        return built[-1]
+    
+    blocked = FakeTransport(("::ffff:203.0.113.9", 40000, 0, 0))
+    _ConnectionGate(blocklist, factory).connection_made(blocked)
+    assert blocked.aborted and built == []
+    assert blocklist.rejected == 1
+    
+    allowed = FakeTransport(("198.51.100.1", 40001))
+    _ConnectionGate(blocklist, factory).connection_made(allowed)
+    assert not allowed.aborted
+    assert allowed.protocol is built[0] and built[0].transport is allowed
@@ -0,0 +1,45 @@
+"""DBC parsing and signal decoding"""
+
+import numpy as np
+
+from can.can_signals import SignalDecoder
+
+DBC = '''
+BO_ 1280 Inverter: 8 INV
+ SG_ temperature : 7|12@0- (0.5,-10) [-100|100] "degC" GATEWAY
+ SG_ current : 16|16@1+ (0.1,0) [0|6553.5] "A" GATEWAY
+ SG_ flags : 32|4@1+ (1,0) [0|15] "" GATEWAY
+ SG_ torque : 56|8@1- (1,0) [-128|127] "Nm" GATEWAY
+
+BA_ "GenMsgCycleTime" BO_ 1280 50;
+'''
+
+
+def test_motorola_signed_and_intel_signals():
+    decoder = SignalDecoder.from_dbc(DBC)
+    # temperature: raw 0xF9C = -100 -> -100 * 0.5 - 10; current: 0x1234 little-endian
+    values = decoder.decode(0x500, bytes([0xF9, 0xC0, 0x34, 0x12, 0x0A, 0x00, 0x00, 0xFE]))
+    assert values == {"temperature": -60.0, "current": 466.0, "flags": 10.0, "torque": -2.0}
+
+
+def test_signals_beyond_the_dlc_are_left_out():
+    decoder = SignalDecoder.from_dbc(DBC)
+    assert decoder.decode(0x500, bytes([0x00, 0x10, 0x01, 0x00])) == {"temperature": -9.5, "current": 0.1}
+    assert decoder.decode(0x7FF, bytes(8)) == {}
+
+
+def test_batch_decoding_matches_single_frames():
+    message = SignalDecoder.from_dbc(DBC).get(0x500)
+    rng = np.random.default_rng(0)
+    payloads = rng.integers(0, 256, size=(200, 8), dtype=np.uint8)
+    dlcs = rng.integers(0, 9, size=200)
+    batch = message.decode_batch(payloads, dlcs)
+    for row, dlc, decoded in zip(payloads, dlcs, batch):
+        expected = [np.nan if value is None else value for value in message.decode(bytes(row[:dlc]))]
+        assert np.array_equal(decoded, expected, equal_nan=True)
+
+
+def test_cycle_times_from_dbc():
+    assert SignalDecoder.from_dbc(DBC).cycle_times() == {0x500: 0.05}
+    # The bundled map: event-driven messages (0x200, 0x301) have no cycle time
+    assert SignalDecoder.load().cycle_times() == {0x100: 0.1, 0x300: 1.0, 0x400: 0.2}
@@ -0,0 +1,51 @@
+"""ConnectionFloodDetector: scalar and batch paths apply the same limits"""
+
+from ids.rules import ConnectionFloodDetector
+
+
+def _scalar_alerts(rows):
+    detector = ConnectionFloodDetector()
+    return [i for i, (ts, source, charge_point) in enumerate(rows) if detector.detect(ts, source, charge_point)]
+
+
+def _batch_flagged(rows, batch_size=None):
+    detector = ConnectionFloodDetector()
+    batch_size = batch_size or len(rows)
+    flagged = []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        indices = detector.detect_batch([r[0] for r in chunk], [r[1] for r in chunk], [r[2] for r in chunk])
+        flagged.extend((indices + start).tolist())
+    return flagged
+
+
+def test_single_source_flood_below_global_limit():
+    rows = [(1000.0 + i * 0.001, "203.0.113.7", None) for i in range(499)]
+    assert _scalar_alerts(rows) == [10]
+    flagged = _batch_flagged(rows)
+    assert flagged == list(range(10, 499))
+
+
+def test_batch_and_scalar_agree_per_source_and_charge_point():
+    rows = []
+    for i in range(400):
+        ts = 1000.0 + i * 0.0025
+        if i % 4 == 0:
+            rows.append((ts, "198.51.100.9", None))             # flooding source
+        elif i % 20 == 1:
+            rows.append((ts, f"192.0.2.{i % 250}", "CP-7"))     # one identity from many addresses
+        else:
+            rows.append((ts, f"10.0.{i // 250}.{i % 250}", f"CP-{i}"))  # fleet, one connection each
+    scalar = _scalar_alerts(rows)
+    flagged = _batch_flagged(rows, batch_size=64)
+    
+    first_source = next(i for i in flagged if rows[i][1] == "198.51.100.9")
+    first_charge_point = next(i for i in flagged if rows[i][2] == "CP-7")
+    assert scalar == sorted([first_source, first_charge_point])
+    assert all(rows[i][1] == "198.51.100.9" or rows[i][2] == "CP-7" for i in flagged)
+
+
+def test_batch_and_scalar_agree_on_global_limit():
+    rows = [(1000.0 + i * 0.001, f"10.{i // 250}.0.{i % 250}", None) for i in range(600)]
+    assert _scalar_alerts(rows) == [500]
+    assert _batch_flagged(rows, batch_size=128) == list(range(500, 600))
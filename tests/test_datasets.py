@@ -0,0 +1,73 @@
+"""Block-parsed CSV loaders and the columnar cache"""
+
+import numpy as np
+
+from ids import datasets
+from ids.datasets import hex_to_int, load_can_dataset, load_session_dataset
+
+CAN_LINES = [
+    "1478198376.389427,0316,8,05,21,68,09,21,21,00,6f,R",
+    "1478198376.389636,018f,8,fe,5b,00,00,00,3c,00,00,R",
+    "1478198376.389864,0260,8,19,21,22,30,08,8e,6d,3a,T",
+    "1478198376.390000,02a0,2,64,00,R",            # Short frame (DLC 2)
+    "1478198376.390100,zz16,8,05,21,68,09,21,21,00,6f,R",  # Bad CAN ID
+    "1478198376.390200,0316,8,05,21,68,09,21,21,00,6f,X",  # Bad flag
+    "not-a-time,0316,8,05,21,68,09,21,21,00,6f,R",
+    "1478198376.390300,0x0545,8,d8,00,00,8a,00,00,00,00,R",
+]
+
+
+def _write(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_can_loader_drops_malformed_rows(tmp_path):
+    path = _write(tmp_path / "can.csv", CAN_LINES)
+    dataset = load_can_dataset(path, cache=False, block_size=64)
+    assert len(dataset) == 4
+    assert dataset.dropped == 4
+    assert dataset["CAN_ID"].tolist() == [0x316, 0x18F, 0x260, 0x545]
+    assert dataset["Flag"].tolist() == [0, 0, 1, 0]
+    assert dataset["Data1"].tolist() == [0x21, 0x5B, 0x21, 0x00]
+    
+    short = load_can_dataset(path, cache=False, keep_short_frames=True)
+    assert len(short) == 5
+    assert short["DLC"].tolist()[3] == 2
+
+
+def test_cache_is_reused_until_the_source_changes(tmp_path, monkeypatch):
+    path = _write(tmp_path / "can.csv", CAN_LINES)
+    first = load_can_dataset(path)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV parsed again")
+    monkeypatch.setattr(datasets, "_iter_blocks", fail)
+    cached = load_can_dataset(path)
+    assert isinstance(cached["CAN_ID"], np.memmap)
+    assert cached["CAN_ID"].tolist() == first["CAN_ID"].tolist()
+    assert cached.dropped == first.dropped
+    
+    monkeypatch.undo()
+    _write(tmp_path / "can.csv", CAN_LINES[:3])
+    assert len(load_can_dataset(path)) == 3
+
+
+def test_session_loader_drops_non_numeric_rows(tmp_path):
+    path = _write(tmp_path / "sessions.csv", [
+        "sessionId,kWhDelivered,chargingDuration",
+        "1,12.5,3600",
+        "2,,1800",
+        "3,7.25,n/a",
+        "4,1e1,600",
+    ])
+    dataset = load_session_dataset(path, cache=False)
+    assert dataset["kWhDelivered"].tolist() == [12.5, 10.0]
+    assert dataset["chargingDuration"].tolist() == [3600.0, 600.0]
+    assert dataset.dropped == 2
+
+
+def test_hex_to_int_accepts_a_0x_prefix():
+    values, valid = hex_to_int(["0x1A", "0X10", " 0545 ", "fe", "R", "0x", "1x2"])
+    assert valid.tolist() == [True, True, True, True, False, False, False]
+    assert values.tolist() == [0x1A, 0x10, 0x545, 0xFE, 0, 0, 0]
@@ -0,0 +1,70 @@
+"""detect_batch() flags the same rows as scalar detect() on the same frames"""
+
+import numpy as np
+
+from can.can_signals import SignalDecoder
+from ids.rules import (
+    BurstDetector,
+    FirmwareValidationDetector,
+    FrequencySpikeDetector,
+    OutOfRangeDetector,
+    ReplayDetector,
+)
+
+
+def _traffic(seed=0, n=3000):
+    rng = np.random.default_rng(seed)
+    can_ids = rng.choice([0x100, 0x300, 0x301, 0x400], size=n, p=[0.6, 0.1, 0.1, 0.2])
+    timestamps = 1000.0 + np.cumsum(rng.exponential(0.02, size=n))
+    # A burst of one ID in the middle
+    can_ids[1500:1600] = 0x301
+    timestamps[1500:1600] = timestamps[1500] + np.arange(100) * 0.001
+    timestamps[1600:] += 0.1
+    payloads = rng.integers(0, 4, size=(n, 8), dtype=np.uint8)  # Small payload space: repeats
+    payloads[:, 1] = rng.integers(0, 100, size=n)
+    payloads[::7, 2] = 0x00
+    payloads[::7, 3] = 0xFF  # voltage out of range on 0x400
+    return can_ids, timestamps, payloads
+
+
+def _scalar(detect, *columns):
+    rows = zip(*(np.asarray(column).tolist() for column in columns))
+    return [i for i, row in enumerate(rows) if detect(*row)]
+
+
+def test_frequency_and_burst():
+    can_ids, timestamps, _ = _traffic()
+    for make in (lambda: FrequencySpikeDetector(threshold_hz=20.0), lambda: BurstDetector(max_messages=10)):
+        expected = _scalar(make().detect, can_ids, timestamps)
+        batch = make()
+        chunks = [batch.detect_batch(can_ids[i:i + 500], timestamps[i:i + 500]) + i
+                  for i in range(0, len(can_ids), 500)]
+        assert expected
+        assert np.concatenate(chunks).tolist() == expected
+
+
+def test_replay():
+    can_ids, timestamps, payloads = _traffic(seed=1)
+    payloads[:, 2:] = 0
+    payloads[:, :2] %= 3  # Few distinct payloads per ID
+    scalar = ReplayDetector(window_seconds=5.0, max_duplicates=3)
+    expected = [i for i in range(len(can_ids))
+                if scalar.detect(int(can_ids[i]), bytes(payloads[i]), float(timestamps[i]))]
+    batch = ReplayDetector(window_seconds=5.0, max_duplicates=3).detect_batch(can_ids, payloads, timestamps)
+    assert expected
+    assert batch.tolist() == expected
+
+
+def test_out_of_range():
+    can_ids, _, payloads = _traffic(seed=2)
+    detector = OutOfRangeDetector(SignalDecoder.load())
+    expected = [i for i in range(len(can_ids)) if detector.detect_frame(int(can_ids[i]), bytes(payloads[i]))]
+    batch = OutOfRangeDetector(SignalDecoder.load()).detect_batch(can_ids, payloads)
+    assert expected
+    assert batch.tolist() == expected
+
+
+def test_firmware():
+    versions = np.array(["v1.6-release", "v9.9", "v2.0.1-prod", "evil", "v1.5-stable"] * 20)
+    detector = FirmwareValidationDetector(allowed_versions=["v1.5-stable", "v1.6-release", "v2.0.1-prod"])
+    assert detector.detect_batch(versions).tolist() == _scalar(detector.detect, versions)
@@ -0,0 +1,45 @@
+"""FirmwarePolicy: range suffix handling and case-insensitive exact rules"""
+
+import pytest
+
+from ocpp.firmware_policy import FirmwarePolicy, parse_version
+
+
+def test_parse_version_accepts_only_release_suffixes():
+    assert parse_version("v1.6-release") == (1, 6, 0)
+    assert parse_version("2.0.1-PROD") == (2, 0, 1)
+    assert parse_version("v1.9-malicious") is None
+    assert parse_version("v1.9+build7") is None
+    assert parse_version("v1.9-malicious", None) == (1, 9, 0)
+
+
+@pytest.mark.parametrize("version, allowed", [
+    ("v1.6-release", True),
+    ("1.9.3", True),
+    ("v1.5-stable", True),
+    ("v1.9-malicious", False),
+    ("v1.9-rc1", False),
+    ("v1.9+anything", False),
+    ("v2.0-release", False),
+])
+def test_range_rejects_unknown_suffixes(version, allowed):
+    assert FirmwarePolicy(allow=[">=1.5,<2.0"]).is_allowed(version) is allowed
+
+
+def test_exact_rules_ignore_case():
+    policy = FirmwarePolicy(allow=["v1.6-release", "v1.7-beta"], deny=["v1.7-beta"])
+    assert policy.is_allowed("V1.6-Release")
+    allowed, reason = policy.check("v1.7-BETA")
+    assert not allowed
+    assert reason == "denied by rule 'v1.7-beta'"
+
+
+def test_deny_range_covers_unknown_suffixes():
+    policy = FirmwarePolicy(allow=["v1.9-malicious"], deny=[">=1.9,<2.0"])
+    assert not policy.is_allowed("v1.9-malicious")
+
+
+def test_release_suffixes_from_policy():
+    policy = FirmwarePolicy(allow=[">=1.5,<2.0"], release_suffixes=["LTS"])
+    assert policy.is_allowed("v1.8-lts")
+    assert not policy.is_allowed("v1.8-release")
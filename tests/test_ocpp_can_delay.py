@@ -0,0 +1,53 @@
+"""OCPPCANDelayDetector and TimerWheel"""
+
+import threading
+
+from ids.rules import OCPPCANDelayDetector, TimerWheel
+
+
+def test_timer_fires_when_scheduled_before_first_advance():
+    wheel = TimerWheel(tick_seconds=0.1)
+    wheel.schedule(1002.0, "due")
+    assert wheel.advance(1001.0) == []
+    assert wheel.advance(1003.0) == ["due"]
+    assert wheel.size == 0
+
+
+def test_missing_response_alert_fires():
+    detector = OCPPCANDelayDetector(max_delay_seconds=2.0, response_timeout=30.0)
+    detector.register_ocpp_command("RemoteStart", 0x200, 1, 1000.0)
+    alerts = detector.check_timeouts(1003.0)
+    assert len(alerts) == 1 and "Missing CAN response" in alerts[0]
+    assert detector.check_timeouts(1010.0) == []
+    assert detector.check_timeouts(1040.0) == []
+    assert not detector.waiting_for_can
+
+
+def test_response_in_time_is_paired():
+    detector = OCPPCANDelayDetector(max_delay_seconds=2.0)
+    detector.register_ocpp_command("RemoteStart", 0x200, 1, 1000.0)
+    assert detector.detect(0x200, 1000.5) is None
+    assert detector.check_timeouts(1003.0) == []
+    assert not detector.waiting_for_can
+
+
+def test_concurrent_register_and_detect():
+    detector = OCPPCANDelayDetector(max_delay_seconds=0.001)
+    
+    def ocpp_thread():
+        for i in range(20000):
+            detector.register_ocpp_command("RemoteStart", 0x200, i % 4, 1.0 + i * 0.0001)
+    
+    def can_thread():
+        for i in range(20000):
+            detector.detect(0x200, 1.0 + i * 0.0001)
+            detector.check_timeouts(1.0 + i * 0.0001)
+    
+    threads = [threading.Thread(target=ocpp_thread), threading.Thread(target=can_thread)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    detector.check_timeouts(100.0)
+    assert not detector.waiting_for_can
+    assert detector.timers.size == 0
@@ -0,0 +1,41 @@
+"""PayloadStatisticsDetector: learned byte values and bit flips"""
+
+import numpy as np
+
+from ids.rules import PayloadStatisticsDetector
+
+
+def _normal_frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    counter = 0
+    for _ in range(n):
+        counter = (counter + 1) % 16
+        # Constant header, slowly varying SoC, 4-bit rolling counter
+        yield bytes([0x01, 40 + int(rng.integers(0, 3)), counter, 0x00, 0, 0, 0, 0])
+
+
+def _learned(learning_frames=500):
+    detector = PayloadStatisticsDetector(learning_frames=learning_frames)
+    for data in _normal_frames(learning_frames):
+        assert detector.detect(0x100, data) is None
+    return detector
+
+
+def test_normal_traffic_is_silent():
+    detector = _learned()
+    assert detector.get_profile(0x100)["learned"]
+    assert [detector.detect(0x100, data) for data in _normal_frames(1000, seed=1)] == [None] * 1000
+
+
+def test_injected_value_alerts():
+    detector = _learned()
+    alert = detector.detect(0x100, bytes([0x01, 41, 3, 0xA5, 0, 0, 0, 0]))
+    assert alert and "byte 3 value 0xA5" in alert
+
+
+def test_frozen_counter_alerts():
+    detector = _learned()
+    assert detector.detect(0x100, bytes([0x01, 41, 3, 0, 0, 0, 0, 0])) is None
+    # Every value is known, but bit 0 of the rolling counter always flipped
+    alert = detector.detect(0x100, bytes([0x01, 41, 3, 0, 0, 0, 0, 0]))
+    assert alert and "bit flips in byte 2" in alert
@@ -0,0 +1,31 @@
+"""RateChangeDetector: learned period, alerts and re-baselining"""
+
+from ids.rules import RateChangeDetector
+
+
+def _feed(detector, period, count, start):
+    alerts, t = 0, start
+    for _ in range(count):
+        t += period
+        alerts += bool(detector.detect("CAN_0x100", t))
+    return alerts, t
+
+
+def test_rate_doubling_alerts_once():
+    detector = RateChangeDetector()
+    _, t = _feed(detector, 0.1, 200, 0.0)
+    alerts, _ = _feed(detector, 0.05, 30, t)
+    assert alerts == 1
+
+
+def test_permanent_rate_change_is_relearned():
+    detector = RateChangeDetector(rebaseline_count=50)
+    _, t = _feed(detector, 0.1, 200, 0.0)
+    alerts, t = _feed(detector, 0.05, 20000, t)
+    model = detector.get_model("CAN_0x100")
+    assert alerts == 1
+    assert not model["alarm"]
+    assert abs(model["period"] - 0.05) < 1e-3
+    # The new rate is watched like the old one
+    alerts, _ = _feed(detector, 0.025, 30, t)
+    assert alerts == 1
@@ -0,0 +1,75 @@
+"""Offline report: counts, histograms and time to detect on small logs"""
+
+import pytest
+
+from ids.report import build_report, render_html
+
+
+ALERT_LOG = """\
+[2024-03-01 10:00:01.000] [WARNING] [Frequency Spike] ⚠️  ANOMALY 1: Frequency spike on CAN ID 0x9FF - 120 msg/s
+[2024-03-01 10:00:01.500] [WARNING] [Frequency Spike] ⚠️  ANOMALY 1: Frequency spike on CAN ID 0x9FF - 130 msg/s
+[2024-03-01 10:00:02.000] [WARNING] [Frequency Spike] ⚠️  ANOMALY 1: Frequency spike on CAN ID 0x9FF - 140 msg/s | Details: {"rate": 140}
+[2024-03-01 10:00:05.000] [WARNING] [Frequency Spike] 4 repeated Frequency Spike alerts aggregated in 3.0s - last: ⚠️  ANOMALY 1: Frequency spike on CAN ID 0x9FF - 150 msg/s
+not an alert line
+[2024-03-01 11:30:00.000] [CRITICAL] [Replay Attack] ⚠️  ANOMALY 3: Replay attack on CAN ID 0x200
+"""
+
+
+def _can_log():
+    lines = [f"[2024-03-01 10:00:{(800 + 100 * i) // 1000:02d}.{(800 + 100 * i) % 1000:03d}] RX | ID: 0x9FF "
+             f"| DLC: 8 | Data: [00 00 00 00 00 00 00 00]" for i in range(13)]
+    lines.append("[2024-03-01 11:29:59.900] RX | ID: 0x200 | DLC: 2 | Data: [01 02]")
+    lines.append("truncated line")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def logs(tmp_path):
+    alerts = tmp_path / "ids_alerts.log"
+    alerts.write_text(ALERT_LOG, encoding="utf-8")
+    can = tmp_path / "can_traffic.log"
+    can.write_text(_can_log())
+    return str(alerts), str(can)
+
+
+def test_alert_counts(logs):
+    report = build_report([logs[0]], [logs[1]], workers=1)
+    alerts = report["alerts"]
+    assert alerts["lines"] == 6 and alerts["malformed"] == 1
+    assert alerts["total"] == 8
+    assert alerts["by_type"] == {
+        "Frequency Spike": {"alerts": 3, "aggregated": 4, "total": 7},
+        "Replay Attack": {"alerts": 1, "aggregated": 0, "total": 1},
+    }
+    assert alerts["by_level"] == {"WARNING": 7, "CRITICAL": 1}
+    assert alerts["by_anomaly"] == {"1": 7, "3": 1}
+    assert [row["total"] for row in alerts["histogram"]] == [7, 1]
+    assert alerts["top_can_ids"] == [{"can_id": "0x9FF", "alerts": 7}, {"can_id": "0x200", "alerts": 1}]
+    assert alerts["first"] == "2024-03-01 10:00:01.000" and alerts["last"] == "2024-03-01 11:30:00.000"
+
+
+def test_can_counts_and_time_to_detect(logs):
+    report = build_report([logs[0]], [logs[1]], workers=1)
+    can = report["can"]
+    assert can["frames"] == 14 and can["malformed"] == 1
+    assert can["can_ids"] == 2 and can["bursts"] == 2
+    assert can["top_can_ids"][0] == {"can_id": "0x9FF", "frames": 13}
+    
+    ttd = report["time_to_detect"]
+    assert ttd["matched"] == 2 and ttd["unmatched"] == 0
+    assert ttd["by_type"]["Frequency Spike"]["max_ms"] == 200.0
+    assert ttd["by_type"]["Replay Attack"]["max_ms"] == 100.0
+
+
+def test_segments_and_workers_do_not_change_the_report(logs):
+    single = build_report([logs[0]], [logs[1]], workers=1)
+    split = build_report([logs[0]], [logs[1]], workers=2, segment_size=64)
+    assert split["inputs"]["segments"] > 2
+    for section in ("alerts", "can", "time_to_detect"):
+        assert split[section] == single[section]
+
+
+def test_html_renders(logs):
+    page = render_html(build_report([logs[0]], [logs[1]], workers=1))
+    assert page.startswith("<!DOCTYPE html>")
+    assert "Replay Attack" in page and "0x9FF" in page
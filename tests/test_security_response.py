@@ -0,0 +1,87 @@
+"""SecurityResponseHandler: hold, escalation and step-down"""
+
+import time
+
+from ids.response import COMMAND_CAN_ID, COMMAND_FRAMES, ResponseState, SecurityResponseHandler
+
+
+class RecordingCAN:
+    def __init__(self):
+        self.frames = []
+    
+    def send_message(self, arbitration_id, data, log=True):
+        self.frames.append((arbitration_id, list(data)))
+        return True
+
+
+def _handler(**kwargs):
+    can = RecordingCAN()
+    return SecurityResponseHandler(can_interface=can, hold_seconds=30.0, **kwargs), can
+
+
+def test_safe_mode_is_entered_once_and_held():
+    handler, can = _handler(escalate_after=100)
+    assert handler.trigger_safe_mode("Frequency Spike")
+    for _ in range(20):
+        assert not handler.trigger_safe_mode("Frequency Spike")
+    handler.close()
+    
+    assert handler.state == ResponseState.SAFE_MODE
+    assert can.frames == [(COMMAND_CAN_ID, COMMAND_FRAMES[ResponseState.SAFE_MODE])]
+    incident = handler.get_incidents()[0]
+    assert incident["triggers"] == 21 and incident["frames"] == 1 and incident["ended"] is None
+
+
+def test_escalation_by_count_and_type():
+    handler, can = _handler(escalate_after=3)
+    handler.trigger_safe_mode("Replay Attack")
+    handler.trigger_safe_mode("Replay Attack")
+    assert handler.state == ResponseState.SAFE_MODE
+    assert handler.trigger_safe_mode("Replay Attack")
+    assert handler.state == ResponseState.LOCKDOWN
+    handler.close()
+    
+    handler, can = _handler(lockdown_types=["Firmware Update"])
+    handler.trigger_safe_mode("Firmware Update")
+    handler.close()
+    assert handler.state == ResponseState.LOCKDOWN
+    assert [data for _, data in can.frames] == [COMMAND_FRAMES[ResponseState.SAFE_MODE],
+                                                COMMAND_FRAMES[ResponseState.LOCKDOWN]]
+    assert handler.get_incidents()[0]["peak"] == "LOCKDOWN"
+
+
+def test_step_down_one_level_per_hold():
+    handler, can = _handler(lockdown_types=["Firmware Update"])
+    handler.trigger_safe_mode("Firmware Update")
+    now = time.time()
+    
+    handler._step_down(now + 10.0)  # still held
+    assert handler.state == ResponseState.LOCKDOWN
+    handler._step_down(now + 31.0)
+    assert handler.state == ResponseState.SAFE_MODE
+    handler._step_down(now + 40.0)  # the lower state gets its own hold
+    assert handler.state == ResponseState.SAFE_MODE
+    handler._step_down(now + 62.0)
+    assert handler.state == ResponseState.NORMAL
+    handler.close()
+    
+    assert [data for _, data in can.frames] == [COMMAND_FRAMES[state] for state in
+                                                (ResponseState.SAFE_MODE, ResponseState.LOCKDOWN,
+                                                 ResponseState.SAFE_MODE, ResponseState.NORMAL)]
+    incident = handler.get_incidents()[0]
+    assert incident["ended"] == now + 62.0 and incident["frames"] == 4
+    
+    # The next trigger opens a new incident
+    assert handler.trigger_safe_mode("Frequency Spike")
+    assert handler.get_stats()["incidents"] == 2
+
+
+def test_sender_steps_down_after_hold():
+    handler = SecurityResponseHandler(hold_seconds=0.05, release_frames=False)
+    handler.trigger_safe_mode("Frequency Spike")
+    deadline = time.monotonic() + 5.0
+    while handler.state != ResponseState.NORMAL and time.monotonic() < deadline:
+        time.sleep(0.01)
+    handler.close()
+    assert handler.state == ResponseState.NORMAL
+    assert handler.get_incidents()[0]["frames"] == 1
@@ -0,0 +1,72 @@
+"""SessionStateDetector: OCPP and CAN sides of a charging session"""
+
+from ids.rules import SessionStateDetector
+
+# Periodic frames of can_simulator (ID: rate in Hz); 0x200 runs while energized
+SIMULATOR_RATES = {0x100: 10, 0x300: 1, 0x400: 5}
+CHARGE_CONTROL_RATE = 1
+
+
+def _can_frames(start, end, with_charge_control):
+    rates = dict(SIMULATOR_RATES)
+    if with_charge_control:
+        rates[0x200] = CHARGE_CONTROL_RATE
+    frames = []
+    for can_id, rate in rates.items():
+        t = start
+        while t < end:
+            frames.append((t, can_id))
+            t += 1.0 / rate
+    return sorted(frames)
+
+
+def _replay(detector, events):
+    """events: (ts, "ocpp", action, charge point, connector) or (ts, "can", can_id)"""
+    alerts = []
+    for event in sorted(events, key=lambda e: e[0]):
+        if event[1] == "ocpp":
+            alerts.append(detector.detect_ocpp(*event[2:]))
+        else:
+            alerts.append(detector.detect_can(event[2]))
+    return [alert for alert in alerts if alert]
+
+
+def _session(charge_point_id, start):
+    ocpp = [
+        (start + 0.0, "BootNotification", None),
+        (start + 1.0, "StatusNotification", 1),
+        (start + 10.0, "RemoteStartTransaction", 1),
+        (start + 10.5, "StartTransaction", 1),
+    ]
+    ocpp += [(start + 12.0 + i * 10, "MeterValues", 1) for i in range(6)]
+    ocpp.append((start + 80.0, "StopTransaction", 1))
+    events = [(ts, "ocpp", action, charge_point_id, connector) for ts, action, connector in ocpp]
+    events += [(ts, "can", can_id) for ts, can_id in _can_frames(start, start + 10.8, False)]
+    events += [(ts, "can", can_id) for ts, can_id in _can_frames(start + 10.8, start + 80.0, True)]
+    events += [(ts, "can", can_id) for ts, can_id in _can_frames(start + 80.1, start + 90.0, False)]
+    return events
+
+
+def test_normal_session_with_simulator_traffic_is_silent():
+    detector = SessionStateDetector()
+    assert _replay(detector, _session("CP1", 1000.0)) == []
+    assert detector.get_state("CP1", 1) == "Available"
+
+
+def test_charge_control_reaches_the_waiting_charge_point():
+    detector = SessionStateDetector()
+    events = [(t, "ocpp", a, "CP1", 1) for t, a in
+              [(0.0, "BootNotification"), (1.0, "StatusNotification"), (2.0, "RemoteStartTransaction")]]
+    events.append((3.0, "can", 0x200))
+    assert _replay(detector, events) == []
+    assert detector.get_state("CP1", 1) == "Energized"
+    assert detector.detect_ocpp("MeterValues", "CP1", 1) is None
+    assert detector.get_state("CP1", 1) == "Charging"
+
+
+def test_charge_control_without_session_alerts():
+    detector = SessionStateDetector()
+    detector.detect_ocpp("BootNotification", "CP1")
+    detector.detect_ocpp("StatusNotification", "CP1", 1)
+    alert = detector.detect_can(0x200)
+    assert alert and "CP1 connector 1: CAN 0x200 while Available" in alert
@@ -0,0 +1,42 @@
+"""TimingFingerprintDetector: inter-arrival histograms per CAN ID"""
+
+import numpy as np
+
+from ids.rules import TimingFingerprintDetector
+
+
+def _periodic(detector, start, count, period=0.1, jitter=0.002, seed=0):
+    rng = np.random.default_rng(seed)
+    alerts, t = [], start
+    for _ in range(count):
+        t += period + rng.uniform(-jitter, jitter)
+        alerts.append(detector.detect(0x100, t))
+    return [alert for alert in alerts if alert], t
+
+
+def test_periodic_traffic_is_silent():
+    detector = TimingFingerprintDetector()
+    alerts, _ = _periodic(detector, 1000.0, 3000)
+    assert alerts == []
+    assert detector.get_fingerprint(0x100)["learned"]
+
+
+def test_injected_frames_alert_once_per_episode():
+    detector = TimingFingerprintDetector()
+    _, t = _periodic(detector, 1000.0, 600)
+    
+    # An attacker sends its own copy halfway between the ECU's frames
+    alerts = []
+    for i in range(200):
+        t += 0.1
+        alerts.append(detector.detect(0x100, t))
+        alerts.append(detector.detect(0x100, t + 0.05))
+    alerts = [alert for alert in alerts if alert]
+    assert len(alerts) == 1
+    assert "Inter-arrival timing changed for CAN ID 0x100" in alerts[0]
+    
+    # Back to normal, then a second injection is a new episode
+    later, t = _periodic(detector, t, 100, seed=1)
+    assert later == []
+    second = [detector.detect(0x100, t + 0.05 * (i + 1)) for i in range(100)]
+    assert sum(bool(alert) for alert in second) == 1
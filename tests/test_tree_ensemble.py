@@ -0,0 +1,48 @@
+"""TreeEnsemble: compiled forests match scikit-learn exactly"""
+
+import numpy as np
+import pytest
+
+sklearn_ensemble = pytest.importorskip("sklearn.ensemble")
+
+from ids.tree_ensemble import TreeEnsemble, export_model, export_models, load_models
+
+
+def _data(seed=0, n=600, n_features=6):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features))
+    X[:, 2] = np.round(X[:, 2] * 4)  # Ties on thresholds
+    y = ((X[:, 0] + X[:, 1] * X[:, 2]) > 0.3).astype(np.int64) + (X[:, 3] > 1.2)
+    return X, y
+
+
+def test_random_forest_matches_sklearn():
+    X, y = _data()
+    model = sklearn_ensemble.RandomForestClassifier(n_estimators=25, max_depth=12, random_state=0).fit(X[:400], y[:400])
+    ensemble = TreeEnsemble(export_model(model))
+    X_test = np.vstack([X[400:], _data(seed=1, n=200)[0]])
+    assert np.array_equal(ensemble.predict_proba(X_test), model.predict_proba(X_test))
+    assert np.array_equal(ensemble.predict(X_test), model.predict(X_test))
+
+
+@pytest.mark.parametrize("max_features", [1.0, 0.5, 3])
+def test_isolation_forest_matches_sklearn(max_features):
+    X, _ = _data(seed=2)
+    model = sklearn_ensemble.IsolationForest(n_estimators=40, max_features=max_features,
+                                             random_state=0).fit(X[:400])
+    ensemble = TreeEnsemble(export_model(model))
+    X_test = np.vstack([X[400:], _data(seed=3, n=200)[0] * 3])
+    assert np.array_equal(ensemble.score_samples(X_test), model.score_samples(X_test))
+    assert np.array_equal(ensemble.decision_function(X_test), model.decision_function(X_test))
+    assert np.array_equal(ensemble.predict(X_test), model.predict(X_test))
+
+
+def test_export_round_trip(tmp_path):
+    X, y = _data(seed=4)
+    forest = sklearn_ensemble.RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    isolation = sklearn_ensemble.IsolationForest(n_estimators=5, random_state=0).fit(X)
+    path = str(tmp_path / "models.npz")
+    export_models({"rf": forest, "iso": isolation}, path)
+    models = load_models(path)
+    assert np.array_equal(models["rf"].predict(X), forest.predict(X))
+    assert np.array_equal(models["iso"].score_samples(X), isolation.score_samples(X))
@@ -0,0 +1,59 @@
+"""UnknownCANIDDetector: whitelist lookups, learning and persistence"""
+
+from ids.rules import UnknownCANIDDetector
+
+
+def test_first_frame_of_unknown_id_alerts_once():
+    detector = UnknownCANIDDetector(known_ids=[0x100, 0x200])
+    assert detector.detect(0x100) is None
+    
+    alert = detector.detect(0x123)
+    assert alert and "Unknown CAN ID 0x123" in alert
+    assert detector.detect(0x123) is None
+    
+    alert = detector.detect(0x18DAF110)
+    assert alert and "0x18DAF110 (extended)" in alert
+    assert detector.detect(0x18DAF110) is None
+
+
+def test_standard_and_extended_ids_are_distinct():
+    detector = UnknownCANIDDetector(known_ids=[0x100])
+    assert detector.is_known(0x100)
+    assert not detector.is_known(0x100, is_extended=True)
+    assert detector.detect(0x100, is_extended=True)
+
+
+def test_learning_mode_extends_whitelist():
+    detector = UnknownCANIDDetector(learning=True)
+    for can_id in (0x100, 0x7FF, 0x18DAF110):
+        assert detector.detect(can_id) is None
+    detector.learning = False
+    assert detector.detect(0x7FF) is None
+    assert detector.detect(0x101)
+    assert len(detector) == 3
+
+
+def test_save_load_round_trip(tmp_path):
+    detector = UnknownCANIDDetector(known_ids=[0x000, 0x100, 0x7FF])
+    detector.add(0x123, is_extended=True)
+    detector.add(0x18DAF110)
+    path = tmp_path / "whitelist.json"
+    detector.save(str(path))
+    
+    loaded = UnknownCANIDDetector.load(str(path))
+    assert loaded.known_ids() == ([0x000, 0x100, 0x7FF], [0x123, 0x18DAF110])
+    assert loaded.detect(0x123) is not None
+    assert loaded.detect(0x123, is_extended=True) is None
+
+
+def test_learn_from_capture(tmp_path):
+    capture = tmp_path / "capture.log"
+    capture.write_text(
+        "[12:00:00.000] ID: 0x100 | DLC: 8 | Data: 00 00 00 00 00 00 00 00\n"
+        "(1700000000.000000) vcan0 200#DEADBEEF\n"
+        "(1700000000.100000) vcan0 18DAF110#01\n"
+        "garbage line\n"
+    )
+    detector = UnknownCANIDDetector()
+    assert detector.learn_from_capture(str(capture)) == 3
+    assert detector.known_ids() == ([0x100, 0x200], [0x18DAF110])
@@ -0,0 +1,55 @@
+"""ValueDeltaDetector: one series per charge point, connector, measurand and phase"""
+
+import numpy as np
+
+from ids.rules import ValueDeltaDetector
+
+
+def _meter_values(connector_id, *samples):
+    """samples: (timestamp, [(measurand, phase, value), ...])"""
+    return {
+        "connectorId": connector_id,
+        "meterValue": [
+            {"timestamp": ts, "sampledValue": [
+                {"measurand": measurand, "phase": phase, "value": str(value)}
+                for measurand, phase, value in sampled
+            ]}
+            for ts, sampled in samples
+        ],
+    }
+
+
+def test_import_and_export_registers_are_separate_series():
+    detector = ValueDeltaDetector()
+    message = _meter_values(1,
+        (1000.0, [("Energy.Active.Import.Register", None, 50000), ("Energy.Active.Export.Register", None, 0)]),
+        (1060.0, [("Energy.Active.Import.Register", None, 50010), ("Energy.Active.Export.Register", None, 0)]),
+    )
+    assert detector.detect_meter_values("CP1", message, 1060.0) == []
+
+
+def test_phases_are_separate_series():
+    detector = ValueDeltaDetector()
+    phases = [("Power.Active.Import", "L1", 7000), ("Power.Active.Import", "L2", 100), ("Power.Active.Import", "L3", 3500)]
+    message = _meter_values(1, (1000.0, phases), (1010.0, phases))
+    assert detector.detect_meter_values("CP1", message, 1010.0) == []
+    
+    jump = [("Power.Active.Import", "L1", 7000), ("Power.Active.Import", "L2", 300100), ("Power.Active.Import", "L3", 3500)]
+    alerts = detector.detect_meter_values("CP1", _meter_values(1, (1011.0, jump)), 1011.0)
+    assert len(alerts) == 1
+    assert "CP1/connector 1 (Power.Active.Import L2)" in alerts[0]
+
+
+def test_batch_keeps_charge_points_apart():
+    detector = ValueDeltaDetector()
+    charge_points = np.array(["CP1", "CP2"] * 50)
+    connectors = np.ones(100, dtype=np.int64)
+    timestamps = 1000.0 + np.repeat(np.arange(50, dtype=np.float64), 2)
+    # Both stations count up 1 Wh/s from very different meter readings
+    values = np.where(charge_points == "CP1", 10.0, 900000.0) + np.repeat(np.arange(50, dtype=np.float64), 2)
+    hits = detector.detect_batch("Energy.Active.Import.Register", values, timestamps, connectors, charge_points)
+    assert len(hits) == 0
+    
+    # The state is shared with detect() per charge point
+    assert detector.detect("Energy.Active.Import.Register", 59.0, 1050.0, "CP1", 1) is None
+    assert detector.detect("Energy.Active.Import.Register", 900049.0 + 1000.0, 1050.0, "CP2", 1) is not None